@@ -0,0 +1,14 @@
+"""
+ASGI-точка входа: uvicorn cartridge_tracker.asgi:application
+или gunicorn -k uvicorn.workers.UvicornWorker cartridge_tracker.asgi:application.
+
+JSON-эндпоинты для сканеров и автодополнения асинхронные и под ASGI
+не занимают поток воркера на время ожидания БД.
+"""
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'cartridge_tracker.settings')
+
+application = get_asgi_application()
@@ -23,6 +23,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы время ответа включало все остальные middleware
+    'cartridges.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -50,13 +52,74 @@ TEMPLATES = [
     },
 ]
 
+# Профиль базы задаётся переменными окружения. Без DB_ENGINE — SQLite для
+# разработки; DB_ENGINE=postgresql — рабочий профиль с постоянными
+# соединениями воркеров, которые проверяются перед повторным использованием.
+def _database(prefix, fallback=None):
+    fallback = fallback or {}
+
+    def env(name, default=None):
+        return os.environ.get(f'{prefix}{name}', fallback.get(name, default))
+
+    if os.environ.get('DB_ENGINE', 'sqlite') != 'postgresql':
+        return {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': env('NAME', BASE_DIR / 'db.sqlite3'),
+            # Транзакция сразу берёт блокировку записи и ждёт её до timeout:
+            # иначе параллельные записи (воркеры run_jobs) получают
+            # «database is locked» без ожидания
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'timeout': 20,
+            },
+        }
+    return {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': env('NAME', 'cartridge_tracker'),
+        'USER': env('USER', 'cartridge_tracker'),
+        'PASSWORD': env('PASSWORD', ''),
+        'HOST': env('HOST', 'localhost'),
+        'PORT': env('PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        # За PgBouncer в режиме транзакций серверные курсоры выгрузок недоступны
+        'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_PGBOUNCER') == '1',
+        'OPTIONS': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 5)),
+            'application_name': 'cartridge_tracker',
+        },
+    }
+
+
 DATABASES = {
+    'default': _database('DB_'),
+}
+
+# Реплика для отчётов и выгрузок (cartridges.replica). Незаданные параметры
+# берутся у основной базы; для проверки маршрутизации на SQLite достаточно
+# DB_REPLICA_NAME с путём к копии (или к тому же файлу) базы.
+if any(name.startswith('DB_REPLICA_') for name in os.environ):
+    DATABASES['replica'] = _database('DB_REPLICA_', fallback=DATABASES['default'])
+    DATABASES['replica']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['cartridges.replica.ReplicaRouter']
+
+# Общий для всех воркеров кэш: версия инвентаря и снимки дашборда
+CACHES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache',
     }
 }
 
+# Метрики представлений: файлы воркеров, период их записи и токен для Prometheus
+METRICS_DIR = BASE_DIR / 'metrics'
+METRICS_FLUSH_INTERVAL = 10
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Загруженные файлы, ожидающие фоновой задачи (cartridges.jobs, run_jobs)
+JOB_FILES_DIR = BASE_DIR / 'jobs'
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -1,5 +1,10 @@
 from django.contrib import admin
-from .models import CartridgeModel, Location, Printer, Cartridge, Operation
+from django.db.models import Q
+from django.utils import timezone
+
+from . import search
+from .models import CartridgeModel, Location, Printer, Cartridge, Operation, ArchivedOperation, InventorySummary, OperationDailyRollup, ConsumptionForecast, Job, IdempotencyKey
+
 
 @admin.register(CartridgeModel)
 class CartridgeModelAdmin(admin.ModelAdmin):
@@ -17,6 +22,7 @@ class CartridgeModelAdmin(admin.ModelAdmin):
         })
     ]
 
+
 @admin.register(Location)
 class LocationAdmin(admin.ModelAdmin):
     list_display = ['name', 'type', 'is_active']  
@@ -35,6 +41,7 @@ class LocationAdmin(admin.ModelAdmin):
         })
     ]
 
+
 @admin.register(Printer)
 class PrinterAdmin(admin.ModelAdmin):
     list_display = ['name', 'model', 'serial_number', 'printer_type', 'is_inkjet', 'location', 'is_active']
@@ -55,6 +62,7 @@ class PrinterAdmin(admin.ModelAdmin):
         })
     ]
 
+
 @admin.register(Cartridge)
 class CartridgeAdmin(admin.ModelAdmin):
     list_display = ['serial_number', 'consumable_type', 'model', 'current_status', 'current_location', 'refill_count', 'condition']
@@ -62,6 +70,14 @@ class CartridgeAdmin(admin.ModelAdmin):
     search_fields = ['serial_number', 'model__name']
     readonly_fields = ['created_at', 'updated_at']
     
+    def get_search_results(self, request, queryset, search_term):
+        """Поиск по триграммному индексу серийных номеров и индексу моделей"""
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        cartridge_ids = search.cartridge_ids_containing(search_term)
+        model_ids = [model['id'] for model in search.search_models(search_term, limit=None)]
+        return queryset.filter(Q(pk__in=cartridge_ids) | Q(model_id__in=model_ids)), False
+    
     fieldsets = [
         (None, {
             'fields': ['serial_number', 'consumable_type', 'model', 'current_status', 'current_location']
@@ -76,10 +92,101 @@ class CartridgeAdmin(admin.ModelAdmin):
         })
     ]
 
+
 @admin.register(Operation)
 class OperationAdmin(admin.ModelAdmin):
     list_display = ['operation_type', 'cartridge', 'from_location', 'to_location', 'user', 'timestamp']
     list_filter = ['operation_type', 'timestamp']
     search_fields = ['cartridge__serial_number', 'user__username']
     readonly_fields = ['timestamp']
-    date_hierarchy = 'timestamp'
\ No newline at end of file
+    date_hierarchy = 'timestamp'
+
+
+@admin.register(ArchivedOperation)
+class ArchivedOperationAdmin(admin.ModelAdmin):
+    list_display = ['operation_type', 'cartridge', 'from_location', 'to_location', 'user', 'timestamp']
+    list_filter = ['operation_type']
+    search_fields = ['cartridge__serial_number']
+    list_select_related = ['cartridge', 'from_location', 'to_location', 'user']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(InventorySummary)
+class InventorySummaryAdmin(admin.ModelAdmin):
+    list_display = ['location', 'cartridge_model', 'consumable_type', 'status', 'count']
+    list_filter = ['consumable_type', 'status', 'location']
+    list_select_related = ['location', 'cartridge_model']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(OperationDailyRollup)
+class OperationDailyRollupAdmin(admin.ModelAdmin):
+    list_display = ['day', 'cartridge_model', 'location', 'refills', 'installs', 'disposals']
+    list_filter = ['location', 'cartridge_model']
+    list_select_related = ['location', 'cartridge_model']
+    date_hierarchy = 'day'
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ConsumptionForecast)
+class ConsumptionForecastAdmin(admin.ModelAdmin):
+    list_display = ['printer', 'cartridge_model', 'installs', 'samples', 'mean_days', 'per_month', 'next_replacement']
+    list_filter = ['cartridge_model']
+    list_select_related = ['printer', 'cartridge_model']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'name', 'status', 'attempts', 'user', 'created_at', 'finished_at']
+    list_filter = ['status', 'name']
+    list_select_related = ['user']
+    actions = ['retry']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
+    
+    @admin.action(description='Повторить выбранные задачи с ошибкой')
+    def retry(self, request, queryset):
+        count = queryset.filter(status='failed').update(
+            status='queued', attempts=0, error='', run_after=timezone.now(), finished_at=None,
+        )
+        self.message_user(request, f'Поставлено в очередь: {count}')
+
+
+@admin.register(IdempotencyKey)
+class IdempotencyKeyAdmin(admin.ModelAdmin):
+    list_display = ['key', 'user', 'status_code', 'created_at']
+    list_filter = ['status_code']
+    list_select_related = ['user']
+    search_fields = ['key']
+    exclude = ['body']
+    
+    def has_add_permission(self, request):
+        return False
+    
+    def has_change_permission(self, request, obj=None):
+        return False
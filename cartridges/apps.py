@@ -3,4 +3,7 @@ from django.apps import AppConfig
 class CartridgesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cartridges'
-    verbose_name = 'Управление картриджами'
\ No newline at end of file
+    verbose_name = 'Управление картриджами'
+
+    def ready(self):
+        from . import signals  # noqa: F401
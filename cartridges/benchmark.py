@@ -0,0 +1,261 @@
+"""
+Замеры представлений cartridges.urls и reports.urls.
+
+Каждый именованный маршрут приложений покрыт сценарием, который
+выполняется тестовым клиентом; записываются время ответа и число
+SQL-запросов. Прогон на двух размерах парка показывает представления,
+у которых число запросов растёт вместе с данными (N+1).
+Сценарии, меняющие данные, выполняются в транзакции с откатом.
+Для массовых операций замер включает выполнение поставленной задачи.
+"""
+import json
+import statistics
+import time
+from contextlib import nullcontext
+
+from django.db import connection, transaction
+from django.db.models import Count, Q
+from django.test.utils import CaptureQueriesContext
+from django.urls import get_resolver, reverse
+
+from . import jobs
+from .models import Cartridge, Job, Location, Printer
+
+
+BENCHMARK_APPS = ('cartridges', 'reports')
+# Сколько серийных номеров отправлять в пакетные сценарии
+SAMPLE_SERIALS = 50
+
+
+class Samples:
+    """Объекты, на которых выполняются сценарии: самые нагруженные в парке"""
+
+    def __init__(self):
+        self.cartridge = (
+            Cartridge.objects.exclude(current_status='disposed')
+            .annotate(operation_count=Count('operation'))
+            .order_by('-operation_count', 'pk')
+            .first()
+        )
+        self.printer = (
+            Printer.objects.filter(is_active=True)
+            .annotate(install_count=Count('operation', filter=Q(operation__operation_type='install')))
+            .order_by('-install_count', 'pk')
+            .first()
+        )
+        self.office = Location.objects.filter(type='office', printer__is_active=True).order_by('pk').first()
+        self.service = Location.objects.filter(type='service', is_active=True).order_by('pk').first()
+        # Пакетные сценарии затрагивают как можно больше ключей сводок
+        # (локация × модель): число запросов не должно от них зависеть
+        self.in_stock = self.spread(['in_stock', 'installed'])
+        self.at_service = self.spread(['at_service'])
+        self.query = self.cartridge.serial_number[:6]
+        # Завершённая задача для страницы состояния: результат того же вида,
+        # что у массового возврата с заправки
+        self.job = Job.objects.create(
+            name='return_from_service',
+            status='done',
+            attempts=1,
+            progress={'total': len(self.at_service), 'processed': len(self.at_service), 'errors': 0},
+            result={
+                'message': f'Успешно возвращено на склад: {len(self.at_service)} картриджей',
+                'count': len(self.at_service),
+                'errors': [],
+                'elapsed_ms': 0,
+            },
+        )
+
+    @staticmethod
+    def spread(statuses):
+        """До SAMPLE_SERIALS номеров: по одному на пару локация × модель, затем остальные"""
+        rows = (
+            Cartridge.objects.filter(current_status__in=statuses)
+            .order_by('pk').values_list('serial_number', 'current_location_id', 'model_id')
+        )
+        first, rest, keys = [], [], set()
+        for serial_number, location_id, model_id in rows.iterator():
+            if (location_id, model_id) in keys:
+                rest.append(serial_number)
+            else:
+                keys.add((location_id, model_id))
+                first.append(serial_number)
+            if len(first) >= SAMPLE_SERIALS:
+                break
+        return (first + rest)[:SAMPLE_SERIALS]
+
+
+class Scenario:
+    """
+    Запрос к маршруту url_name. Аргументы, параметры и тело могут быть
+    функциями от Samples. runs_job — представление ставит фоновую задачу,
+    и она выполняется в том же замере. max_queries — верхняя граница числа
+    запросов вместо сравнения размеров парка: для задач, которые идут по
+    всем подходящим расходникам пачками по BULK_BATCH_SIZE.
+    """
+
+    def __init__(self, url_name, method='get', kwargs=None, params=None, data=None,
+                 json_body=False, mutates=False, runs_job=False, max_queries=None, statuses=(200,)):
+        self.url_name = url_name
+        self.method = method
+        self.kwargs = kwargs
+        self.params = params
+        self.data = data
+        self.json_body = json_body
+        self.mutates = mutates
+        self.runs_job = runs_job
+        self.max_queries = max_queries
+        self.statuses = statuses
+
+    @staticmethod
+    def _resolve(value, samples):
+        return value(samples) if callable(value) else value
+
+    def request(self, client, samples):
+        url = reverse(self.url_name, kwargs=self._resolve(self.kwargs, samples))
+        if self.method == 'get':
+            response = client.get(url, self._resolve(self.params, samples) or {})
+        else:
+            data = self._resolve(self.data, samples) or {}
+            if self.json_body:
+                response = client.post(url, json.dumps(data), content_type='application/json')
+            else:
+                response = client.post(url, data)
+        if self.runs_job and response.status_code == 202:
+            # Задача выполняется в текущей транзакции, как её выполнил бы run_jobs
+            job_id = response.json()['job_id']
+            Job.objects.filter(pk=job_id).update(status='running', attempts=1)
+            jobs.run(job_id)
+            job = Job.objects.get(pk=job_id)
+            if job.status != 'done':
+                raise RuntimeError(f'Задача {job.name} не выполнена: {job.error_message}')
+        if response.streaming:
+            # Выгрузки формируются по мере чтения, замер включает весь поток
+            for _ in response.streaming_content:
+                pass
+        return response
+
+
+SCENARIOS = [
+    Scenario('cartridges:dashboard'),
+    Scenario('cartridges:cartridge_list'),
+    Scenario('cartridges:cartridge_export', params={'format': 'csv'}),
+    Scenario('cartridges:cartridge_create'),
+    Scenario('cartridges:cartridge_detail', kwargs=lambda s: {'pk': s.cartridge.pk}),
+    Scenario('cartridges:printer_list'),
+    Scenario('cartridges:printer_export', params={'format': 'csv'}),
+    Scenario('cartridges:printer_create'),
+    Scenario('cartridges:printer_detail', kwargs=lambda s: {'pk': s.printer.pk}),
+    Scenario('cartridges:operation_create'),
+    Scenario('cartridges:operation_create_for_cartridge', kwargs=lambda s: {'cartridge_pk': s.cartridge.pk}),
+    Scenario('cartridges:import_data'),
+    Scenario('cartridges:operation_export', params={'format': 'csv', 'operation_type': 'install'}),
+    Scenario(
+        'cartridges:scan_operations', method='post', json_body=True, mutates=True,
+        data=lambda s: {
+            'operation_type': 'issue_service',
+            'to_location_id': s.service.pk,
+            'serial_numbers': s.in_stock,
+        },
+    ),
+    Scenario('cartridges:cartridge_info', kwargs=lambda s: {'cartridge_id': s.cartridge.pk}),
+    Scenario('cartridges:printers_by_location', params=lambda s: {'location_id': s.office.pk}),
+    Scenario('cartridges:locations_by_operation', params={'operation_type': 'install'}),
+    Scenario('cartridges:search_models', params={'q': 'HP'}),
+    Scenario('cartridges:cartridge_lookup', params=lambda s: {'q': s.query, 'operation_type': 'issue_service'}),
+    Scenario('cartridges:printer_lookup', params=lambda s: {'location_id': s.office.pk}),
+    Scenario('cartridges:search', params=lambda s: {'q': s.query}),
+    Scenario(
+        'cartridges:update_cartridge_condition', method='post', mutates=True,
+        kwargs=lambda s: {'pk': s.cartridge.pk}, data={'condition': 'working'},
+    ),
+    # Все расходники, требующие ремонта: одна пачка на малом и большом парке
+    Scenario(
+        'cartridges:bulk_send_to_service', method='post', mutates=True, runs_job=True,
+        max_queries=20, statuses=(202,),
+    ),
+    Scenario(
+        'cartridges:send_to_service', method='post', mutates=True,
+        kwargs=lambda s: {'pk': s.cartridge.pk}, statuses=(200, 400),
+    ),
+    Scenario('cartridges:print_attention_report'),
+    Scenario(
+        'cartridges:bulk_return_from_service', method='post', json_body=True, mutates=True, runs_job=True,
+        data=lambda s: {'serial_numbers': s.at_service}, statuses=(202,),
+    ),
+    Scenario('cartridges:job_status', kwargs=lambda s: {'pk': s.job.pk}),
+    Scenario('cartridges:metrics'),
+    Scenario('reports:reports_dashboard'),
+    Scenario('reports:stock_report'),
+    Scenario('reports:stock_report', params={'format': 'json'}),
+    Scenario('reports:refill_report'),
+    Scenario('reports:refill_report', params={'period': '365'}),
+]
+
+
+def uncovered_routes(scenarios=SCENARIOS):
+    """Именованные маршруты приложений, для которых нет сценария"""
+    covered = {scenario.url_name for scenario in scenarios}
+    names = set()
+    resolver = get_resolver()
+    for app in BENCHMARK_APPS:
+        namespace = resolver.namespace_dict[app][1]
+        names.update(
+            f'{app}:{name}' for name in namespace.reverse_dict
+            if isinstance(name, str)
+        )
+    return sorted(names - covered)
+
+
+class Measurement:
+    def __init__(self, scenario):
+        self.scenario = scenario
+        self.label = scenario.url_name
+        if isinstance(scenario.params, dict) and scenario.params:
+            self.label += '?' + '&'.join(f'{k}={v}' for k, v in scenario.params.items())
+        self.status = None
+        self.queries = 0
+        self.timings = []
+
+    @property
+    def median_ms(self):
+        return statistics.median(self.timings) if self.timings else 0.0
+
+    @property
+    def ok(self):
+        return self.status in self.scenario.statuses
+
+
+def measure(scenario, client, samples, repeat=3):
+    """Прогревает сценарий одним запросом и замеряет repeat запусков"""
+    measurement = Measurement(scenario)
+    for attempt in range(repeat + 1):
+        with transaction.atomic() if scenario.mutates else nullcontext():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = scenario.request(client, samples)
+                elapsed = (time.perf_counter() - started) * 1000
+            if scenario.mutates:
+                transaction.set_rollback(True)
+        if attempt:
+            measurement.timings.append(elapsed)
+        measurement.status = response.status_code
+        measurement.queries = len(queries)
+    return measurement
+
+
+def run_benchmark(client, repeat=3, scenarios=SCENARIOS):
+    samples = Samples()
+    return [measure(scenario, client, samples, repeat) for scenario in scenarios]
+
+
+def is_regression(before, after):
+    """Число запросов растёт с данными или превышает границу сценария"""
+    limit = after.scenario.max_queries
+    if limit is not None:
+        return max(before.queries, after.queries) > limit
+    return after.queries > before.queries
+
+
+def query_regressions(small, large):
+    """Сценарии, у которых на большом парке запросов больше, чем на малом"""
+    return [(before, after) for before, after in zip(small, large) if is_regression(before, after)]
@@ -0,0 +1,250 @@
+"""
+Потоковая выгрузка списков в CSV и XLSX.
+
+Строки читаются через values_list().iterator(chunk_size=...) и сразу
+отдаются клиенту через StreamingHttpResponse, поэтому память воркера
+не зависит от размера выгрузки. XLSX собирается без сторонних
+библиотек: zip-архив пишется потоком, лист — с inline-строками.
+"""
+import csv
+import datetime
+import re
+import zipfile
+from itertools import chain
+from xml.sax.saxutils import escape
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Cartridge, Operation, Printer
+
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = ('csv', 'xlsx')
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+# Управляющие символы недопустимы в XML листа
+_XML_ILLEGAL_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+# С этих символов Excel и LibreOffice начинают формулу в ячейке CSV
+_FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+class Column:
+    """Колонка выгрузки: заголовок, поле для values_list и форматирование значения"""
+
+    def __init__(self, title, field, display=None):
+        self.title = title
+        self.field = field
+        self.display = display
+
+    def format(self, value):
+        if self.display is not None:
+            value = self.display.get(value, value)
+        if value is None:
+            return ''
+        if isinstance(value, datetime.datetime):
+            value = timezone.localtime(value).strftime('%d.%m.%Y %H:%M')
+        elif isinstance(value, datetime.date):
+            value = value.strftime('%d.%m.%Y')
+        elif isinstance(value, bool):
+            value = 'Да' if value else 'Нет'
+        return value
+
+
+CARTRIDGE_COLUMNS = [
+    Column('Серийный номер', 'serial_number'),
+    Column('Тип', 'consumable_type', dict(Cartridge.CONSUMABLE_TYPES)),
+    Column('Производитель', 'model__manufacturer'),
+    Column('Модель', 'model__name'),
+    Column('Статус', 'current_status', dict(Cartridge.STATUS_CHOICES)),
+    Column('Состояние', 'condition', dict(Cartridge.CONDITION_CHOICES)),
+    Column('Локация', 'current_location__name'),
+    Column('Принтер', 'installed_in_printer__name'),
+    Column('Заправок', 'refill_count'),
+    Column('Лимит заправок', 'model__max_refills'),
+    Column('Дата ввода', 'date_of_introduction'),
+    Column('Примечания', 'notes'),
+]
+
+PRINTER_COLUMNS = [
+    Column('Название', 'name'),
+    Column('Модель', 'model'),
+    Column('Серийный номер', 'serial_number'),
+    Column('Тип', 'printer_type', dict(Printer.PRINTER_TYPES)),
+    Column('На чернилах', 'is_inkjet'),
+    Column('Локация', 'location__name'),
+    Column('Дата установки', 'installation_date'),
+    Column('Активен', 'is_active'),
+    Column('Примечания', 'notes'),
+]
+
+OPERATION_COLUMNS = [
+    Column('Дата', 'timestamp'),
+    Column('Операция', 'operation_type', dict(Operation.OPERATION_TYPES)),
+    Column('Серийный номер', 'cartridge__serial_number'),
+    Column('Откуда', 'from_location__name'),
+    Column('Куда', 'to_location__name'),
+    Column('Принтер', 'printer__name'),
+    Column('Пользователь', 'user__username'),
+    Column('Причина', 'reason'),
+    Column('Примечания', 'notes'),
+]
+
+
+def iter_rows(queryset, columns, ordering, chunk_size=EXPORT_CHUNK_SIZE):
+    """Отформатированные строки выгрузки без загрузки выборки в память"""
+    rows = (
+        queryset.order_by(*ordering)
+        .values_list(*[column.field for column in columns])
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        yield [column.format(value) for column, value in zip(columns, row)]
+
+
+class _Echo:
+    """Буфер-заглушка: csv.writer возвращает записанную строку, а не копит её"""
+
+    def write(self, value):
+        return value
+
+
+def csv_cell(value):
+    """
+    Текст, похожий на формулу (серийный номер или примечание «=HYPERLINK(...)»),
+    экранируется апострофом: таблица покажет его как текст и не выполнит
+    """
+    if isinstance(value, str) and value.startswith(_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def stream_csv(columns, rows):
+    writer = csv.writer(_Echo(), delimiter=';')
+    # BOM, чтобы Excel открыл UTF-8 с кириллицей
+    yield '\ufeff' + writer.writerow([column.title for column in columns])
+    for row in rows:
+        yield writer.writerow([csv_cell(value) for value in row])
+
+
+class _ZipStream:
+    """Поток для zipfile без seek: записанные байты забираются генератором"""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Export" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    ),
+}
+
+
+def _xlsx_row(values):
+    cells = []
+    for value in values:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            cells.append(f'<c t="n"><v>{value}</v></c>')
+        else:
+            text = escape(_XML_ILLEGAL_RE.sub('', str(value)))
+            cells.append(f'<c t="inlineStr"><is><t>{text}</t></is></c>')
+    return '<row>' + ''.join(cells) + '</row>'
+
+
+def stream_xlsx(columns, rows, flush_every=EXPORT_CHUNK_SIZE):
+    buffer = _ZipStream()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        yield buffer.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write(
+                b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                b'<sheetData>'
+            )
+            sheet.write(_xlsx_row([column.title for column in columns]).encode())
+            for count, row in enumerate(rows, 1):
+                sheet.write(_xlsx_row(row).encode())
+                if count % flush_every == 0:
+                    yield buffer.drain()
+            sheet.write(b'</sheetData></worksheet>')
+    yield buffer.drain()
+
+
+def export_response(filename, columns, rows, export_format='csv'):
+    """StreamingHttpResponse с выгрузкой в выбранном формате"""
+    stamp = timezone.localtime().strftime('%Y%m%d_%H%M')
+    if export_format == 'xlsx':
+        response = StreamingHttpResponse(stream_xlsx(columns, rows), content_type=XLSX_CONTENT_TYPE)
+    else:
+        export_format = 'csv'
+        response = StreamingHttpResponse(stream_csv(columns, rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}_{stamp}.{export_format}"'
+    return response
+
+
+def cartridge_rows(queryset):
+    return iter_rows(queryset, CARTRIDGE_COLUMNS, ('-created_at', 'id'))
+
+
+def printer_rows(queryset):
+    return iter_rows(queryset, PRINTER_COLUMNS, ('name', 'id'))
+
+
+def operation_rows(queryset, archived_queryset=None):
+    """Журнал операций; архивные операции старше оперативных и идут следом"""
+    rows = iter_rows(queryset, OPERATION_COLUMNS, ('-timestamp', '-id'))
+    if archived_queryset is not None:
+        rows = chain(rows, iter_rows(archived_queryset, OPERATION_COLUMNS, ('-timestamp', '-id')))
+    return rows
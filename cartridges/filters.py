@@ -0,0 +1,96 @@
+"""
+Фильтры списков по параметрам запроса.
+
+Используются и страницами списков, и выгрузками, чтобы экспорт
+содержал ровно то, что пользователь видит в списке.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import search
+
+
+def _id(params, name):
+    """Идентификатор из параметра; нечисловое значение — как отсутствующее"""
+    value = params.get(name) or ''
+    return value if value.isdecimal() else None
+
+
+def _date(params, name):
+    """Дата из параметра; несуществующая (2024-02-30) — как отсутствующая"""
+    try:
+        return parse_date(params.get(name) or '')
+    except ValueError:
+        return None
+
+
+def filter_cartridges(queryset, params):
+    consumable_type = params.get('consumable_type')
+    status = params.get('status')
+    model_id = _id(params, 'model')
+    location_id = _id(params, 'location')
+    condition = params.get('condition')
+    needs_attention = params.get('needs_attention')
+    query = params.get('q', '').strip()
+
+    if query:
+        # Все вхождения в серийный номер через триграммный индекс, без LIMIT
+        queryset = queryset.filter(pk__in=search.cartridge_ids_containing(query))
+    if consumable_type:
+        queryset = queryset.filter(consumable_type=consumable_type)
+    if status:
+        queryset = queryset.filter(current_status=status)
+    if model_id:
+        queryset = queryset.filter(model_id=model_id)
+    if location_id:
+        queryset = queryset.filter(current_location_id=location_id)
+    if condition:
+        queryset = queryset.filter(condition=condition)
+    if needs_attention:
+        # Хранимый флаг, частичный индекс cartridge_attention_idx
+        queryset = queryset.filter(needs_attention=True)
+    return queryset
+
+
+def filter_printers(queryset, params):
+    printer_type = params.get('printer_type')
+    is_inkjet = params.get('is_inkjet')
+    location_id = _id(params, 'location')
+
+    if printer_type:
+        queryset = queryset.filter(printer_type=printer_type)
+    if is_inkjet:
+        queryset = queryset.filter(is_inkjet=True)
+    if location_id:
+        queryset = queryset.filter(location_id=location_id)
+    return queryset
+
+
+def filter_operations(queryset, params):
+    """Журнал операций: тип, расходник, локация (откуда или куда), период"""
+    operation_type = params.get('operation_type')
+    cartridge_id = _id(params, 'cartridge')
+    location_id = _id(params, 'location')
+    date_from = _date(params, 'date_from')
+    date_to = _date(params, 'date_to')
+
+    if operation_type:
+        queryset = queryset.filter(operation_type=operation_type)
+    if cartridge_id:
+        queryset = queryset.filter(cartridge_id=cartridge_id)
+    if location_id:
+        queryset = queryset.filter(Q(from_location_id=location_id) | Q(to_location_id=location_id))
+    # Границы суток в текущем часовом поясе: сравнение timestamp с датой
+    # (timestamp__date) идёт через функцию от столбца и не использует индекс
+    if date_from:
+        queryset = queryset.filter(timestamp__gte=_start_of_day(date_from))
+    if date_to:
+        queryset = queryset.filter(timestamp__lt=_start_of_day(date_to + timedelta(days=1)))
+    return queryset
+
+
+def _start_of_day(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
@@ -0,0 +1,207 @@
+"""
+Синтетический парк для нагрузочных проверок и замеров.
+
+Создаёт склад, сервисный центр, офисы с принтерами, модели, расходники
+и историю операций, которая проходит по таблице переходов: поступление,
+установка, снятие, заправка и списание после исчерпания лимита.
+При одном и том же seed данные получаются одинаковыми.
+"""
+import random
+import time
+from datetime import timedelta
+
+from django.db import transaction
+from django.utils import timezone
+
+from .imports import bulk_insert
+from .models import (
+    Cartridge, CartridgeModel, InventorySummary, Location, Operation, OperationDailyRollup, Printer,
+)
+from .reference import bump_reference_version
+from .services import bump_inventory_version
+
+
+MANUFACTURERS = ['HP', 'Canon', 'Kyocera', 'Xerox', 'Brother', 'Ricoh']
+# Сколько операций вставлять за раз
+FLEET_BATCH_SIZE = 20000
+
+
+class FleetReport:
+    def __init__(self, prefix):
+        self.prefix = prefix
+        self.locations = 0
+        self.models = 0
+        self.printers = 0
+        self.cartridges = 0
+        self.operations = 0
+        self.elapsed_ms = 0
+
+
+class Lifecycle:
+    """
+    История одного расходника. Интервалы случайные, но средний цикл
+    подобран так, чтобы за период набралось около quota операций.
+    """
+
+    def __init__(self, rng, cartridge_model, warehouse, service, printers, printer_load):
+        self.rng = rng
+        self.cartridge_model = cartridge_model
+        self.warehouse = warehouse
+        self.service = service
+        self.printers = printers
+        self.printer_load = printer_load
+
+    def run(self, start, end, quota):
+        rng = self.rng
+        wh, sc = self.warehouse, self.service
+        # Операций в цикле: установка, снятие, выдача и приём с заправки
+        cycle = (end - start) / max((quota - 1) / 4, 1)
+        events = [('receipt', wh, wh, None, start)]
+        state = {'status': 'in_stock', 'location': wh, 'printer': None, 'refills': 0, 'condition': 'new'}
+        t = start
+
+        while len(events) < quota:
+            t += cycle * rng.uniform(0.02, 0.2)
+            printer = rng.choice(self.printers)
+            location = printer.location
+            if t > end:
+                break
+            events.append(('install', wh, location, printer, t))
+            state.update(status='installed', location=location, printer=printer, condition='working')
+
+            t += cycle * rng.expovariate(1.0) * 0.6 / self.printer_load[printer.pk]
+            if t > end:
+                break
+            events.append(('remove', location, wh, None, t))
+            state.update(status='in_stock', location=wh, printer=None)
+
+            if state['refills'] >= self.cartridge_model.max_refills:
+                t += timedelta(hours=rng.uniform(1, 48))
+                if t <= end:
+                    events.append(('dispose', wh, wh, None, t))
+                    state.update(status='disposed')
+                break
+
+            t += timedelta(hours=rng.uniform(1, 72))
+            if t > end:
+                break
+            events.append(('issue_service', wh, sc, None, t))
+            state.update(status='at_service', location=sc)
+
+            t += timedelta(days=rng.uniform(2, 14))
+            if t > end:
+                break
+            events.append(('receive_service', sc, wh, None, t))
+            state.update(status='in_stock', location=wh, condition='refilled')
+            state['refills'] += 1
+
+        if state['status'] not in ('disposed', 'at_service') and rng.random() < 0.05:
+            state['condition'] = 'needs_repair'
+        return events, state
+
+
+def generate_fleet(user, locations=20, models=30, printers=200, cartridges=2000,
+                   operations=20000, days=730, seed=1, batch_size=FLEET_BATCH_SIZE, progress=None):
+    """
+    Создаёт синтетический парк одной транзакцией и пересобирает сводки.
+    Серийные номера и названия начинаются с префикса SYN<seed>, повторный
+    запуск с тем же seed отклоняется. Возвращает FleetReport.
+    """
+    started = time.perf_counter()
+    rng = random.Random(seed)
+    prefix = f'SYN{seed}'
+    report = FleetReport(prefix)
+    if Cartridge.objects.filter(serial_number__startswith=f'{prefix}-').exists():
+        raise ValueError(f'Парк с префиксом {prefix} уже создан, укажите другой seed')
+
+    end = timezone.now()
+    start = end - timedelta(days=days)
+    quota = max(operations // max(cartridges, 1), 1)
+
+    with transaction.atomic():
+        warehouse = Location.objects.create(name=f'{prefix} Склад', type='warehouse')
+        service = Location.objects.create(name=f'{prefix} Сервисный центр', type='service')
+        offices = Location.objects.bulk_create([
+            Location(name=f'{prefix} Офис {i:03}', type='office')
+            for i in range(1, max(locations - 2, 1) + 1)
+        ])
+        report.locations = len(offices) + 2
+
+        cartridge_models = CartridgeModel.objects.bulk_create([
+            CartridgeModel(
+                name=f'{prefix}-M{i:03}',
+                manufacturer=rng.choice(MANUFACTURERS),
+                max_refills=rng.randint(3, 8),
+            )
+            for i in range(1, models + 1)
+        ])
+        report.models = len(cartridge_models)
+
+        printer_types = [code for code, _ in Printer.PRINTER_TYPES]
+        fleet = Printer.objects.bulk_create([
+            Printer(
+                name=f'{prefix} Принтер {i:05}',
+                model=f'{rng.choice(MANUFACTURERS)} {rng.randint(100, 999)}',
+                serial_number=f'{prefix}-P{i:06}',
+                printer_type=rng.choice(printer_types),
+                location=rng.choice(offices),
+                installation_date=(start + timedelta(days=rng.uniform(0, days * 0.2))).date(),
+            )
+            for i in range(1, printers + 1)
+        ], batch_size=1000)
+        report.printers = len(fleet)
+        # Нагрузка принтера: во сколько раз быстрее среднего он расходует картриджи
+        printer_load = {printer.pk: rng.uniform(0.5, 2.0) for printer in fleet}
+
+        per_batch = max(batch_size // quota, 1)
+        for first in range(0, cartridges, per_batch):
+            histories = []
+            objects = []
+            for i in range(first, min(first + per_batch, cartridges)):
+                cartridge_model = rng.choice(cartridge_models)
+                lifecycle = Lifecycle(rng, cartridge_model, warehouse, service, fleet, printer_load)
+                born = start + timedelta(days=rng.uniform(0, days * 0.3))
+                events, state = lifecycle.run(born, end, quota)
+                histories.append(events)
+                objects.append(Cartridge(
+                    serial_number=f'{prefix}-{i:08}',
+                    consumable_type='drum' if rng.random() < 0.15 else 'cartridge',
+                    model=cartridge_model,
+                    current_status=state['status'],
+                    current_location=state['location'],
+                    installed_in_printer=state['printer'],
+                    date_of_introduction=born.date(),
+                    refill_count=state['refills'],
+                    condition=state['condition'],
+                    needs_attention=Cartridge.compute_needs_attention(
+                        state['condition'], state['refills'], cartridge_model.max_refills
+                    ),
+                ))
+            Cartridge.objects.bulk_create(objects)
+
+            operations_batch = [
+                Operation(
+                    operation_type=operation_type,
+                    cartridge_id=cartridge.pk,
+                    from_location=from_location,
+                    to_location=to_location,
+                    printer=printer,
+                    user=user,
+                    timestamp=timestamp,
+                )
+                for cartridge, events in zip(objects, histories)
+                for operation_type, from_location, to_location, printer, timestamp in events
+            ]
+            bulk_insert(Operation, operations_batch)
+            report.cartridges += len(objects)
+            report.operations += len(operations_batch)
+            if progress:
+                progress(report)
+
+        InventorySummary.rebuild()
+        OperationDailyRollup.rebuild()
+        bump_inventory_version()
+        bump_reference_version()
+
+    report.elapsed_ms = int((time.perf_counter() - started) * 1000)
+    return report
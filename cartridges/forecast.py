@@ -0,0 +1,274 @@
+"""
+Прогноз расхода картриджей по журналу операций.
+
+История установок читается одним запросом в столбцы NumPy. Затем для
+всего парка векторно, без циклов по принтерам, считаются сроки работы
+расходников, темп замен и дата следующей замены. Результат сохраняется
+в ConsumptionForecast и читается дашбордом и страницами принтеров.
+
+Установка заканчивается следующей операцией того же расходника: снятием,
+выдачей на заправку, перемещением или списанием. В расчёт входит только
+оперативный журнал, архив операций не читается.
+"""
+import time
+from datetime import datetime, timezone as dt_timezone
+
+import numpy as np
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .models import Cartridge, ConsumptionForecast, Operation
+from .transitions import TRANSITIONS
+
+
+# Меньше завершённых установок у пары принтер × модель — берётся срок по модели
+MIN_SAMPLES = 2
+FETCH_SIZE = 100_000
+SECONDS_PER_DAY = 86400.0
+
+# Операции, которыми может закончиться установка
+RELEASE_OPERATIONS = sorted(
+    transition.operation_type
+    for transition in TRANSITIONS.values()
+    if 'installed' in transition.from_statuses
+)
+
+# Коды операций в истории: установка, завершение установки, прочие
+INSTALL, RELEASE, OTHER = 1, 0, -1
+
+HISTORY_DTYPE = np.dtype([
+    ('printer', 'i8'),
+    ('cartridge', 'i8'),
+    ('kind', 'i1'),
+    ('ts', 'f8'),
+])
+
+
+class ForecastReport:
+    def __init__(self):
+        self.operations = 0
+        self.printer_rows = 0
+        self.model_rows = 0
+        self.load_ms = 0
+        self.compute_ms = 0
+        self.save_ms = 0
+
+
+def _epoch(column):
+    """Время операции в секундах Unix средствами СУБД"""
+    if connection.vendor == 'postgresql':
+        return f'EXTRACT(EPOCH FROM {column})'
+    if connection.vendor == 'mysql':
+        return f'UNIX_TIMESTAMP({column})'
+    # SQLite хранит время в UTC текстом; юлианский день сохраняет доли секунды
+    return f'(julianday({column}) - 2440587.5) * 86400.0'
+
+
+def _fetch(sql, params, dtype):
+    chunks = []
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(FETCH_SIZE)
+            if not rows:
+                break
+            chunks.append(np.fromiter(rows, dtype=dtype, count=len(rows)))
+    if not chunks:
+        return np.empty(0, dtype=dtype)
+    return np.concatenate(chunks)
+
+
+def load_history():
+    """
+    Установки и завершающие их операции в порядке записи (по id) и модели
+    расходников в виде массива model_by_cartridge[cartridge_id].
+
+    Журнал читается сплошным проходом без JOIN и фильтра по типу: выборка
+    по индексу типа операции на большой таблице медленнее, чем полный
+    просмотр, а лишние строки отбрасываются уже в массиве.
+    """
+    types = ['install'] + RELEASE_OPERATIONS
+    sql = (
+        f'SELECT COALESCE(printer_id, 0), cartridge_id, '
+        f"CASE WHEN operation_type = %s THEN {INSTALL} "
+        f"WHEN operation_type IN ({', '.join(['%s'] * len(RELEASE_OPERATIONS))}) THEN {RELEASE} "
+        f'ELSE {OTHER} END, {_epoch("timestamp")} '
+        f'FROM {Operation._meta.db_table} ORDER BY id'
+    )
+    history = _fetch(sql, types, HISTORY_DTYPE)
+    history = history[history['kind'] != OTHER]
+
+    cartridges = _fetch(
+        f'SELECT id, model_id FROM {Cartridge._meta.db_table}', [],
+        np.dtype([('id', 'i8'), ('model', 'i8')]),
+    )
+    model_by_cartridge = np.zeros(int(cartridges['id'].max(initial=0)) + 1, dtype='i8')
+    model_by_cartridge[cartridges['id']] = cartridges['model']
+    return history, model_by_cartridge
+
+
+def _group_mean(inverse, size, values, mask):
+    """Число и среднее значений по группам только для элементов mask"""
+    counts = np.bincount(inverse[mask], minlength=size)
+    sums = np.bincount(inverse[mask], weights=values[mask], minlength=size)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        means = np.where(counts > 0, sums / counts, np.nan)
+    return counts, means
+
+
+def _group_range(inverse, size, values):
+    """Минимум и максимум значений по группам (inf/-inf для пустых групп)"""
+    low = np.full(size, np.inf)
+    high = np.full(size, -np.inf)
+    np.minimum.at(low, inverse, values)
+    np.maximum.at(high, inverse, values)
+    return low, high
+
+
+def compute(history, model_by_cartridge, now):
+    """
+    Векторный расчёт по всей истории. Возвращает словари столбцов
+    для пар принтер × модель и для моделей.
+    """
+    # Одна стабильная сортировка по составному ключу (расходник, секунда);
+    # история приходит в порядке id, поэтому операции одной секунды остаются
+    # в порядке записи
+    order = np.argsort((history['cartridge'] << 32) | history['ts'].astype('i8'), kind='stable')
+    # Дальше работа идёт с непрерывными столбцами, а не с полями записей
+    cartridge = history['cartridge'][order]
+    ts = history['ts'][order]
+    is_install = history['kind'][order] == INSTALL
+
+    # Установка закрыта, если у того же расходника есть следующая операция
+    has_next = np.zeros(len(order), dtype=bool)
+    has_next[:-1] = cartridge[1:] == cartridge[:-1]
+    duration = np.zeros(len(order))
+    duration[:-1] = (ts[1:] - ts[:-1]) / SECONDS_PER_DAY
+
+    install_order = order[is_install]
+    printer = history['printer'][install_order]
+    model = model_by_cartridge[history['cartridge'][install_order]]
+    install_ts = ts[is_install]
+    closed = has_next[is_install]
+    days = duration[is_install]
+
+    # Модели
+    model_ids, model_inv = np.unique(model, return_inverse=True)
+    model_installs = np.bincount(model_inv, minlength=len(model_ids))
+    model_samples, model_mean = _group_mean(model_inv, len(model_ids), days, closed)
+    model_first, model_last = _group_range(model_inv, len(model_ids), install_ts)
+
+    # Пары принтер × модель (установки без принтера не учитываются)
+    with_printer = printer > 0
+    model_span = int(model_ids[-1]) + 1 if len(model_ids) else 1
+    pair_keys, pair_inv = np.unique(printer[with_printer] * model_span + model[with_printer], return_inverse=True)
+    pair_printer, pair_model = np.divmod(pair_keys, model_span)
+    size = len(pair_keys)
+    pair_ts = install_ts[with_printer]
+    pair_open = ~closed[with_printer]
+
+    pair_installs = np.bincount(pair_inv, minlength=size)
+    pair_samples, pair_mean = _group_mean(pair_inv, size, days[with_printer], closed[with_printer])
+    pair_first, pair_last = _group_range(pair_inv, size, pair_ts)
+    # Установка, которая работает сейчас
+    _, pair_current = _group_range(pair_inv[pair_open], size, pair_ts[pair_open])
+
+    fallback = model_mean[np.searchsorted(model_ids, pair_model)]
+    expected = np.where(pair_samples >= MIN_SAMPLES, pair_mean, fallback)
+    next_replacement = np.where(
+        np.isfinite(pair_current) & np.isfinite(expected),
+        pair_current + expected * SECONDS_PER_DAY,
+        np.nan,
+    )
+
+    def per_month(count, first):
+        span = np.maximum((now - first) / SECONDS_PER_DAY, 1.0)
+        return count / span * 30.0
+
+    return {
+        'pairs': {
+            'printer': pair_printer,
+            'model': pair_model,
+            'installs': pair_installs,
+            'samples': pair_samples,
+            'mean_days': np.where(pair_samples > 0, pair_mean, np.nan),
+            'per_month': per_month(pair_installs, pair_first),
+            'last_install': pair_last,
+            'next_replacement': next_replacement,
+        },
+        'models': {
+            'model': model_ids,
+            'installs': model_installs,
+            'samples': model_samples,
+            'mean_days': model_mean,
+            'per_month': per_month(model_installs, model_first),
+            'last_install': model_last,
+        },
+    }
+
+
+def _datetime(value):
+    if not np.isfinite(value):
+        return None
+    return datetime.fromtimestamp(float(value), tz=dt_timezone.utc)
+
+
+def _float(value):
+    return float(value) if np.isfinite(value) else None
+
+
+def save(result, computed_at):
+    """Заменяет сохранённые прогнозы новыми, возвращает число строк"""
+    pairs = result['pairs']
+    models = result['models']
+    forecasts = [
+        ConsumptionForecast(
+            printer_id=int(pairs['printer'][i]),
+            cartridge_model_id=int(pairs['model'][i]),
+            installs=int(pairs['installs'][i]),
+            samples=int(pairs['samples'][i]),
+            mean_days=_float(pairs['mean_days'][i]),
+            per_month=float(pairs['per_month'][i]),
+            last_install=_datetime(pairs['last_install'][i]),
+            next_replacement=_datetime(pairs['next_replacement'][i]),
+            computed_at=computed_at,
+        )
+        for i in range(len(pairs['printer']))
+    ]
+    forecasts += [
+        ConsumptionForecast(
+            printer_id=None,
+            cartridge_model_id=int(models['model'][i]),
+            installs=int(models['installs'][i]),
+            samples=int(models['samples'][i]),
+            mean_days=_float(models['mean_days'][i]),
+            per_month=float(models['per_month'][i]),
+            last_install=_datetime(models['last_install'][i]),
+            computed_at=computed_at,
+        )
+        for i in range(len(models['model']))
+    ]
+    with transaction.atomic():
+        ConsumptionForecast.objects.all().delete()
+        ConsumptionForecast.objects.bulk_create(forecasts, batch_size=1000)
+    return len(pairs['printer']), len(models['model'])
+
+
+def run_forecast():
+    """Загружает историю, считает и сохраняет прогнозы; возвращает ForecastReport"""
+    report = ForecastReport()
+    computed_at = timezone.now()
+
+    started = time.perf_counter()
+    history, model_by_cartridge = load_history()
+    report.operations = len(history)
+    report.load_ms = int((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    result = compute(history, model_by_cartridge, computed_at.timestamp())
+    report.compute_ms = int((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    report.printer_rows, report.model_rows = save(result, computed_at)
+    report.save_ms = int((time.perf_counter() - started) * 1000)
+    return report
@@ -1,5 +1,9 @@
 from django import forms
-from .models import Cartridge, Operation, CartridgeModel, Printer
+from django.urls import reverse
+from .models import Cartridge, Operation, Printer
+from .reference import get_reference_data
+
+BLANK_CHOICE = ('', '---------')
 
 class CartridgeForm(forms.ModelForm):
     class Meta:
@@ -19,7 +23,45 @@ class CartridgeForm(forms.ModelForm):
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['model'].queryset = CartridgeModel.objects.all().order_by('manufacturer', 'name')
+        # Варианты берутся из справочников в памяти; при сохранении
+        # из БД читается только выбранная запись
+        data = get_reference_data()
+        self.fields['model'].choices = [BLANK_CHOICE] + data.model_choices()
+        self.fields['current_location'].choices = [BLANK_CHOICE] + data.location_choices()
+
+class AutocompleteSelect(forms.Select):
+    """
+    <select> только с выбранным значением: варианты подгружаются
+    автодополнением с url_name, поэтому размер страницы не зависит
+    от числа записей. forward — {id поля формы: параметр запроса},
+    значения которых передаются в поиск.
+    """
+
+    def __init__(self, url_name, forward=None, attrs=None):
+        super().__init__(attrs)
+        self.url_name = url_name
+        self.forward = forward or {}
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        widget_attrs = context['widget']['attrs']
+        widget_attrs['data-autocomplete-url'] = reverse(self.url_name)
+        if self.forward:
+            widget_attrs['data-autocomplete-forward'] = ','.join(
+                f'{field_id}:{param}' for field_id, param in self.forward.items()
+            )
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [v for v in value if str(v).isdigit()]
+        options = [self.create_option(name, '', BLANK_CHOICE[1], not selected, 0)]
+        if selected:
+            # Читается только выбранная запись, а не весь queryset
+            field = self.choices.field
+            for index, obj in enumerate(self.choices.queryset.filter(pk__in=selected), 1):
+                options.append(self.create_option(name, obj.pk, field.label_from_instance(obj), True, index))
+        return [(None, options, 0)]
+
 
 class OperationForm(forms.ModelForm):
     class Meta:
@@ -27,27 +69,31 @@ class OperationForm(forms.ModelForm):
         fields = ['operation_type', 'cartridge', 'from_location', 'to_location', 'printer', 'reason', 'notes']
         widgets = {
             'operation_type': forms.Select(attrs={'class': 'form-control', 'id': 'id_operation_type'}),
-            'cartridge': forms.Select(attrs={'class': 'form-control'}),
+            'cartridge': AutocompleteSelect(
+                'cartridges:cartridge_lookup',
+                forward={'id_operation_type': 'operation_type'},
+                attrs={'class': 'form-control', 'id': 'id_cartridge'},
+            ),
             'from_location': forms.Select(attrs={'class': 'form-control', 'id': 'id_from_location'}),
             'to_location': forms.Select(attrs={'class': 'form-control', 'id': 'id_to_location'}),
-            'printer': forms.Select(attrs={'class': 'form-control', 'id': 'id_printer'}),
+            'printer': AutocompleteSelect(
+                'cartridges:printer_lookup',
+                forward={'id_to_location': 'location_id'},
+                attrs={'class': 'form-control', 'id': 'id_printer'},
+            ),
             'reason': forms.Textarea(attrs={'rows': 2, 'class': 'form-control'}),
             'notes': forms.Textarea(attrs={'rows': 3, 'class': 'form-control'}),
         }
     
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.fields['cartridge'].queryset = Cartridge.objects.exclude(current_status='disposed')
+        # Проверка выбранного значения — один запрос по первичному ключу
+        self.fields['cartridge'].queryset = Cartridge.objects.select_related('model').exclude(current_status='disposed')
         self.fields['printer'].queryset = Printer.objects.filter(is_active=True)
         
-        
-        if 'to_location' in self.initial:
-            location_id = self.initial['to_location']
-            if location_id:
-                self.fields['printer'].queryset = Printer.objects.filter(
-                    location_id=location_id, 
-                    is_active=True
-                )
+        location_choices = [BLANK_CHOICE] + get_reference_data().location_choices()
+        self.fields['from_location'].choices = location_choices
+        self.fields['to_location'].choices = location_choices
 
 class PrinterForm(forms.ModelForm):
     class Meta:
@@ -71,6 +117,8 @@ class PrinterForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
        
+        self.fields['location'].choices = [BLANK_CHOICE] + get_reference_data().location_choices()
+        
         if self.instance and self.instance.printer_type == 'inkjet':
             self.fields['is_inkjet'].initial = True
 
@@ -82,4 +130,17 @@ class CartridgeConditionForm(forms.ModelForm):
         fields = ['condition']
         widgets = {
             'condition' : forms.Select(attrs={'class': 'form-control form-control-sm'}),
-        }
\ No newline at end of file
+        }
+
+class ImportForm(forms.Form):
+    """Загрузка CSV-файла для импорта"""
+    KIND_CHOICES = [
+        ('cartridges', 'Расходники'),
+        ('printers', 'Принтеры'),
+    ]
+
+    kind = forms.ChoiceField(choices=KIND_CHOICES, label='Что импортировать',
+                             widget=forms.Select(attrs={'class': 'form-select'}))
+    file = forms.FileField(label='CSV-файл', widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv'}))
+    dry_run = forms.BooleanField(required=False, initial=True, label='Только проверить, не сохранять',
+                                 widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}))
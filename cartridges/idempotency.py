@@ -0,0 +1,203 @@
+"""
+Ключи идемпотентности для запросов, создающих операции.
+
+Сканер на нестабильном Wi-Fi повторяет POST, не дождавшись ответа, и
+каждый повтор создавал бы ещё одну операцию (а приём с заправки ещё раз
+увеличивал бы счётчик заправок). Клиент передаёт ключ в заголовке
+Idempotency-Key (форма — в поле idempotency_key); представление,
+помеченное декоратором idempotent, выполняется для ключа один раз,
+а повтор получает сохранённый ответ одним запросом по уникальному индексу.
+
+Ключ резервируется до выполнения представления вместе со случайным
+токеном запроса. Пока первый запрос выполняется, повтор получает 409
+и может повторить позже. Ответы с кодом 5xx и исключения не сохраняются:
+резерв снимается, и запрос можно повторить с тем же ключом. Сохраняет
+ответ и снимает резерв только запрос с токеном резерва, поэтому запрос,
+чей резерв после LOCK_TIMEOUT занял повтор, его не затрёт. Ключи
+хранятся KEY_TTL, после чего удаляются командой purge_idempotency_keys.
+"""
+import hashlib
+import uuid
+from datetime import timedelta
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from .models import IdempotencyKey
+
+
+KEY_HEADER = 'Idempotency-Key'
+KEY_FIELD = 'idempotency_key'
+KEY_MAX_LENGTH = 255
+KEY_TTL = timedelta(hours=24)
+# Резерв без ответа дольше этого срока оставлен упавшим воркером. Срок
+# намного больше, чем может выполняться любое представление (тяжёлые
+# операции уходят в фоновые задачи), чтобы повтор не занял резерв
+# запроса, который ещё выполняется
+LOCK_TIMEOUT = timedelta(minutes=15)
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+_FORM_TYPES = ('application/x-www-form-urlencoded', 'multipart/form-data')
+# Поля формы, которые меняются между повторами одного и того же запроса
+_VOLATILE_FIELDS = ('csrfmiddlewaretoken', KEY_FIELD)
+
+
+def _key(request):
+    if request.method != 'POST':
+        return ''
+    return request.headers.get(KEY_HEADER) or request.POST.get(KEY_FIELD) or ''
+
+
+def fingerprint(request):
+    """Хэш метода, пути и тела запроса"""
+    digest = hashlib.sha256(f'{request.method} {request.path}\n'.encode())
+    if request.content_type in _FORM_TYPES:
+        # Границы multipart различаются между повторами, поэтому
+        # сравниваются поля формы, а не байты тела
+        for name, values in sorted(request.POST.lists()):
+            if name not in _VOLATILE_FIELDS:
+                digest.update(f'{name}={values!r}\n'.encode())
+    else:
+        digest.update(request.body)
+    return digest.hexdigest()
+
+
+def _error(message, status):
+    return JsonResponse({'success': False, 'error': message}, status=status)
+
+
+def _in_progress():
+    response = _error('Запрос с этим ключом ещё выполняется', 409)
+    response['Retry-After'] = '1'
+    return response
+
+
+def _replay(record):
+    response = HttpResponse(bytes(record.body), status=record.status_code, content_type=record.content_type)
+    if record.location:
+        response['Location'] = record.location
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def reserve(user, key, request_fingerprint, token):
+    """
+    Резервирует ключ за запросом с токеном token. Возвращает (None, None),
+    если представление нужно выполнить, или (запись, None) для повтора,
+    или (None, ответ с ошибкой).
+    """
+    now = timezone.now()
+    for _ in range(2):
+        record = IdempotencyKey.objects.filter(user=user, key=key).first()
+        if record is not None:
+            expired = record.created_at < now - KEY_TTL or (
+                not record.is_complete and record.created_at < now - LOCK_TIMEOUT
+            )
+            if not expired:
+                if record.fingerprint != request_fingerprint:
+                    return None, _error('Ключ идемпотентности уже использован с другим запросом', 422)
+                if not record.is_complete:
+                    return None, _in_progress()
+                return record, None
+            IdempotencyKey.objects.filter(pk=record.pk, token=record.token).delete()
+        try:
+            with transaction.atomic():
+                IdempotencyKey.objects.create(
+                    user=user, key=key, fingerprint=request_fingerprint, token=token, created_at=now
+                )
+            return None, None
+        except IntegrityError:
+            # Параллельный запрос с тем же ключом успел первым: читаем его запись
+            continue
+    return None, _in_progress()
+
+
+def _reserved(user, key, token):
+    return IdempotencyKey.objects.filter(user=user, key=key, token=token, status_code__isnull=True)
+
+
+def complete(user, key, token, response):
+    """Сохраняет ответ для повторов; ответ 5xx снимает резерв"""
+    reserved = _reserved(user, key, token)
+    if response.status_code >= 500 or response.streaming:
+        reserved.delete()
+        return
+    reserved.update(
+        status_code=response.status_code,
+        content_type=response.get('Content-Type', ''),
+        location=response.get('Location', ''),
+        body=response.content,
+    )
+
+
+def release(user, key, token):
+    _reserved(user, key, token).delete()
+
+
+def _check_key(key):
+    if len(key) > KEY_MAX_LENGTH or not key.isprintable():
+        return _error('Некорректный ключ идемпотентности', 400)
+    return None
+
+
+def idempotent(view):
+    """
+    Выполняет представление один раз на ключ идемпотентности пользователя.
+    Запросы без ключа выполняются как обычно. Ставится после login_required.
+    """
+    if iscoroutinefunction(view):
+        async def wrapper(request, *args, **kwargs):
+            key = _key(request)
+            if not key:
+                return await view(request, *args, **kwargs)
+            invalid = _check_key(key)
+            if invalid:
+                return invalid
+            user = await request.auser()
+            token = uuid.uuid4().hex
+            record, error = await sync_to_async(reserve)(user, key, fingerprint(request), token)
+            if error:
+                return error
+            if record:
+                return _replay(record)
+            try:
+                response = await view(request, *args, **kwargs)
+            except BaseException:
+                await sync_to_async(release)(user, key, token)
+                raise
+            await sync_to_async(complete)(user, key, token, response)
+            return response
+
+        markcoroutinefunction(wrapper)
+    else:
+        def wrapper(request, *args, **kwargs):
+            key = _key(request)
+            if not key:
+                return view(request, *args, **kwargs)
+            invalid = _check_key(key)
+            if invalid:
+                return invalid
+            token = uuid.uuid4().hex
+            record, error = reserve(request.user, key, fingerprint(request), token)
+            if error:
+                return error
+            if record:
+                return _replay(record)
+            try:
+                response = view(request, *args, **kwargs)
+            except BaseException:
+                release(request.user, key, token)
+                raise
+            complete(request.user, key, token, response)
+            return response
+
+    return wraps(view)(wrapper)
+
+
+def purge_expired():
+    """Удаляет ключи старше KEY_TTL; возвращает их число"""
+    deleted, _ = IdempotencyKey.objects.filter(created_at__lt=timezone.now() - KEY_TTL).delete()
+    return deleted
@@ -0,0 +1,411 @@
+"""
+Импорт расходников и принтеров из CSV.
+
+Файл читается потоком и обрабатывается пачками: названия моделей
+и локаций разрешаются по справочникам в памяти, уже занятые серийные
+номера проверяются одним запросом на пачку. Расходники вставляются через
+executemany (на PostgreSQL — через COPY) вместе с операциями поступления
+и приращениями сводки остатков. Импорт атомарный: при любой ошибке
+в файле ничего не сохраняется. В режиме проверки (dry_run) файл только
+валидируется.
+"""
+import csv
+import datetime
+import io
+import time
+from collections import defaultdict
+from itertools import chain, islice
+
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+
+from .models import Cartridge, CartridgeModel, InventorySummary, Location, Operation, Printer
+from .reference import bump_reference_version
+from .services import bump_inventory_version
+
+
+IMPORT_BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 200
+IMPORT_REASON = 'Первоначальное поступление в систему (импорт)'
+
+
+class ImportReport:
+    """Итог импорта: число строк, созданных объектов и ошибки по строкам файла"""
+
+    def __init__(self, dry_run=False):
+        self.dry_run = dry_run
+        self.rows = 0
+        self.created = 0
+        self.error_count = 0
+        self.errors = []
+        self.elapsed_ms = 0
+
+    def add_error(self, line, message):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append(f'Строка {line}: {message}')
+
+    @property
+    def ok(self):
+        return self.error_count == 0
+
+
+def _key(value):
+    return ' '.join(str(value).lower().split())
+
+
+class NameLookup:
+    """Поиск id по названию без учёта регистра; неоднозначные названия отклоняются"""
+
+    def __init__(self, pairs, label):
+        self.label = label
+        self.ids = {}
+        self.ambiguous = set()
+        for name, pk in pairs:
+            key = _key(name)
+            if key in self.ids and self.ids[key] != pk:
+                self.ambiguous.add(key)
+            self.ids[key] = pk
+
+    def get(self, name):
+        key = _key(name)
+        if key in self.ambiguous:
+            raise ValueError(f'{self.label} "{name}" встречается несколько раз, уточните название')
+        try:
+            return self.ids[key]
+        except KeyError:
+            raise ValueError(f'{self.label} "{name}" не найдена')
+
+
+def _choice(value, choices, label):
+    key = _key(value)
+    for code, title in choices:
+        if key in (code, _key(title)):
+            return code
+    raise ValueError(f'Недопустимое значение поля "{label}": {value}')
+
+
+def _date(value, label):
+    for date_format in ('%d.%m.%Y', '%Y-%m-%d'):
+        try:
+            return datetime.datetime.strptime(value, date_format).date()
+        except ValueError:
+            continue
+    raise ValueError(f'Некорректная дата в поле "{label}": {value}')
+
+
+def _bool(value):
+    return _key(value) in ('1', 'да', 'true', 'yes', 'y', '+')
+
+
+class BaseImporter:
+    """Разбор строк одного вида объектов. Заголовки — коды полей или названия колонок выгрузки"""
+
+    model = None
+    headers = {}
+    required = ()
+
+    def parse(self, row):
+        raise NotImplementedError
+
+    def existing_serials(self, serial_numbers):
+        return set(
+            self.model.objects.filter(serial_number__in=serial_numbers)
+            .values_list('serial_number', flat=True)
+        )
+
+    def save(self, objects):
+        bulk_insert(self.model, objects)
+
+
+class CartridgeImporter(BaseImporter):
+    model = Cartridge
+    headers = {
+        'serial_number': ('серийный номер',),
+        'consumable_type': ('тип',),
+        'manufacturer': ('производитель',),
+        'model': ('модель',),
+        'location': ('локация',),
+        'condition': ('состояние',),
+        'refill_count': ('заправок',),
+        'date_of_introduction': ('дата ввода',),
+        'notes': ('примечания',),
+    }
+    required = ('serial_number', 'model', 'location')
+
+    def __init__(self, user):
+        self.user = user
+        self.today = timezone.localdate()
+        self.locations = NameLookup(Location.objects.values_list('name', 'id'), 'Локация')
+        models = list(CartridgeModel.objects.values_list('manufacturer', 'name', 'id', 'max_refills'))
+        self.max_refills = {pk: max_refills for _, _, pk, max_refills in models}
+        self.models = NameLookup(
+            chain(
+                ((f'{manufacturer} {name}', pk) for manufacturer, name, pk, _ in models),
+                ((name, pk) for _, name, pk, _ in models),
+            ),
+            'Модель',
+        )
+
+    def parse(self, row):
+        model_name = row['model']
+        if row.get('manufacturer'):
+            model_name = f"{row['manufacturer']} {model_name}"
+
+        refill_count = row.get('refill_count') or '0'
+        if not refill_count.isdigit():
+            raise ValueError(f'Некорректное количество заправок: {refill_count}')
+
+        model_id = self.models.get(model_name)
+        condition = _choice(row.get('condition') or 'new', Cartridge.CONDITION_CHOICES, 'Состояние')
+        return Cartridge(
+            serial_number=row['serial_number'],
+            consumable_type=_choice(row.get('consumable_type') or 'cartridge', Cartridge.CONSUMABLE_TYPES, 'Тип'),
+            model_id=model_id,
+            current_location_id=self.locations.get(row['location']),
+            current_status='in_stock',
+            condition=condition,
+            refill_count=int(refill_count),
+            needs_attention=Cartridge.compute_needs_attention(
+                condition, int(refill_count), self.max_refills[model_id]
+            ),
+            date_of_introduction=(
+                _date(row['date_of_introduction'], 'Дата ввода') if row.get('date_of_introduction') else self.today
+            ),
+            notes=row.get('notes', ''),
+        )
+
+    def save(self, cartridges):
+        # bulk_create и COPY не вызывают сигналы: сводку и операции ведём сами
+        bulk_insert(Cartridge, cartridges)
+        if cartridges and cartridges[0].pk is None:
+            ids = dict(
+                Cartridge.objects.filter(serial_number__in=[c.serial_number for c in cartridges])
+                .values_list('serial_number', 'id')
+            )
+            for cartridge in cartridges:
+                cartridge.pk = ids[cartridge.serial_number]
+
+        now = timezone.now()
+        bulk_insert(Operation, [
+            Operation(
+                operation_type='receipt',
+                cartridge_id=cartridge.pk,
+                from_location_id=cartridge.current_location_id,
+                to_location_id=cartridge.current_location_id,
+                user=self.user,
+                timestamp=now,
+                reason=IMPORT_REASON,
+            )
+            for cartridge in cartridges
+        ])
+
+        deltas = defaultdict(int)
+        for cartridge in cartridges:
+            deltas[InventorySummary.key_for(cartridge)] += 1
+        InventorySummary.apply_deltas(deltas)
+
+
+class PrinterImporter(BaseImporter):
+    model = Printer
+    headers = {
+        'name': ('название',),
+        'model': ('модель',),
+        'serial_number': ('серийный номер',),
+        'printer_type': ('тип',),
+        'is_inkjet': ('на чернилах',),
+        'location': ('локация',),
+        'installation_date': ('дата установки',),
+        'is_active': ('активен',),
+        'notes': ('примечания',),
+    }
+    required = ('name', 'model', 'serial_number', 'printer_type', 'location')
+
+    def __init__(self, user=None):
+        self.today = timezone.localdate()
+        self.locations = NameLookup(Location.objects.values_list('name', 'id'), 'Локация')
+
+    def parse(self, row):
+        printer_type = _choice(row['printer_type'], Printer.PRINTER_TYPES, 'Тип')
+        return Printer(
+            name=row['name'],
+            model=row['model'],
+            serial_number=row['serial_number'],
+            printer_type=printer_type,
+            is_inkjet=_bool(row['is_inkjet']) if row.get('is_inkjet') else printer_type == 'inkjet',
+            location_id=self.locations.get(row['location']),
+            installation_date=(
+                _date(row['installation_date'], 'Дата установки') if row.get('installation_date') else self.today
+            ),
+            is_active=_bool(row['is_active']) if row.get('is_active') else True,
+            notes=row.get('notes', ''),
+        )
+
+    def save(self, printers):
+        bulk_insert(Printer, printers)
+        # Сигналы не срабатывают, справочники сбрасываем сами
+        bump_reference_version()
+
+
+IMPORTERS = {
+    'cartridges': CartridgeImporter,
+    'printers': PrinterImporter,
+}
+
+
+def _copy_value(value):
+    if value is None:
+        return '\\N'
+    return (
+        str(value).replace('\\', '\\\\').replace('\t', '\\t')
+        .replace('\n', '\\n').replace('\r', '\\r')
+    )
+
+
+def _copy_insert(model, objects):
+    """
+    Вставка через COPY FROM STDIN. Первичные ключи заранее берутся
+    из последовательности таблицы, чтобы на них могли ссылаться операции.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    meta = model._meta
+    fields = meta.concrete_fields
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT nextval(pg_get_serial_sequence(%s, %s)) FROM generate_series(1, %s)',
+            [meta.db_table, meta.pk.column, len(objects)],
+        )
+        for obj, (pk,) in zip(objects, cursor.fetchall()):
+            obj.pk = pk
+
+        buffer = io.StringIO()
+        for obj in objects:
+            values = (field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields)
+            buffer.write('\t'.join(_copy_value(value) for value in values) + '\n')
+
+        columns = ', '.join(quote(field.column) for field in fields)
+        sql = f'COPY {quote(meta.db_table)} ({columns}) FROM STDIN'
+        if hasattr(cursor, 'copy_expert'):
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+        else:
+            # psycopg 3
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def _executemany_insert(model, objects):
+    """
+    Вставка одним подготовленным INSERT через executemany: на SQLite это
+    намного быстрее bulk_create, который дробит пачку по лимиту параметров.
+    Первичные ключи не возвращаются.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    meta = model._meta
+    fields = [field for field in meta.concrete_fields if not field.primary_key]
+    quote = connection.ops.quote_name
+    sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+        quote(meta.db_table),
+        ', '.join(quote(field.column) for field in fields),
+        ', '.join(['%s'] * len(fields)),
+    )
+    rows = [
+        [field.get_db_prep_save(field.pre_save(obj, True), connection) for field in fields]
+        for obj in objects
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(sql, rows)
+
+
+def bulk_insert(model, objects):
+    """Вставка пачки объектов; на PostgreSQL у объектов появляются первичные ключи"""
+    if not objects:
+        return
+    if connections[DEFAULT_DB_ALIAS].vendor == 'postgresql':
+        _copy_insert(model, objects)
+    else:
+        _executemany_insert(model, objects)
+
+
+def _reader(stream):
+    """csv.reader с разделителем «;» или «,» по строке заголовка"""
+    header = stream.readline()
+    delimiter = ';' if header.count(';') >= header.count(',') else ','
+    return csv.reader(chain([header], stream), delimiter=delimiter)
+
+
+def _column_map(importer, header):
+    aliases = {}
+    for field, titles in importer.headers.items():
+        for title in (field, *titles):
+            aliases[title] = field
+    return {
+        position: aliases[_key(title)]
+        for position, title in enumerate(header)
+        if _key(title) in aliases
+    }
+
+
+def run_import(importer, stream, dry_run=False, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Импортирует текстовый поток CSV через importer и возвращает ImportReport.
+    Ошибка в любой строке отменяет весь импорт.
+    """
+    report = ImportReport(dry_run)
+    started = time.monotonic()
+    reader = _reader(stream)
+
+    header = next(reader, None)
+    columns = _column_map(importer, header or [])
+    missing = [field for field in importer.required if field not in columns.values()]
+    if missing:
+        report.add_error(1, f'Нет обязательных колонок: {", ".join(missing)}')
+        return report
+
+    seen = set()
+    with transaction.atomic():
+        while True:
+            batch = list(islice(reader, batch_size))
+            if not batch:
+                break
+
+            parsed = []
+            for values in batch:
+                line = report.rows + 2
+                report.rows += 1
+                if not any(value.strip() for value in values):
+                    continue
+                row = {columns[i]: value.strip() for i, value in enumerate(values) if i in columns}
+                empty = [field for field in importer.required if not row.get(field)]
+                if empty:
+                    report.add_error(line, f'Не заполнены поля: {", ".join(empty)}')
+                    continue
+                if row['serial_number'] in seen:
+                    report.add_error(line, f'Серийный номер {row["serial_number"]} повторяется в файле')
+                    continue
+                seen.add(row['serial_number'])
+                try:
+                    parsed.append((line, importer.parse(row)))
+                except ValueError as e:
+                    report.add_error(line, str(e))
+
+            taken = importer.existing_serials([obj.serial_number for _, obj in parsed])
+            for line, obj in parsed:
+                if obj.serial_number in taken:
+                    report.add_error(line, f'Серийный номер {obj.serial_number} уже есть в базе')
+
+            # После первой ошибки файл только проверяется до конца
+            if not dry_run and report.ok:
+                objects = [obj for _, obj in parsed]
+                importer.save(objects)
+                report.created += len(objects)
+
+        if dry_run or not report.ok:
+            report.created = 0
+            transaction.set_rollback(True)
+        elif report.created:
+            bump_inventory_version()
+
+    report.elapsed_ms = int((time.monotonic() - started) * 1000)
+    return report
@@ -0,0 +1,377 @@
+"""
+Фоновые задачи в базе данных.
+
+Представление ставит задачу в очередь функцией enqueue и сразу отвечает
+номером задачи; интерфейс опрашивает её статус. Команда run_jobs забирает
+задачи из таблицы Job и выполняет их в пуле потоков или процессов.
+
+Забрать задачу может только один воркер. На PostgreSQL следующая задача
+выбирается SELECT ... FOR UPDATE SKIP LOCKED, и воркеры не ждут друг
+друга. SQLite блокировок строк не поддерживает: там задачу получает тот,
+чей UPDATE с условием status='queued' изменил строку.
+
+Упавшая задача повторяется с растущей паузой, пока не кончатся попытки.
+Воркер отмечает свои задачи раз в HEARTBEAT_INTERVAL секунд; задача без
+отметки дольше STALE_AFTER (воркер остановлен или упал) возвращается
+в очередь.
+"""
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+from multiprocessing import get_context
+
+from django.db import DatabaseError, close_old_connections, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import imports, services
+from .models import Cartridge, Job, Location
+
+
+logger = logging.getLogger(__name__)
+
+# Пауза перед повтором: RETRY_DELAY * 2 ** (номер попытки - 1)
+RETRY_DELAY = timedelta(seconds=30)
+HEARTBEAT_INTERVAL = 30
+STALE_AFTER = timedelta(minutes=10)
+# Прогресс пишется в базу не чаще раза в PROGRESS_INTERVAL секунд
+PROGRESS_INTERVAL = 1.0
+# Повторы записи итога задачи при ошибке базы: пауза SAVE_RETRY_DELAY * 2 ** n
+SAVE_ATTEMPTS = 5
+SAVE_RETRY_DELAY = 0.2
+
+_registry = {}
+
+
+class JobError(Exception):
+    """Ошибка, после которой повтор не поможет: задача сразу завершается с ошибкой"""
+
+
+def job(name):
+    """Регистрирует функцию задачи; она получает JobContext и параметры задачи"""
+    def decorator(func):
+        _registry[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, user=None, max_attempts=3, **params):
+    """Ставит задачу в очередь; params должны сериализоваться в JSON"""
+    if name not in _registry:
+        raise ValueError(f'Неизвестная задача: {name}')
+    return Job.objects.create(name=name, user=user, params=params, max_attempts=max_attempts)
+
+
+class JobContext:
+    """То, что задача знает о себе: пользователь, номер попытки и прогресс"""
+
+    def __init__(self, job):
+        self.job = job
+        self._saved_at = 0.0
+
+    @property
+    def user(self):
+        return self.job.user
+
+    @property
+    def is_last_attempt(self):
+        return self.job.attempts >= self.job.max_attempts
+
+    def progress(self, force=False, **values):
+        self.job.progress.update(values)
+        now = time.monotonic()
+        if force or now - self._saved_at >= PROGRESS_INTERVAL:
+            Job.objects.filter(pk=self.job.pk).update(progress=self.job.progress)
+            self._saved_at = now
+
+
+def claim(worker):
+    """Забирает следующую готовую задачу и возвращает её id (или None)"""
+    now = timezone.now()
+    queued = Job.objects.filter(status='queued', run_after__lte=now).order_by('run_after', 'id')
+    running = dict(
+        status='running', worker=worker, attempts=F('attempts') + 1,
+        started_at=now, heartbeat_at=now, finished_at=None,
+    )
+
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            pk = queued.select_for_update(skip_locked=True).values_list('pk', flat=True).first()
+            if pk is not None:
+                Job.objects.filter(pk=pk).update(**running)
+            return pk
+
+    # Без блокировок строк: UPDATE с условием на статус атомарен, и если
+    # задачу успел забрать другой воркер, берётся следующая
+    for pk in queued.values_list('pk', flat=True)[:10]:
+        if Job.objects.filter(pk=pk, status='queued').update(**running):
+            return pk
+    return None
+
+
+def _save(job_id, **fields):
+    """
+    Записывает итог задачи. Ошибка базы (на SQLite — занятая другим
+    воркером запись) повторяется, чтобы задача не осталась в статусе
+    running до возврата брошенных задач.
+    """
+    for attempt in range(SAVE_ATTEMPTS):
+        try:
+            return Job.objects.filter(pk=job_id).update(**fields)
+        except DatabaseError:
+            if attempt == SAVE_ATTEMPTS - 1:
+                raise
+            logger.warning('job #%d: saving state failed, retrying', job_id, exc_info=True)
+            time.sleep(SAVE_RETRY_DELAY * 2 ** attempt)
+
+
+def run(job_id):
+    """Выполняет забранную задачу в текущем соединении и записывает результат или ошибку"""
+    job = Job.objects.select_related('user').get(pk=job_id)
+    context = JobContext(job)
+    started = time.monotonic()
+    try:
+        func = _registry.get(job.name)
+        if func is None:
+            raise JobError(f'Неизвестная задача: {job.name}')
+        result = func(context, **job.params)
+    except Exception as e:
+        now = timezone.now()
+        retry = not isinstance(e, JobError) and job.attempts < job.max_attempts
+        if retry:
+            _save(
+                job.pk, status='queued', worker='', error=traceback.format_exc(), progress=job.progress,
+                run_after=now + RETRY_DELAY * 2 ** (job.attempts - 1),
+            )
+        else:
+            error = str(e) if isinstance(e, JobError) else traceback.format_exc()
+            _save(job.pk, status='failed', error=error, progress=job.progress, finished_at=now)
+        if isinstance(e, JobError):
+            logger.warning('job %s #%d failed: %s', job.name, job.pk, e)
+        else:
+            logger.exception('job %s #%d attempt %d failed', job.name, job.pk, job.attempts)
+    else:
+        _save(
+            job.pk, status='done', result=result, error='', progress=job.progress, finished_at=timezone.now(),
+        )
+        logger.info(
+            'job %s #%d done in %d ms', job.name, job.pk, (time.monotonic() - started) * 1000,
+        )
+
+
+def execute(job_id):
+    """Выполняет задачу в пуле воркера: со своими соединениями с базой"""
+    close_old_connections()
+    try:
+        run(job_id)
+    finally:
+        close_old_connections()
+
+
+def _release(jobs, error):
+    """Возвращает задачи в очередь, а исчерпавшие попытки завершает с ошибкой"""
+    now = timezone.now()
+    failed = jobs.filter(attempts__gte=F('max_attempts')).update(
+        status='failed', error=error, finished_at=now,
+    )
+    requeued = jobs.update(status='queued', worker='', error=error, run_after=now)
+    return requeued, failed
+
+
+def requeue_stale():
+    """Возвращает в очередь задачи, воркер которых перестал отмечаться"""
+    stale = Job.objects.filter(status='running', heartbeat_at__lt=timezone.now() - STALE_AFTER)
+    return _release(stale, 'Воркер перестал отвечать')
+
+
+def _init_process():
+    # Соединения родителя закрыты до запуска пула, дочерний процесс
+    # открывает свои; Ctrl+C обрабатывает только главный процесс
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+class Worker:
+    """Цикл команды run_jobs: забирает задачи и раздаёт их пулу"""
+
+    def __init__(self, concurrency=2, pool='thread', poll_interval=1.0, log=None):
+        self.concurrency = concurrency
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.log = log or logger.info
+        self.name = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+
+    def _executor(self):
+        if self.pool == 'process':
+            # fork наследует настроенный Django; открытые соединения не
+            # должны достаться дочерним процессам
+            connections.close_all()
+            return ProcessPoolExecutor(self.concurrency, mp_context=get_context('fork'), initializer=_init_process)
+        return ThreadPoolExecutor(self.concurrency, thread_name_prefix='job')
+
+    def _heartbeat(self, job_ids):
+        try:
+            if job_ids:
+                Job.objects.filter(pk__in=job_ids, status='running').update(heartbeat_at=timezone.now())
+            requeued, failed = requeue_stale()
+            if requeued or failed:
+                self.log(f'Брошенных задач возвращено в очередь: {requeued}, завершено с ошибкой: {failed}')
+        except DatabaseError:
+            # SQLite занят записью задачи; отметка будет в следующий раз
+            logger.warning('job heartbeat skipped', exc_info=True)
+
+    def _collect(self, future, job_id):
+        # Исключение здесь — сбой учёта задачи (например, база не приняла
+        # итог), а не самой задачи: воркер продолжает работу, задача
+        # возвращается в очередь сразу, а не через STALE_AFTER
+        try:
+            future.result()
+        except Exception:
+            logger.exception('job #%d: worker failed to record the outcome', job_id)
+            try:
+                _release(Job.objects.filter(pk=job_id, status='running'), 'Сбой воркера при записи итога')
+            except DatabaseError:
+                logger.warning('job #%d left for stale requeue', job_id, exc_info=True)
+
+    def run(self, once=False):
+        """Работает до stop() (или, при once, пока очередь не опустеет)"""
+        inflight = {}
+        heartbeat_at = 0.0
+        self.log(f'Воркер {self.name}: пул {self.pool} × {self.concurrency}')
+        with self._executor() as executor:
+            while True:
+                for future in [f for f in inflight if f.done()]:
+                    self._collect(future, inflight.pop(future))
+
+                if time.monotonic() - heartbeat_at >= HEARTBEAT_INTERVAL:
+                    self._heartbeat(list(inflight.values()))
+                    heartbeat_at = time.monotonic()
+
+                job_id = None
+                if not self.stopping.is_set() and len(inflight) < self.concurrency:
+                    try:
+                        job_id = claim(self.name)
+                    except DatabaseError:
+                        # Очередь занята другим воркером; попробуем после паузы
+                        logger.warning('job claim failed', exc_info=True)
+                    if job_id is not None:
+                        self.log(f'Задача #{job_id} запущена')
+                        inflight[executor.submit(execute, job_id)] = job_id
+                        continue
+
+                if not inflight and (self.stopping.is_set() or once):
+                    break
+                if inflight:
+                    wait(inflight, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    self.stopping.wait(self.poll_interval)
+                    close_old_connections()
+
+    def stop(self):
+        self.stopping.set()
+
+
+# Задачи
+
+
+@job('bulk_send_to_service')
+def bulk_send_to_service(context):
+    """Отправка на заправку всех расходников, требующих ремонта"""
+    service_center = Location.objects.filter(type='service', is_active=True).first()
+    if not service_center:
+        raise JobError('Не найден активный сервисный центр')
+    result = services.bulk_apply_operation(
+        Cartridge.objects.filter(condition='needs_repair', current_status__in=['in_stock', 'installed']),
+        operation_type='issue_service',
+        to_location=service_center,
+        user=context.user,
+        reason='Массовая отправка на заправку',
+        notes='Картридж требует ремонта, отправлен автоматически',
+    )
+    return {
+        'message': f'Успешно отправлено {result.count} картриджей на заправку',
+        'count': result.count,
+        'errors': result.errors,
+    }
+
+
+@job('return_from_service')
+def return_from_service(context, location_id=None, serial_numbers=None):
+    """Возврат с заправки на склад с прогрессом по пачкам"""
+    service_location = None
+    if location_id:
+        service_location = Location.objects.filter(pk=location_id, type='service').first()
+        if not service_location:
+            raise JobError('Сервисный центр не найден')
+    warehouse = (
+        Location.objects.filter(type='warehouse', is_active=True).first()
+        or Location.objects.filter(is_active=True).first()
+    )
+    if not warehouse:
+        raise JobError('Не найдена активная локация для склада')
+
+    progress = services.return_from_service(
+        context.user,
+        warehouse,
+        service_location=service_location,
+        serial_numbers=serial_numbers,
+        task_id=context.job.pk,
+        on_progress=lambda values: context.progress(
+            total=values['total'], processed=values['processed'], errors=len(values['errors']),
+        ),
+    )
+    count = progress['processed']
+    message = f'Успешно возвращено на склад: {count} картриджей'
+    if progress['total'] == 0:
+        message = 'Нет картриджей на заправке'
+    elif progress['errors']:
+        message = f'Возвращено {count} картриджей. Было {len(progress["errors"])} ошибок'
+    return {
+        'message': message,
+        'count': count,
+        'errors': progress['errors'],
+        'elapsed_ms': progress['elapsed_ms'],
+    }
+
+
+@job('import_data')
+def import_data(context, kind, path, dry_run=False):
+    """Импорт CSV, загруженного в JOB_FILES_DIR; файл удаляется после импорта"""
+    if kind not in imports.IMPORTERS:
+        raise JobError(f'Неизвестный тип импорта: {kind}')
+    try:
+        with open(path, encoding='utf-8-sig', newline='') as stream:
+            report = imports.run_import(imports.IMPORTERS[kind](context.user), stream, dry_run=dry_run)
+    except FileNotFoundError:
+        raise JobError('Файл импорта не найден')
+    except UnicodeDecodeError:
+        _remove(path)
+        raise JobError('Файл должен быть в кодировке UTF-8')
+    except Exception:
+        # Файл нужен для повтора; после последней попытки он не нужен
+        if context.is_last_attempt:
+            _remove(path)
+        raise
+    _remove(path)
+    return {
+        'dry_run': report.dry_run,
+        'ok': report.ok,
+        'rows': report.rows,
+        'created': report.created,
+        'error_count': report.error_count,
+        'errors': report.errors,
+        'elapsed_ms': report.elapsed_ms,
+    }
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,127 @@
+"""
+Сводка жизненного цикла расходника по журналу операций: сколько дней он
+проработал в принтерах, в скольких принтерах побывал, сколько времени
+провёл на заправке и сколько в среднем длится одна заправка.
+
+Сводка строится проходом по операциям в хронологическом порядке и лежит
+в кэше вместе с id последней учтённой операции. При чтении дочитываются
+только операции, записанные после неё, поэтому после новой операции
+сводка обновляется приращением, а не пересчётом всей истории. Если среди
+новых операций есть более ранние по времени (импорт задним числом), сводка
+пересчитывается целиком.
+"""
+from django.core.cache import cache
+from django.utils import timezone
+
+from .models import ArchivedOperation, Operation
+from .transitions import TRANSITIONS
+
+
+LIFECYCLE_KEY = 'lifecycle:{cartridge_id}'
+# Удаление и правка операций в админке сводку не обновляют; срок кэша
+# ограничивает, как долго она может расходиться с журналом
+LIFECYCLE_TIMEOUT = 24 * 60 * 60
+SECONDS_PER_DAY = 86400
+
+HISTORY_FIELDS = ('id', 'operation_type', 'printer_id', 'timestamp')
+
+
+class LifecycleSummary:
+    def __init__(self):
+        self.last_id = 0
+        self.operations = 0
+        self.first_operation = None
+        self.last_operation = None
+        self.status = None
+        # Начало текущего статуса
+        self.since = None
+        self.installed_seconds = 0.0
+        self.service_seconds = 0.0
+        self.refills = 0
+        self.turnaround_seconds = 0.0
+        self.printers = set()
+
+    def add(self, pk, operation_type, printer_id, timestamp):
+        """Учитывает следующую по времени операцию"""
+        if self.since is not None:
+            elapsed = (timestamp - self.since).total_seconds()
+            if self.status == 'installed':
+                self.installed_seconds += elapsed
+            elif self.status == 'at_service':
+                self.service_seconds += elapsed
+                if operation_type == 'receive_service':
+                    self.refills += 1
+                    self.turnaround_seconds += elapsed
+
+        transition = TRANSITIONS.get(operation_type)
+        if transition is not None:
+            self.status = transition.to_status
+        if operation_type == 'install' and printer_id:
+            self.printers.add(printer_id)
+
+        self.since = timestamp
+        self.operations += 1
+        if self.first_operation is None:
+            self.first_operation = timestamp
+        self.last_operation = timestamp
+        self.last_id = max(self.last_id, pk)
+
+    def _current(self, status):
+        if self.status != status or self.since is None:
+            return 0.0
+        return max((timezone.now() - self.since).total_seconds(), 0.0)
+
+    @property
+    def days_installed(self):
+        return (self.installed_seconds + self._current('installed')) / SECONDS_PER_DAY
+
+    @property
+    def days_at_service(self):
+        return (self.service_seconds + self._current('at_service')) / SECONDS_PER_DAY
+
+    @property
+    def printers_served(self):
+        return len(self.printers)
+
+    @property
+    def average_turnaround_days(self):
+        """Средний срок заправки (от выдачи до приёма) или None"""
+        if not self.refills:
+            return None
+        return self.turnaround_seconds / self.refills / SECONDS_PER_DAY
+
+
+def build_lifecycle(cartridge_id):
+    """Полный расчёт по архиву и оперативному журналу"""
+    rows = list(
+        ArchivedOperation.objects.filter(cartridge_id=cartridge_id).values_list(*HISTORY_FIELDS)
+    ) + list(
+        Operation.objects.filter(cartridge_id=cartridge_id).values_list(*HISTORY_FIELDS)
+    )
+    rows.sort(key=lambda row: (row[3], row[0]))
+    summary = LifecycleSummary()
+    for row in rows:
+        summary.add(*row)
+    return summary
+
+
+def get_lifecycle(cartridge_id):
+    """Сводка из кэша, дополненная операциями, записанными после её расчёта"""
+    key = LIFECYCLE_KEY.format(cartridge_id=cartridge_id)
+    summary = cache.get(key)
+    if summary is None:
+        summary = build_lifecycle(cartridge_id)
+    else:
+        new_rows = list(
+            Operation.objects.filter(cartridge_id=cartridge_id, id__gt=summary.last_id)
+            .order_by('timestamp', 'id').values_list(*HISTORY_FIELDS)
+        )
+        if not new_rows:
+            return summary
+        if summary.last_operation is not None and new_rows[0][3] < summary.last_operation:
+            summary = build_lifecycle(cartridge_id)
+        else:
+            for row in new_rows:
+                summary.add(*row)
+    cache.set(key, summary, LIFECYCLE_TIMEOUT)
+    return summary
@@ -0,0 +1,114 @@
+"""
+Нагрузочное сравнение развёртываний (WSGI и ASGI) на JSON-эндпоинтах сканеров.
+
+Запросы идут по настоящему HTTP к уже запущенным серверам: клиент на asyncio
+держит заданное число одновременных запросов и открывает соединение на каждый
+запрос, как терминалы сбора данных. Сессия для входа создаётся напрямую
+в хранилище сессий и удаляется после прогона.
+"""
+import asyncio
+import statistics
+import time
+from importlib import import_module
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.urls import reverse
+
+from .models import Cartridge, Location
+
+
+class LoadReport:
+    def __init__(self, name):
+        self.name = name
+        self.timings = []
+        self.errors = 0
+        self.elapsed = 0.0
+
+    @property
+    def requests_per_second(self):
+        return len(self.timings) / self.elapsed if self.elapsed else 0.0
+
+    def percentile(self, percent):
+        if not self.timings:
+            return 0.0
+        if len(self.timings) == 1:
+            return self.timings[0]
+        return statistics.quantiles(self.timings, n=100, method='inclusive')[percent - 1]
+
+
+def scanner_paths():
+    """Только читающие эндпоинты: прогон можно повторять на рабочей базе"""
+    cartridge = Cartridge.objects.order_by('pk').first()
+    location = Location.objects.filter(type='office', printer__is_active=True).order_by('pk').first()
+    if cartridge is None or location is None:
+        raise ValueError('Нужны хотя бы один расходник и офис с принтером')
+    return [
+        reverse('cartridges:cartridge_info', kwargs={'cartridge_id': cartridge.pk}),
+        reverse('cartridges:printers_by_location') + '?' + urlencode({'location_id': location.pk}),
+        reverse('cartridges:search_models') + '?' + urlencode({'q': cartridge.model.name[:3]}),
+    ]
+
+
+def open_session(user):
+    """Сессия, которую AuthenticationMiddleware примет как вход пользователя"""
+    store = import_module(settings.SESSION_ENGINE).SessionStore()
+    store[SESSION_KEY] = user._meta.pk.value_to_string(user)
+    store[BACKEND_SESSION_KEY] = settings.AUTHENTICATION_BACKENDS[0]
+    store[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    store.create()
+    return store
+
+
+async def _request(host, port, raw):
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        writer.write(raw)
+        await writer.drain()
+        status_line = await reader.readline()
+        await reader.read()
+    finally:
+        writer.close()
+    parts = status_line.split()
+    return int(parts[1]) if len(parts) > 1 else 0
+
+
+async def _run(report, base_url, paths, cookie, total, concurrency):
+    url = urlsplit(base_url)
+    host, port = url.hostname, url.port or 80
+    requests = [
+        (
+            f'GET {url.path.rstrip("/")}{path} HTTP/1.1\r\n'
+            f'Host: {url.netloc}\r\n'
+            f'Cookie: {settings.SESSION_COOKIE_NAME}={cookie}\r\n'
+            'Accept: application/json\r\n'
+            'Connection: close\r\n\r\n'
+        ).encode()
+        for path in paths
+    ]
+    counter = iter(range(total))
+
+    async def worker():
+        for number in counter:
+            started = time.perf_counter()
+            try:
+                status = await _request(host, port, requests[number % len(requests)])
+            except OSError:
+                status = 0
+            if status == 200:
+                report.timings.append((time.perf_counter() - started) * 1000)
+            else:
+                report.errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    report.elapsed = time.perf_counter() - started
+
+
+def run_load(name, base_url, paths, cookie, total=1000, concurrency=20, warmup=50):
+    """Прогревает сервер и выполняет total запросов по кругу paths; возвращает LoadReport"""
+    asyncio.run(_run(LoadReport(name), base_url, paths, cookie, warmup, concurrency))
+    report = LoadReport(name)
+    asyncio.run(_run(report, base_url, paths, cookie, total, concurrency))
+    return report
@@ -0,0 +1,78 @@
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, router, transaction
+from django.db.models import Count
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from cartridges.models import Operation, ArchivedOperation
+
+
+ARCHIVE_FIELDS = [
+    'id', 'operation_type', 'cartridge_id', 'from_location_id', 'to_location_id',
+    'printer_id', 'user_id', 'timestamp', 'reason', 'notes',
+]
+
+
+def month_start(months_back):
+    """Начало месяца, отстоящего на months_back месяцев от текущего"""
+    now = timezone.localtime()
+    index = now.year * 12 + now.month - 1 - months_back
+    return timezone.make_aware(datetime(index // 12, index % 12 + 1, 1))
+
+
+class Command(BaseCommand):
+    help = 'Переносит операции старше N месяцев в архив операций'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months', type=int, default=12,
+                            help='Оставить в оперативной таблице последние N полных месяцев (по умолчанию 12)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Сколько операций переносить в одной транзакции')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только показать, сколько операций будет перенесено')
+
+    def handle(self, *args, **options):
+        if options['months'] < 1:
+            raise CommandError('--months должно быть не меньше 1')
+
+        cutoff = month_start(options['months'])
+        old_operations = Operation.objects.filter(timestamp__lt=cutoff)
+
+        by_month = (
+            old_operations.annotate(month=TruncMonth('timestamp'))
+            .values('month').annotate(total=Count('id')).order_by('month')
+        )
+        for row in by_month:
+            self.stdout.write(f"{row['month']:%Y-%m}: {row['total']}")
+
+        if options['dry_run']:
+            self.stdout.write(f'Будет перенесено операций старше {cutoff:%d.%m.%Y}: {old_operations.count()}')
+            return
+
+        using = router.db_for_write(Operation)
+        connection = connections[using]
+        table = connection.ops.quote_name(Operation._meta.db_table)
+        pk_column = connection.ops.quote_name(Operation._meta.pk.column)
+        moved = 0
+        while True:
+            with transaction.atomic(using=using):
+                rows = list(old_operations.using(using).order_by('pk').values(*ARCHIVE_FIELDS)[:options['batch_size']])
+                if not rows:
+                    break
+                ArchivedOperation.objects.using(using).bulk_create([ArchivedOperation(**row) for row in rows])
+
+                # Прямой DELETE, а не QuerySet.delete(): тот читает строки ради
+                # каскадов и шлёт post_delete на каждую операцию. На операции
+                # никто не ссылается, а архивирование не меняет остатки
+                ids = [row['id'] for row in rows]
+                with connection.cursor() as cursor:
+                    cursor.execute(
+                        f'DELETE FROM {table} WHERE {pk_column} IN ({", ".join(["%s"] * len(ids))})',
+                        ids,
+                    )
+            moved += len(rows)
+            self.stdout.write(f'Перенесено: {moved}')
+
+        self.stdout.write(self.style.SUCCESS(f'В архив перенесено операций старше {cutoff:%d.%m.%Y}: {moved}'))
@@ -0,0 +1,90 @@
+import tempfile
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from cartridges.benchmark import SCENARIOS, is_regression, query_regressions, run_benchmark, uncovered_routes
+from cartridges.fleet import generate_fleet
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время и число SQL-запросов всех представлений на двух размерах '
+        'синтетического парка во временной тестовой базе. Завершается ошибкой, '
+        'если число запросов растёт вместе с данными.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cartridges', type=int, default=500, help='Расходников в малом парке')
+        parser.add_argument('--scale', type=int, default=4, help='Во сколько раз больший парк сравнивать')
+        parser.add_argument('--operations-per-cartridge', type=int, default=12, help='Операций на расходник')
+        parser.add_argument('--repeat', type=int, default=3, help='Замеров на сценарий (после прогрева)')
+
+    def handle(self, *args, **options):
+        missing = uncovered_routes()
+        if missing:
+            raise CommandError('Нет сценариев для маршрутов: ' + ', '.join(missing))
+        if options['scale'] < 2:
+            raise CommandError('--scale должен быть не меньше 2')
+
+        setup_test_environment()
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            # Отдельные кэш и каталог метрик: данные тестовой базы не попадают к воркерам
+            with tempfile.TemporaryDirectory() as metrics_dir, override_settings(
+                CACHES={
+                    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'benchmark'},
+                },
+                METRICS_DIR=metrics_dir,
+            ):
+                small, large = self.run_sizes(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.stdout.write(f'{"Сценарий":<60} {"запросы":>13} {"мс (медиана)":>19}')
+        for before, after in zip(small, large):
+            marks = []
+            if not after.ok or not before.ok:
+                marks.append(f'HTTP {before.status}/{after.status}')
+            if is_regression(before, after):
+                marks.append('N+1' if after.scenario.max_queries is None else f'> {after.scenario.max_queries}')
+            self.stdout.write(
+                f'{before.label:<60} {before.queries:>5} → {after.queries:<5} '
+                f'{before.median_ms:>8.1f} → {after.median_ms:<8.1f} {" ".join(marks)}'
+            )
+
+        failed = [after for after in large if not after.ok] + [before for before in small if not before.ok]
+        regressions = query_regressions(small, large)
+        if failed or regressions:
+            raise CommandError(
+                f'Ошибок ответа: {len(failed)}, роста числа запросов: {len(regressions)}'
+            )
+        self.stdout.write(self.style.SUCCESS(f'Сценариев: {len(SCENARIOS)}, число запросов не зависит от объёма данных'))
+
+    def run_sizes(self, options):
+        user = User.objects.create_superuser('benchmark', 'benchmark@example.com', None)
+        client = Client()
+        client.force_login(user)
+
+        results = []
+        cartridges = options['cartridges']
+        for seed, count in enumerate([cartridges, cartridges * (options['scale'] - 1)], start=1):
+            report = generate_fleet(
+                user,
+                locations=max(count // 100, 5),
+                models=max(count // 50, 5),
+                printers=max(count // 10, 5),
+                cartridges=count,
+                operations=count * options['operations_per_cartridge'],
+                seed=seed,
+            )
+            self.stdout.write(
+                f'Парк {report.prefix}: +{report.cartridges} расходников, +{report.operations} операций '
+                f'({report.elapsed_ms} мс)'
+            )
+            results.append(run_benchmark(client, repeat=options['repeat']))
+        return results
@@ -0,0 +1,58 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from cartridges.loadtest import open_session, run_load, scanner_paths
+
+
+class Command(BaseCommand):
+    help = (
+        'Нагрузочное сравнение запущенных серверов на JSON-эндпоинтах сканеров, '
+        'например: compare_load wsgi=http://127.0.0.1:8001 asgi=http://127.0.0.1:8002'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='+', help='Серверы в виде имя=URL')
+        parser.add_argument('--requests', type=int, default=2000, help='Запросов на сервер')
+        parser.add_argument('--concurrency', type=int, default=50, help='Одновременных запросов')
+        parser.add_argument('--user', default=None, help='Пользователь (по умолчанию первый суперпользователь)')
+
+    def handle(self, *args, **options):
+        targets = []
+        for target in options['targets']:
+            name, sep, url = target.partition('=')
+            if not sep or not url.startswith('http://'):
+                raise CommandError(f'Ожидается имя=http://хост:порт, получено: {target}')
+            targets.append((name, url))
+
+        users = User.objects.filter(is_active=True)
+        if options['user']:
+            user = users.filter(username=options['user']).first()
+        else:
+            user = users.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('Пользователь не найден')
+        try:
+            paths = scanner_paths()
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        session = open_session(user)
+        try:
+            reports = [
+                run_load(name, url, paths, session.session_key, options['requests'], options['concurrency'])
+                for name, url in targets
+            ]
+        finally:
+            session.delete()
+
+        self.stdout.write('Эндпоинты: ' + ', '.join(paths))
+        self.stdout.write(
+            f'{"Сервер":<12} {"запр/с":>9} {"p50 мс":>9} {"p95 мс":>9} {"p99 мс":>9} {"ошибки":>7}'
+        )
+        for report in reports:
+            self.stdout.write(
+                f'{report.name:<12} {report.requests_per_second:>9.1f} {report.percentile(50):>9.1f} '
+                f'{report.percentile(95):>9.1f} {report.percentile(99):>9.1f} {report.errors:>7}'
+            )
+        if any(report.errors for report in reports):
+            raise CommandError('Часть запросов завершилась ошибкой')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from cartridges.forecast import run_forecast
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает прогноз расхода по истории установок (запускать по расписанию)'
+
+    def handle(self, *args, **options):
+        report = run_forecast()
+        self.stdout.write(self.style.SUCCESS(
+            f'Операций: {report.operations}, прогнозов по принтерам: {report.printer_rows}, '
+            f'по моделям: {report.model_rows} '
+            f'(загрузка {report.load_ms} мс, расчёт {report.compute_ms} мс, запись {report.save_ms} мс)'
+        ))
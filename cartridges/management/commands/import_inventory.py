@@ -0,0 +1,64 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from cartridges.imports import IMPORTERS, IMPORT_BATCH_SIZE, run_import
+
+
+class Command(BaseCommand):
+    help = 'Импортирует расходники или принтеры из CSV-файла'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к CSV-файлу (UTF-8)')
+        parser.add_argument(
+            '--kind',
+            choices=sorted(IMPORTERS),
+            default='cartridges',
+            help='Что импортировать',
+        )
+        parser.add_argument(
+            '--user',
+            help='Пользователь для операций поступления (по умолчанию первый суперпользователь)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=IMPORT_BATCH_SIZE,
+            help='Сколько строк проверять и вставлять за раз',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только проверить файл, ничего не сохраняя',
+        )
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('Пользователь для операций поступления не найден')
+
+        importer = IMPORTERS[options['kind']](user)
+        try:
+            with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                report = run_import(
+                    importer, stream,
+                    dry_run=options['dry_run'],
+                    batch_size=options['batch_size'],
+                )
+        except OSError as e:
+            raise CommandError(str(e))
+
+        for error in report.errors:
+            self.stdout.write(error)
+        if not report.ok:
+            raise CommandError(f'Ошибок в файле: {report.error_count}, ничего не сохранено')
+
+        rate = report.rows * 1000 // max(report.elapsed_ms, 1)
+        if report.dry_run:
+            self.stdout.write(self.style.SUCCESS(f'Проверено строк: {report.rows}, ошибок нет'))
+        else:
+            self.stdout.write(self.style.SUCCESS(
+                f'Импортировано: {report.created} за {report.elapsed_ms} мс ({rate} строк/с)'
+            ))
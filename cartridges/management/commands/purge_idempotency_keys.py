@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from cartridges.idempotency import KEY_TTL, purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Удаляет ключи идемпотентности старше срока хранения (запускать по расписанию)'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(
+            f'Удалено ключей старше {KEY_TTL.total_seconds() / 3600:g} ч: {deleted}'
+        ))
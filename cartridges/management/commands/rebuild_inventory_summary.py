@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from cartridges.models import InventorySummary
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает сводку остатков по таблице расходников или сверяет её'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить сводку с расходниками, ничего не изменяя',
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            rows = InventorySummary.rebuild()
+            self.stdout.write(self.style.SUCCESS(f'Сводка остатков пересобрана: {rows} строк'))
+            return
+
+        expected = InventorySummary.expected_counts()
+        stored = {
+            (row.location_id, row.cartridge_model_id, row.consumable_type, row.status): row.count
+            for row in InventorySummary.objects.exclude(count=0)
+        }
+        mismatches = [
+            (key, stored.get(key, 0), expected.get(key, 0))
+            for key in sorted(set(expected) | set(stored), key=str)
+            if stored.get(key, 0) != expected.get(key, 0)
+        ]
+        for key, actual, wanted in mismatches:
+            self.stdout.write(f'{key}: в сводке {actual}, фактически {wanted}')
+
+        if mismatches:
+            raise CommandError(f'Расхождений в сводке остатков: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('Сводка остатков совпадает с расходниками'))
@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_date
+
+from cartridges.models import OperationDailyRollup
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает дневную сводку операций по журналу и архиву или сверяет её'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            help='Пересобрать только дни начиная с даты (ГГГГ-ММ-ДД)',
+        )
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сверить сводку с журналом операций, ничего не изменяя',
+        )
+
+    def handle(self, *args, **options):
+        since = None
+        if options['since']:
+            since = parse_date(options['since'])
+            if since is None:
+                raise CommandError('Дата указывается в формате ГГГГ-ММ-ДД')
+
+        if not options['verify']:
+            rows = OperationDailyRollup.rebuild(since=since)
+            self.stdout.write(self.style.SUCCESS(f'Сводка операций пересобрана: {rows} строк'))
+            return
+
+        expected = OperationDailyRollup.expected_counts(since=since)
+        stored_rows = OperationDailyRollup.objects.all()
+        if since:
+            stored_rows = stored_rows.filter(day__gte=since)
+        stored = {}
+        for row in stored_rows:
+            for counter in OperationDailyRollup.COUNTERS.values():
+                if getattr(row, counter):
+                    stored[(row.day, row.cartridge_model_id, row.location_id, counter)] = getattr(row, counter)
+        mismatches = [
+            (key, stored.get(key, 0), expected.get(key, 0))
+            for key in sorted(set(expected) | set(stored), key=str)
+            if stored.get(key, 0) != expected.get(key, 0)
+        ]
+        for key, actual, wanted in mismatches:
+            self.stdout.write(f'{key}: в сводке {actual}, по журналу {wanted}')
+
+        if mismatches:
+            raise CommandError(f'Расхождений в сводке операций: {len(mismatches)}')
+        self.stdout.write(self.style.SUCCESS('Сводка операций совпадает с журналом'))
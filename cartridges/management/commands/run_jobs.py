@@ -0,0 +1,39 @@
+import signal
+
+from django.core.management.base import BaseCommand, CommandError
+
+from cartridges.jobs import Worker
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди (массовые операции и импорт)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Задач одновременно')
+        parser.add_argument(
+            '--pool', choices=['thread', 'process'], default='thread',
+            help='Пул потоков или процессов (процессы не делят GIL с разбором CSV)',
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Пауза опроса пустой очереди, с')
+        parser.add_argument('--once', action='store_true', help='Выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers должно быть не меньше 1')
+
+        worker = Worker(
+            concurrency=options['workers'],
+            pool=options['pool'],
+            poll_interval=options['poll_interval'],
+            log=self.stdout.write,
+        )
+
+        # Остановка дожидается выполняемых задач, новые не забираются
+        def stop(signum, frame):
+            self.stdout.write('Остановка: ожидание выполняемых задач')
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS('Воркер остановлен'))
@@ -0,0 +1,55 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from cartridges.fleet import FLEET_BATCH_SIZE, generate_fleet
+
+
+class Command(BaseCommand):
+    help = 'Создаёт воспроизводимый синтетический парк с историей операций'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--locations', type=int, default=20, help='Локаций (включая склад и сервисный центр)')
+        parser.add_argument('--models', type=int, default=30, help='Моделей расходников')
+        parser.add_argument('--printers', type=int, default=200, help='Принтеров')
+        parser.add_argument('--cartridges', type=int, default=2000, help='Расходников')
+        parser.add_argument('--operations', type=int, default=20000, help='Операций (примерно)')
+        parser.add_argument('--days', type=int, default=730, help='Глубина истории в днях')
+        parser.add_argument('--seed', type=int, default=1, help='Зерно генератора, задаёт и префикс SYN<seed>')
+        parser.add_argument('--batch-size', type=int, default=FLEET_BATCH_SIZE, help='Операций за одну вставку')
+        parser.add_argument(
+            '--user',
+            help='Пользователь операций (по умолчанию первый суперпользователь)',
+        )
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user = User.objects.filter(username=options['user']).first()
+        else:
+            user = User.objects.filter(is_superuser=True).order_by('pk').first()
+        if user is None:
+            raise CommandError('Пользователь для операций не найден')
+
+        def progress(report):
+            self.stdout.write(f'Расходников: {report.cartridges}, операций: {report.operations}')
+
+        try:
+            report = generate_fleet(
+                user,
+                locations=options['locations'],
+                models=options['models'],
+                printers=options['printers'],
+                cartridges=options['cartridges'],
+                operations=options['operations'],
+                days=options['days'],
+                seed=options['seed'],
+                batch_size=options['batch_size'],
+                progress=progress if options['verbosity'] > 1 else None,
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Парк {report.prefix}: локаций {report.locations}, моделей {report.models}, '
+            f'принтеров {report.printers}, расходников {report.cartridges}, '
+            f'операций {report.operations} за {report.elapsed_ms} мс'
+        ))
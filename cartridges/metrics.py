@@ -0,0 +1,357 @@
+"""
+Метрики запросов по представлениям: время ответа, число SQL-запросов
+и время SQL в виде гистограмм Prometheus.
+
+MetricsMiddleware считает запросы к БД обёрткой execute_wrapper, которая
+ставится на каждое соединение при его открытии, а замер текущего запроса
+берёт из contextvars: так учитываются и запросы асинхронных представлений,
+выполняемые в потоках sync_to_async. Гистограммы копятся в памяти
+процесса. Раз в METRICS_FLUSH_INTERVAL секунд воркер записывает свой
+снимок в отдельный файл METRICS_DIR; эндпоинт /metrics складывает файлы
+всех воркеров, поэтому данные не зависят от того, какой воркер принял
+запрос Prometheus. Файлы завершившихся воркеров при сборе сливаются
+в один (RETIRED_FILENAME), чтобы каталог не рос с каждым перезапуском.
+METRICS_DIR должен быть локальным для хоста: живость воркера проверяется
+по pid.
+
+Для потоковых ответов (выгрузок) учитывается время до начала отдачи:
+запросы, выполняемые при чтении потока, в метрики не попадают.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+try:
+    import fcntl
+except ImportError:  # Windows: файлы завершившихся воркеров не сливаются
+    fcntl = None
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+METRIC_PREFIX = 'cartridge_tracker'
+UNRESOLVED_VIEW = 'unresolved'
+# Сумма снимков завершившихся воркеров и имена последних слитых файлов
+RETIRED_FILENAME = 'retired.json'
+LOCK_FILENAME = '.lock'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+HISTOGRAMS = {
+    'latency': (
+        'request_duration_seconds', 'Время обработки запроса представлением', LATENCY_BUCKETS,
+    ),
+    'queries': (
+        'request_sql_queries', 'Число SQL-запросов на запрос', QUERY_BUCKETS,
+    ),
+    'sql': (
+        'request_sql_duration_seconds', 'Суммарное время SQL на запрос', LATENCY_BUCKETS,
+    ),
+}
+
+
+def _empty_histogram(buckets):
+    return {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+
+
+def _observe(histogram, buckets, value):
+    for i, bound in enumerate(buckets):
+        if value <= bound:
+            histogram['buckets'][i] += 1
+            break
+    histogram['sum'] += value
+    histogram['count'] += 1
+
+
+class QueryTimer:
+    """Обёртка execute_wrapper: число и суммарное время запросов"""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsRegistry:
+    """Накопленные метрики процесса и их сброс в файл воркера"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self._reset()
+
+    def _reset(self):
+        # После fork воркер начинает свой файл, а не дописывает родительский
+        self.pid = os.getpid()
+        self.filename = f'{self.pid}-{time.time_ns()}.json'
+        self.views = {}
+        self.flushed_at = 0.0
+
+    def observe(self, view, status, latency, queries, sql_seconds):
+        with self.lock:
+            if os.getpid() != self.pid:
+                self._reset()
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = {
+                    name: _empty_histogram(buckets) for name, (_, _, buckets) in HISTOGRAMS.items()
+                }
+                stats['responses'] = {}
+            _observe(stats['latency'], LATENCY_BUCKETS, latency)
+            _observe(stats['queries'], QUERY_BUCKETS, queries)
+            _observe(stats['sql'], LATENCY_BUCKETS, sql_seconds)
+            status_class = f'{status // 100}xx'
+            stats['responses'][status_class] = stats['responses'].get(status_class, 0) + 1
+            if time.monotonic() - self.flushed_at >= settings.METRICS_FLUSH_INTERVAL:
+                self._flush()
+
+    def flush(self):
+        with self.lock:
+            if os.getpid() == self.pid and self.views:
+                self._flush()
+
+    def _flush(self):
+        directory = str(settings.METRICS_DIR)
+        os.makedirs(directory, exist_ok=True)
+        _write(os.path.join(directory, self.filename), self.views)
+        self.flushed_at = time.monotonic()
+
+
+def _write(path, data):
+    """Атомарно заменяет файл: читатели не видят его наполовину записанным"""
+    temporary = f'{path}.tmp'
+    with open(temporary, 'w', encoding='utf-8') as stream:
+        json.dump(data, stream)
+    os.replace(temporary, path)
+
+
+def _read(path):
+    try:
+        with open(path, encoding='utf-8') as stream:
+            return json.load(stream)
+    except (OSError, ValueError):
+        return None
+
+
+registry = MetricsRegistry()
+
+# Замер запроса, который сейчас обрабатывается; копируется в потоки sync_to_async
+_current_timer = ContextVar('metrics_query_timer', default=None)
+
+
+def _timed_execute(execute, sql, params, many, context):
+    timer = _current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def _install(connection, **kwargs):
+    if _timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_timed_execute)
+
+
+connection_created.connect(_install)
+
+
+class MetricsMiddleware:
+    """Замеряет каждый запрос; ставится первым в MIDDLEWARE"""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        # Соединения, открытые до загрузки middleware, сигнала не получили
+        for connection in connections.all(initialized_only=True):
+            _install(connection)
+        timer = QueryTimer()
+        token = _current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        self._observe(request, response, time.perf_counter() - started, timer)
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        token = _current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current_timer.reset(token)
+        self._observe(request, response, time.perf_counter() - started, timer)
+        return response
+
+    def _observe(self, request, response, latency, timer):
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match and match.view_name else UNRESOLVED_VIEW
+        registry.observe(view, response.status_code, latency, timer.count, timer.seconds)
+
+
+def _worker_pid(name):
+    """pid из имени файла воркера «{pid}-{ns}.json» (и его .tmp) или None"""
+    pid = name.split('-', 1)[0]
+    return int(pid) if pid.isdigit() and '-' in name else None
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def _directory_lock(directory):
+    """Блокировка каталога метрик между процессами; None — недоступна"""
+    if fcntl is None:
+        yield None
+        return
+    with open(os.path.join(directory, LOCK_FILENAME), 'a') as stream:
+        fcntl.flock(stream, fcntl.LOCK_EX)
+        try:
+            yield stream
+        finally:
+            fcntl.flock(stream, fcntl.LOCK_UN)
+
+
+def _merge(merged, snapshot):
+    for view, stats in snapshot.items():
+        target = merged.setdefault(view, {
+            name: _empty_histogram(buckets) for name, (_, _, buckets) in HISTOGRAMS.items()
+        })
+        target.setdefault('responses', {})
+        for name in HISTOGRAMS:
+            histogram = stats.get(name)
+            if not histogram:
+                continue
+            target[name]['buckets'] = [a + b for a, b in zip(target[name]['buckets'], histogram['buckets'])]
+            target[name]['sum'] += histogram['sum']
+            target[name]['count'] += histogram['count']
+        for status_class, count in stats.get('responses', {}).items():
+            target['responses'][status_class] = target['responses'].get(status_class, 0) + count
+
+
+def _retire_dead_workers(directory):
+    """
+    Сливает файлы завершившихся воркеров в RETIRED_FILENAME и удаляет их.
+    Вызывается под блокировкой каталога. Имена слитых файлов сохраняются
+    вместе с суммой: если процесс упал до удаления файлов, при следующем
+    слиянии они удаляются без повторного сложения.
+    """
+    retired_path = os.path.join(directory, RETIRED_FILENAME)
+    retired = _read(retired_path) or {'views': {}, 'files': []}
+    already_merged = set(retired['files'])
+    merged_files = []
+    for name in os.listdir(directory):
+        pid = _worker_pid(name)
+        if pid is None or _is_alive(pid):
+            continue
+        path = os.path.join(directory, name)
+        if name.endswith('.tmp'):
+            # Недописанный снимок упавшего воркера
+            os.remove(path)
+            continue
+        if name not in already_merged:
+            snapshot = _read(path)
+            if snapshot is not None:
+                _merge(retired['views'], snapshot)
+        merged_files.append(name)
+    if not merged_files:
+        return 0
+    retired['files'] = merged_files
+    _write(retired_path, retired)
+    for name in merged_files:
+        try:
+            os.remove(os.path.join(directory, name))
+        except FileNotFoundError:
+            pass
+    return len(merged_files)
+
+
+def collect():
+    """Сумма метрик всех воркеров по файлам METRICS_DIR"""
+    registry.flush()
+    merged = {}
+    directory = str(settings.METRICS_DIR)
+    if not os.path.isdir(directory):
+        return merged
+    # Под той же блокировкой, что и слияние: файл не учитывается дважды
+    # (и в сумме завершившихся, и отдельно)
+    with _directory_lock(directory) as lock:
+        if lock is not None:
+            _retire_dead_workers(directory)
+        for name in os.listdir(directory):
+            if not name.endswith('.json'):
+                continue
+            snapshot = _read(os.path.join(directory, name))
+            if snapshot is None:
+                continue
+            if name == RETIRED_FILENAME:
+                snapshot = snapshot['views']
+            _merge(merged, snapshot)
+    return merged
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(merged):
+    """Текстовый формат Prometheus (version 0.0.4)"""
+    lines = []
+    views = sorted(merged)
+    for name, (metric, help_text, buckets) in HISTOGRAMS.items():
+        full_name = f'{METRIC_PREFIX}_{metric}'
+        lines.append(f'# HELP {full_name} {help_text}')
+        lines.append(f'# TYPE {full_name} histogram')
+        for view in views:
+            histogram = merged[view][name]
+            label = f'view="{_label(view)}"'
+            cumulative = 0
+            for bound, count in zip(buckets, histogram['buckets']):
+                cumulative += count
+                lines.append(f'{full_name}_bucket{{{label},le="{_number(bound)}"}} {cumulative}')
+            lines.append(f'{full_name}_bucket{{{label},le="+Inf"}} {histogram["count"]}')
+            lines.append(f'{full_name}_sum{{{label}}} {_number(histogram["sum"])}')
+            lines.append(f'{full_name}_count{{{label}}} {histogram["count"]}')
+
+    full_name = f'{METRIC_PREFIX}_responses_total'
+    lines.append(f'# HELP {full_name} Ответы по классам статуса')
+    lines.append(f'# TYPE {full_name} counter')
+    for view in views:
+        for status_class, count in sorted(merged[view].get('responses', {}).items()):
+            lines.append(f'{full_name}{{view="{_label(view)}",status="{status_class}"}} {count}')
+    return '\n'.join(lines) + '\n'
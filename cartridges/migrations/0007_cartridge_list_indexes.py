@@ -0,0 +1,37 @@
+# Generated by Django 5.2.8 on 2026-10-17 17:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartridges', '0006_printer_is_inkjet_printer_printer_type'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cartridge',
+            index=models.Index(fields=['-created_at', 'id'], name='cartridges__created_993c1f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cartridge',
+            index=models.Index(fields=['consumable_type', 'current_status', '-created_at', 'id'], name='cartridges__consuma_8392ff_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cartridge',
+            index=models.Index(fields=['current_status', '-created_at', 'id'], name='cartridges__current_d25625_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cartridge',
+            index=models.Index(fields=['condition', '-created_at', 'id'], name='cartridges__conditi_1506c4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cartridge',
+            index=models.Index(fields=['model', '-created_at', 'id'], name='cartridges__model_i_6752b2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='cartridge',
+            index=models.Index(fields=['current_location', '-created_at', 'id'], name='cartridges__current_843186_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.2.8 on 2026-10-17 17:12
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_summary(apps, schema_editor):
+    Cartridge = apps.get_model('cartridges', 'Cartridge')
+    InventorySummary = apps.get_model('cartridges', 'InventorySummary')
+    rows = (
+        Cartridge.objects.order_by()
+        .values_list('current_location_id', 'model_id', 'consumable_type', 'current_status')
+        .annotate(total=models.Count('id'))
+    )
+    InventorySummary.objects.bulk_create(
+        [
+            InventorySummary(
+                location_id=location_id,
+                cartridge_model_id=model_id,
+                consumable_type=consumable_type,
+                status=status,
+                count=total,
+            )
+            for location_id, model_id, consumable_type, status, total in rows
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartridges', '0007_cartridge_list_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='InventorySummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('consumable_type', models.CharField(choices=[('cartridge', 'Картридж'), ('drum', 'Барабан')], max_length=20, verbose_name='Тип расходника')),
+                ('status', models.CharField(choices=[('in_stock', 'На складе'), ('in_transit', 'В пути'), ('at_service', 'На заправке'), ('in_reserve', 'В резерве'), ('installed', 'Установлен'), ('disposed', 'Списан')], max_length=20, verbose_name='Статус')),
+                ('count', models.IntegerField(default=0, verbose_name='Количество')),
+                ('cartridge_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cartridges.cartridgemodel', verbose_name='Модель')),
+                ('location', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cartridges.location', verbose_name='Локация')),
+            ],
+            options={
+                'verbose_name': 'Сводка остатков',
+                'verbose_name_plural': 'Сводка остатков',
+                'indexes': [models.Index(fields=['status', 'consumable_type'], name='cartridges__status_690837_idx')],
+                'constraints': [models.UniqueConstraint(fields=('location', 'cartridge_model', 'consumable_type', 'status'), name='inventory_summary_unique_key')],
+            },
+        ),
+        migrations.RunPython(populate_summary, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,72 @@
+# Generated by Django 5.2.8 on 2026-10-17 17:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartridges', '0008_inventory_summary'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOperation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation_type', models.CharField(choices=[('receipt', 'Поступление'), ('issue_service', 'Выдача на заправку'), ('receive_service', 'Приём с заправки'), ('install', 'Установка в принтер'), ('remove', 'Снятие с принтера'), ('transfer', 'Перемещение'), ('dispose', 'Списание')], max_length=20, verbose_name='Тип операции')),
+                ('timestamp', models.DateTimeField(verbose_name='Дата и время')),
+                ('reason', models.TextField(blank=True, verbose_name='Причина')),
+                ('notes', models.TextField(blank=True, verbose_name='Примечания')),
+            ],
+            options={
+                'verbose_name': 'Архивная операция',
+                'verbose_name_plural': 'Архив операций',
+                'ordering': ['-timestamp'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='operation',
+            index=models.Index(fields=['cartridge', '-timestamp'], name='cartridges__cartrid_d11887_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='operation',
+            index=models.Index(fields=['operation_type', 'timestamp'], name='cartridges__operati_5f7425_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='operation',
+            index=models.Index(fields=['timestamp'], name='cartridges__timesta_05d366_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedoperation',
+            name='cartridge',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='archived_operations', to='cartridges.cartridge', verbose_name='Картридж'),
+        ),
+        migrations.AddField(
+            model_name='archivedoperation',
+            name='from_location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cartridges.location', verbose_name='Откуда'),
+        ),
+        migrations.AddField(
+            model_name='archivedoperation',
+            name='printer',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='cartridges.printer', verbose_name='Принтер'),
+        ),
+        migrations.AddField(
+            model_name='archivedoperation',
+            name='to_location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to='cartridges.location', verbose_name='Куда'),
+        ),
+        migrations.AddField(
+            model_name='archivedoperation',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='+', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AddIndex(
+            model_name='archivedoperation',
+            index=models.Index(fields=['cartridge', '-timestamp'], name='cartridges__cartrid_ef5aef_idx'),
+        ),
+    ]
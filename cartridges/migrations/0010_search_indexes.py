@@ -0,0 +1,14 @@
+from django.db import migrations
+
+from cartridges import search_schema
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartridges', '0009_operation_indexes_and_archive'),
+    ]
+
+    operations = [
+        migrations.RunPython(search_schema.install, search_schema.uninstall),
+    ]
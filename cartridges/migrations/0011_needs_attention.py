@@ -0,0 +1,37 @@
+from django.db import migrations, models
+
+from cartridges import search_schema
+
+
+def populate_needs_attention(apps, schema_editor):
+    Cartridge = apps.get_model('cartridges', 'Cartridge')
+    CartridgeModel = apps.get_model('cartridges', 'CartridgeModel')
+    max_refills = models.Subquery(
+        CartridgeModel.objects.filter(pk=models.OuterRef('model_id')).values('max_refills')[:1]
+    )
+    Cartridge.objects.filter(
+        models.Q(condition='needs_repair') | models.Q(refill_count__gte=max_refills)
+    ).update(needs_attention=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartridges', '0010_search_indexes'),
+    ]
+
+    operations = [
+        # На SQLite добавление поля пересоздаёт таблицу вместе с триггерами поиска
+        migrations.RunPython(migrations.RunPython.noop, search_schema.reinstall),
+        migrations.AddField(
+            model_name='cartridge',
+            name='needs_attention',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Требует внимания'),
+        ),
+        migrations.RunPython(search_schema.reinstall, migrations.RunPython.noop),
+        migrations.RunPython(populate_needs_attention, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='cartridge',
+            index=models.Index(condition=models.Q(('needs_attention', True)), fields=['-created_at', 'id'], name='cartridge_attention_idx'),
+        ),
+    ]
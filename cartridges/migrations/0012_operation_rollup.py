@@ -0,0 +1,83 @@
+# Generated by Django 5.2.8 on 2026-10-17 17:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models.functions import TruncDate
+
+
+COUNTERS = {
+    'receive_service': 'refills',
+    'install': 'installs',
+    'dispose': 'disposals',
+}
+
+
+def populate_rollup(apps, schema_editor):
+    Operation = apps.get_model('cartridges', 'Operation')
+    ArchivedOperation = apps.get_model('cartridges', 'ArchivedOperation')
+    OperationDailyRollup = apps.get_model('cartridges', 'OperationDailyRollup')
+
+    rows = {}
+    for model in (Operation, ArchivedOperation):
+        counts = (
+            model.objects.filter(operation_type__in=list(COUNTERS))
+            .order_by()
+            .annotate(day=TruncDate('timestamp'))
+            .values_list('day', 'cartridge__model_id', 'to_location_id', 'operation_type')
+            .annotate(total=models.Count('id'))
+        )
+        for day, model_id, location_id, operation_type, total in counts:
+            counters = rows.setdefault((day, model_id, location_id), {})
+            counter = COUNTERS[operation_type]
+            counters[counter] = counters.get(counter, 0) + total
+
+    OperationDailyRollup.objects.bulk_create(
+        [
+            OperationDailyRollup(day=day, cartridge_model_id=model_id, location_id=location_id, **counters)
+            for (day, model_id, location_id), counters in rows.items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartridges', '0011_needs_attention'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OperationDailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField(verbose_name='День')),
+                ('refills', models.IntegerField(default=0, verbose_name='Заправки')),
+                ('installs', models.IntegerField(default=0, verbose_name='Установки')),
+                ('disposals', models.IntegerField(default=0, verbose_name='Списания')),
+            ],
+            options={
+                'verbose_name': 'Операции за день',
+                'verbose_name_plural': 'Операции по дням',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='cartridge',
+            index=models.Index(condition=models.Q(('refill_count__gt', 0)), fields=['-refill_count', 'id'], name='cartridge_refilled_idx'),
+        ),
+        migrations.AddField(
+            model_name='operationdailyrollup',
+            name='cartridge_model',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cartridges.cartridgemodel', verbose_name='Модель'),
+        ),
+        migrations.AddField(
+            model_name='operationdailyrollup',
+            name='location',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='cartridges.location', verbose_name='Локация'),
+        ),
+        migrations.AddConstraint(
+            model_name='operationdailyrollup',
+            constraint=models.UniqueConstraint(fields=('day', 'cartridge_model', 'location'), name='operation_rollup_unique_key'),
+        ),
+        migrations.RunPython(populate_rollup, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.8 on 2026-10-17 17:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartridges', '0012_operation_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ConsumptionForecast',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('installs', models.IntegerField(default=0, verbose_name='Установок')),
+                ('samples', models.IntegerField(default=0, verbose_name='Завершённых установок')),
+                ('mean_days', models.FloatField(blank=True, null=True, verbose_name='Средний срок работы, дней')),
+                ('per_month', models.FloatField(default=0, verbose_name='Замен в месяц')),
+                ('last_install', models.DateTimeField(blank=True, null=True, verbose_name='Последняя установка')),
+                ('next_replacement', models.DateTimeField(blank=True, null=True, verbose_name='Ожидаемая замена')),
+                ('computed_at', models.DateTimeField(verbose_name='Рассчитан')),
+                ('cartridge_model', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='forecasts', to='cartridges.cartridgemodel', verbose_name='Модель')),
+                ('printer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='forecasts', to='cartridges.printer', verbose_name='Принтер')),
+            ],
+            options={
+                'verbose_name': 'Прогноз расхода',
+                'verbose_name_plural': 'Прогнозы расхода',
+                'indexes': [models.Index(fields=['next_replacement'], name='cartridges__next_re_aed636_idx')],
+                'constraints': [models.UniqueConstraint(condition=models.Q(('printer__isnull', False)), fields=('printer', 'cartridge_model'), name='forecast_printer_model_key'), models.UniqueConstraint(condition=models.Q(('printer__isnull', True)), fields=('cartridge_model',), name='forecast_model_key')],
+            },
+        ),
+    ]
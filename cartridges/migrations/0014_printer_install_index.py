@@ -0,0 +1,17 @@
+# Generated by Django 5.2.8 on 2026-10-17 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartridges', '0013_consumption_forecast'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='operation',
+            index=models.Index(condition=models.Q(('operation_type', 'install')), fields=['printer', '-timestamp'], name='operation_printer_install_idx'),
+        ),
+    ]
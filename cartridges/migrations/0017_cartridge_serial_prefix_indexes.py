@@ -0,0 +1,25 @@
+# Generated by Django 5.2.8 on 2026-10-17 18:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartridges', '0016_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cartridge',
+            name='cartridges__serial__16010d_idx',
+        ),
+        migrations.AddIndex(
+            model_name='cartridge',
+            index=models.Index(fields=['serial_number'], name='cartridge_serial_pattern_idx', opclasses=['varchar_pattern_ops']),
+        ),
+        migrations.AddIndex(
+            model_name='cartridge',
+            index=models.Index(fields=['current_status', 'serial_number'], name='cartridge_status_serial_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.8 on 2026-10-17 18:21
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartridges', '0017_cartridge_serial_prefix_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='idempotencykey',
+            name='token',
+            field=models.CharField(blank=True, max_length=32, verbose_name='Токен запроса'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.8 on 2026-10-17 18:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('cartridges', '0018_idempotency_key_token'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='cartridge',
+            name='cartridge_status_serial_idx',
+        ),
+        migrations.AddIndex(
+            model_name='cartridge',
+            index=models.Index(fields=['current_status', 'serial_number'], name='cartridge_status_serial_idx', opclasses=['varchar_pattern_ops', 'varchar_pattern_ops']),
+        ),
+    ]
@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models.functions import TruncDate
 from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 
+from .transitions import get_transition
+
 class Location(models.Model):
     LOCATION_TYPES = [
         ('warehouse', 'Склад'),
@@ -101,6 +104,8 @@ class Cartridge(models.Model):
     refill_count = models.IntegerField(default=0, verbose_name='Количество заправок')
     condition = models.CharField(max_length=20, choices=CONDITION_CHOICES, default='new', verbose_name='Состояние')
     notes = models.TextField(blank=True, verbose_name='Примечания')
+    # Хранимый признак «требует внимания»: ремонт или исчерпан лимит заправок
+    needs_attention = models.BooleanField(default=False, editable=False, verbose_name='Требует внимания')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -109,9 +114,43 @@ class Cartridge(models.Model):
         verbose_name_plural = 'Расходники'
         ordering = ['-created_at']
         indexes = [
-            models.Index(fields=['serial_number']),
+            # На PostgreSQL уникальный индекс с правилами сортировки базы не
+            # обслуживает LIKE 'префикс%' (автодополнение без фильтра статуса).
+            # На SQLite opclasses не применяются: это обычный индекс, по нему
+            # идёт диапазон префикса
+            models.Index(
+                fields=['serial_number'],
+                opclasses=['varchar_pattern_ops'],
+                name='cartridge_serial_pattern_idx',
+            ),
             models.Index(fields=['current_status']),
+            # Автодополнение в форме операции: префикс номера среди допустимых
+            # статусов (search.serial_prefix_filter)
+            models.Index(
+                fields=['current_status', 'serial_number'],
+                opclasses=['varchar_pattern_ops', 'varchar_pattern_ops'],
+                name='cartridge_status_serial_idx',
+            ),
             models.Index(fields=['consumable_type']),
+            # Порядок списка и его фильтры: (-created_at, id) после поля фильтра
+            models.Index(fields=['-created_at', 'id']),
+            models.Index(fields=['consumable_type', 'current_status', '-created_at', 'id']),
+            models.Index(fields=['current_status', '-created_at', 'id']),
+            models.Index(fields=['condition', '-created_at', 'id']),
+            models.Index(fields=['model', '-created_at', 'id']),
+            models.Index(fields=['current_location', '-created_at', 'id']),
+            # Топ по числу заправок
+            models.Index(
+                fields=['-refill_count', 'id'],
+                condition=models.Q(refill_count__gt=0),
+                name='cartridge_refilled_idx',
+            ),
+            # Частичный индекс: расходников, требующих внимания, немного
+            models.Index(
+                fields=['-created_at', 'id'],
+                condition=models.Q(needs_attention=True),
+                name='cartridge_attention_idx',
+            ),
         ]
     
     def __str__(self):
@@ -124,6 +163,40 @@ class Cartridge(models.Model):
         
         if self.refill_count > self.model.max_refills:
             self.condition = 'needs_repair'
+    
+    @staticmethod
+    def compute_needs_attention(condition, refill_count, max_refills):
+        return condition == 'needs_repair' or refill_count >= max_refills
+    
+    @staticmethod
+    def needs_attention_expression(condition=None, refill_increment=0, max_refills=None):
+        """
+        Выражение флага для UPDATE. condition и refill_increment — значения,
+        которые записывает тот же UPDATE (SET видит старые значения полей).
+        Без max_refills лимит берётся подзапросом к модели картриджа.
+        """
+        if condition == 'needs_repair':
+            return models.Value(True)
+        if max_refills is None:
+            max_refills = models.Subquery(
+                CartridgeModel.objects.filter(pk=models.OuterRef('model_id')).values('max_refills')[:1]
+            )
+        attention = models.Q(refill_count__gte=max_refills - refill_increment)
+        if condition is None:
+            attention |= models.Q(condition='needs_repair')
+        return models.Case(
+            models.When(attention, then=models.Value(True)),
+            default=models.Value(False),
+        )
+    
+    def save(self, *args, **kwargs):
+        self.needs_attention = self.compute_needs_attention(
+            self.condition, self.refill_count, self.model.max_refills
+        )
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'needs_attention'}
+        super().save(*args, **kwargs)
 
 class Operation(models.Model):
     OPERATION_TYPES = [
@@ -150,41 +223,451 @@ class Operation(models.Model):
         verbose_name = 'Операция'
         verbose_name_plural = 'Операции'
         ordering = ['-timestamp']
+        indexes = [
+            # История расходника, отчёт по заправкам, date_hierarchy в админке
+            models.Index(fields=['cartridge', '-timestamp']),
+            models.Index(fields=['operation_type', 'timestamp']),
+            models.Index(fields=['timestamp']),
+            # Установки в принтер: история принтера и последняя замена в списке
+            models.Index(
+                fields=['printer', '-timestamp'],
+                condition=models.Q(operation_type='install'),
+                name='operation_printer_install_idx',
+            ),
+        ]
     
     def __str__(self):
         return f"{self.get_operation_type_display()} - {self.cartridge} - {self.timestamp.strftime('%d.%m.%Y %H:%M')}"
     
-    def save(self, *args, **kwargs):
-        is_new = not self.pk
-        super().save(*args, **kwargs)
-        
-        if is_new:
-            self.update_cartridge_status()
+    def clean(self):
+        if not self.pk and self.cartridge_id and self.operation_type:
+            try:
+                get_transition(self.operation_type).validate(self.cartridge)
+            except ValidationError as e:
+                raise ValidationError({'operation_type': e.messages})
     
-    def update_cartridge_status(self):
-        cartridge = self.cartridge
-        operation_type = self.operation_type
+    def save(self, *args, cartridge_changes=None, **kwargs):
+        """
+        Новая операция проверяет допустимость перехода и применяет его
+        к расходнику в той же транзакции. cartridge_changes — дополнительные
+        поля расходника, записываемые тем же UPDATE (например, состояние).
+        """
+        if self.pk:
+            return super().save(*args, **kwargs)
         
-        status_mapping = {
-            'receipt': 'in_stock',
-            'issue_service': 'at_service',
-            'receive_service': 'in_stock',
-            'install': 'installed',
-            'remove': 'in_stock',
-            'transfer': 'in_transit',
-            'dispose': 'disposed',
-        }
+        transition = get_transition(self.operation_type)
+        transition.validate(self.cartridge)
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            self.update_cartridge_status(extra=cartridge_changes)
+            OperationDailyRollup.record(
+                self.operation_type, self.timestamp, self.cartridge.model_id, self.to_location_id
+            )
+    
+    def update_cartridge_status(self, extra=None):
+        old_key = InventorySummary.key_for(self.cartridge)
+        updated = get_transition(self.operation_type).apply(
+            self.cartridge, self.to_location_id, self.printer_id, extra=extra
+        )
+        InventorySummary.record_move(old_key, InventorySummary.key_for(self.cartridge))
+        return updated
+
+
+class ArchivedOperation(models.Model):
+    """
+    Операции старше срока хранения, перенесённые командой archive_operations.
+    Остаются в истории расходника, но не участвуют в оперативных запросах.
+    """
+    operation_type = models.CharField(max_length=20, choices=Operation.OPERATION_TYPES, verbose_name='Тип операции')
+    cartridge = models.ForeignKey(Cartridge, on_delete=models.CASCADE, related_name='archived_operations', verbose_name='Картридж')
+    from_location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='+', verbose_name='Откуда')
+    to_location = models.ForeignKey(Location, on_delete=models.PROTECT, related_name='+', verbose_name='Куда')
+    printer = models.ForeignKey(Printer, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name='Принтер')
+    user = models.ForeignKey(User, on_delete=models.PROTECT, related_name='+', verbose_name='Пользователь')
+    timestamp = models.DateTimeField(verbose_name='Дата и время')
+    reason = models.TextField(blank=True, verbose_name='Причина')
+    notes = models.TextField(blank=True, verbose_name='Примечания')
+    
+    is_archived = True
+    
+    class Meta:
+        verbose_name = 'Архивная операция'
+        verbose_name_plural = 'Архив операций'
+        ordering = ['-timestamp']
+        indexes = [
+            models.Index(fields=['cartridge', '-timestamp']),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_operation_type_display()} - {self.cartridge_id} - {self.timestamp.strftime('%d.%m.%Y %H:%M')}"
+
+
+# Строк в одном INSERT: держит число параметров ниже лимита SQLite
+UPSERT_BATCH_SIZE = 500
+
+
+def upsert_increments(model, key_fields, counter_fields, rows):
+    """
+    Прибавляет счётчики к строкам сводки одним INSERT ... ON CONFLICT DO UPDATE
+    на пачку: rows — кортежи значений key_fields, затем counter_fields.
+    Отсутствующие строки создаются с этими значениями. Число запросов не
+    зависит от числа ключей (SQLite ≥ 3.24 и PostgreSQL).
+    """
+    if not rows:
+        return
+    connection = connections[router.db_for_write(model)]
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in (*key_fields, *counter_fields)]
+    table = quote(model._meta.db_table)
+    columns = ', '.join(quote(field.column) for field in fields)
+    conflict = ', '.join(quote(model._meta.get_field(name).column) for name in key_fields)
+    assignments = ', '.join(
+        f'{quote(column)} = {table}.{quote(column)} + excluded.{quote(column)}'
+        for column in (model._meta.get_field(name).column for name in counter_fields)
+    )
+    placeholder = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    with transaction.atomic(using=connection.alias), connection.cursor() as cursor:
+        for start in range(0, len(rows), UPSERT_BATCH_SIZE):
+            batch = rows[start:start + UPSERT_BATCH_SIZE]
+            params = [
+                field.get_db_prep_save(value, connection)
+                for row in batch
+                for field, value in zip(fields, row)
+            ]
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) VALUES {", ".join([placeholder] * len(batch))} '
+                f'ON CONFLICT ({conflict}) DO UPDATE SET {assignments}',
+                params,
+            )
+
+
+class InventorySummary(models.Model):
+    """
+    Количество расходников в разрезе локации, модели, типа и статуса.
+    Поддерживается приращениями при каждом изменении расходника,
+    пересобирается командой rebuild_inventory_summary.
+    """
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, verbose_name='Локация')
+    cartridge_model = models.ForeignKey(CartridgeModel, on_delete=models.CASCADE, verbose_name='Модель')
+    consumable_type = models.CharField(max_length=20, choices=Cartridge.CONSUMABLE_TYPES, verbose_name='Тип расходника')
+    status = models.CharField(max_length=20, choices=Cartridge.STATUS_CHOICES, verbose_name='Статус')
+    count = models.IntegerField(default=0, verbose_name='Количество')
+    
+    class Meta:
+        verbose_name = 'Сводка остатков'
+        verbose_name_plural = 'Сводка остатков'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['location', 'cartridge_model', 'consumable_type', 'status'],
+                name='inventory_summary_unique_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['status', 'consumable_type']),
+        ]
+    
+    def __str__(self):
+        return f"{self.location_id}/{self.cartridge_model_id}/{self.consumable_type}/{self.status}: {self.count}"
+    
+    @staticmethod
+    def key_for(cartridge):
+        return (
+            cartridge.current_location_id,
+            cartridge.model_id,
+            cartridge.consumable_type,
+            cartridge.current_status,
+        )
+    
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Применяет приращения {(location_id, model_id, consumable_type, status): delta}
+        одним запросом count = count + delta; отсутствующие строки создаются.
+        """
+        upsert_increments(
+            cls,
+            ('location', 'cartridge_model', 'consumable_type', 'status'),
+            ('count',),
+            [(*key, delta) for key, delta in deltas.items() if delta],
+        )
+    
+    @classmethod
+    def record_move(cls, old_key, new_key, count=1):
+        if old_key != new_key:
+            cls.apply_deltas({old_key: -count, new_key: count})
+    
+    @staticmethod
+    def expected_counts():
+        """Фактические количества по таблице расходников {ключ: количество}"""
+        rows = (
+            Cartridge.objects.order_by()
+            .values_list('current_location_id', 'model_id', 'consumable_type', 'current_status')
+            .annotate(total=models.Count('id'))
+        )
+        return {tuple(row[:4]): row[4] for row in rows}
+    
+    @classmethod
+    def rebuild(cls):
+        """Пересобирает сводку с нуля, возвращает число строк"""
+        expected = cls.expected_counts()
+        with transaction.atomic():
+            cls.objects.all().delete()
+            cls.objects.bulk_create(
+                [
+                    cls(
+                        location_id=location_id,
+                        cartridge_model_id=model_id,
+                        consumable_type=consumable_type,
+                        status=status,
+                        count=count,
+                    )
+                    for (location_id, model_id, consumable_type, status), count in expected.items()
+                ],
+                batch_size=1000,
+            )
+        return len(expected)
+
+
+class OperationDailyRollup(models.Model):
+    """
+    Число заправок, установок и списаний за день в разрезе модели
+    и локации назначения операции. Поддерживается приращениями при записи
+    операций, пересобирается командой rebuild_operation_rollup. Удаление
+    и архивирование операций счётчики не уменьшают.
+    """
+    COUNTERS = {
+        'receive_service': 'refills',
+        'install': 'installs',
+        'dispose': 'disposals',
+    }
+    
+    day = models.DateField(verbose_name='День')
+    cartridge_model = models.ForeignKey(CartridgeModel, on_delete=models.CASCADE, verbose_name='Модель')
+    location = models.ForeignKey(Location, on_delete=models.CASCADE, verbose_name='Локация')
+    refills = models.IntegerField(default=0, verbose_name='Заправки')
+    installs = models.IntegerField(default=0, verbose_name='Установки')
+    disposals = models.IntegerField(default=0, verbose_name='Списания')
+    
+    class Meta:
+        verbose_name = 'Операции за день'
+        verbose_name_plural = 'Операции по дням'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'cartridge_model', 'location'],
+                name='operation_rollup_unique_key',
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.day}/{self.cartridge_model_id}/{self.location_id}: {self.refills}/{self.installs}/{self.disposals}"
+    
+    @classmethod
+    def key_for(cls, operation_type, timestamp, model_id, location_id):
+        """Ключ приращения или None, если операция в сводку не входит"""
+        counter = cls.COUNTERS.get(operation_type)
+        if counter is None:
+            return None
+        return (timezone.localdate(timestamp), model_id, location_id, counter)
+    
+    @classmethod
+    def apply_deltas(cls, deltas):
+        """
+        Применяет приращения {(day, model_id, location_id, counter): delta}
+        одним запросом; отсутствующие строки создаются.
+        """
+        counters = tuple(cls.COUNTERS.values())
+        rows = {}
+        for (day, model_id, location_id, counter), delta in deltas.items():
+            if delta:
+                rows.setdefault((day, model_id, location_id), dict.fromkeys(counters, 0))[counter] += delta
+        upsert_increments(
+            cls,
+            ('day', 'cartridge_model', 'location'),
+            counters,
+            [(*key, *(values[counter] for counter in counters)) for key, values in rows.items()],
+        )
+    
+    @classmethod
+    def record(cls, operation_type, timestamp, model_id, location_id):
+        key = cls.key_for(operation_type, timestamp, model_id, location_id)
+        if key is not None:
+            cls.apply_deltas({key: 1})
+    
+    @classmethod
+    def expected_counts(cls, since=None):
+        """Счётчики по журналу операций вместе с архивом {(day, model_id, location_id, counter): n}"""
+        counts = {}
+        for queryset in (Operation.objects.all(), ArchivedOperation.objects.all()):
+            queryset = queryset.filter(operation_type__in=list(cls.COUNTERS))
+            if since:
+                queryset = queryset.filter(timestamp__date__gte=since)
+            rows = (
+                queryset.order_by()
+                .annotate(day=TruncDate('timestamp'))
+                .values_list('day', 'cartridge__model_id', 'to_location_id', 'operation_type')
+                .annotate(total=models.Count('id'))
+            )
+            for day, model_id, location_id, operation_type, total in rows:
+                key = (day, model_id, location_id, cls.COUNTERS[operation_type])
+                counts[key] = counts.get(key, 0) + total
+        return counts
+    
+    @classmethod
+    def rebuild(cls, since=None):
+        """Пересобирает сводку (с даты since или целиком), возвращает число строк"""
+        rows = {}
+        for (day, model_id, location_id, counter), total in cls.expected_counts(since).items():
+            rows.setdefault((day, model_id, location_id), {})[counter] = total
         
-        if operation_type in status_mapping:
-            cartridge.current_status = status_mapping[operation_type]
-            cartridge.current_location = self.to_location
-            
-            if operation_type == 'install':
-                cartridge.installed_in_printer = self.printer
-            elif operation_type == 'remove':
-                cartridge.installed_in_printer = None
-            elif operation_type == 'receive_service':
-                cartridge.refill_count += 1
-                cartridge.condition = 'refilled'
-            
-            cartridge.save()
\ No newline at end of file
+        with transaction.atomic():
+            existing = cls.objects.all()
+            if since:
+                existing = existing.filter(day__gte=since)
+            existing.delete()
+            cls.objects.bulk_create(
+                [
+                    cls(day=day, cartridge_model_id=model_id, location_id=location_id, **counters)
+                    for (day, model_id, location_id), counters in rows.items()
+                ],
+                batch_size=1000,
+            )
+        return len(rows)
+
+
+class ConsumptionForecast(models.Model):
+    """
+    Прогноз расхода по паре принтер × модель (и по модели в целом, если
+    принтер не указан). Пересчитывается целиком командой forecast_consumption.
+    """
+    printer = models.ForeignKey(Printer, on_delete=models.CASCADE, null=True, blank=True,
+                                related_name='forecasts', verbose_name='Принтер')
+    cartridge_model = models.ForeignKey(CartridgeModel, on_delete=models.CASCADE, related_name='forecasts', verbose_name='Модель')
+    installs = models.IntegerField(default=0, verbose_name='Установок')
+    samples = models.IntegerField(default=0, verbose_name='Завершённых установок')
+    mean_days = models.FloatField(null=True, blank=True, verbose_name='Средний срок работы, дней')
+    per_month = models.FloatField(default=0, verbose_name='Замен в месяц')
+    last_install = models.DateTimeField(null=True, blank=True, verbose_name='Последняя установка')
+    next_replacement = models.DateTimeField(null=True, blank=True, verbose_name='Ожидаемая замена')
+    computed_at = models.DateTimeField(verbose_name='Рассчитан')
+    
+    class Meta:
+        verbose_name = 'Прогноз расхода'
+        verbose_name_plural = 'Прогнозы расхода'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['printer', 'cartridge_model'],
+                condition=models.Q(printer__isnull=False),
+                name='forecast_printer_model_key',
+            ),
+            models.UniqueConstraint(
+                fields=['cartridge_model'],
+                condition=models.Q(printer__isnull=True),
+                name='forecast_model_key',
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['next_replacement']),
+        ]
+    
+    def __str__(self):
+        return f"{self.printer_id or '*'}/{self.cartridge_model_id}: {self.next_replacement}"
+    
+    @property
+    def is_overdue(self):
+        return self.next_replacement is not None and self.next_replacement < timezone.now()
+
+
+class Job(models.Model):
+    """
+    Фоновая задача: массовые операции и импорт, которые не должны
+    выполняться внутри HTTP-запроса. Ставится в очередь функцией
+    jobs.enqueue и выполняется командой run_jobs.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Выполнена'),
+        ('failed', 'Ошибка'),
+    ]
+    
+    name = models.CharField(max_length=100, verbose_name='Задача')
+    params = models.JSONField(default=dict, blank=True, verbose_name='Параметры')
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+', verbose_name='Пользователь')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', verbose_name='Статус')
+    attempts = models.IntegerField(default=0, verbose_name='Попыток')
+    max_attempts = models.IntegerField(default=3, verbose_name='Максимум попыток')
+    run_after = models.DateTimeField(default=timezone.now, verbose_name='Не раньше')
+    progress = models.JSONField(default=dict, blank=True, verbose_name='Прогресс')
+    result = models.JSONField(null=True, blank=True, verbose_name='Результат')
+    error = models.TextField(blank=True, verbose_name='Ошибка')
+    worker = models.CharField(max_length=100, blank=True, verbose_name='Воркер')
+    heartbeat_at = models.DateTimeField(null=True, blank=True, verbose_name='Последний сигнал воркера')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Создана')
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name='Начата')
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name='Завершена')
+    
+    class Meta:
+        verbose_name = 'Фоновая задача'
+        verbose_name_plural = 'Фоновые задачи'
+        ordering = ['-created_at']
+        indexes = [
+            # Очередь: выбор следующей задачи читает только ожидающие
+            models.Index(
+                fields=['run_after', 'id'],
+                condition=models.Q(status='queued'),
+                name='job_queue_idx',
+            ),
+            models.Index(
+                fields=['heartbeat_at'],
+                condition=models.Q(status='running'),
+                name='job_running_idx',
+            ),
+        ]
+    
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.get_status_display()})'
+    
+    @property
+    def is_finished(self):
+        return self.status in ('done', 'failed')
+    
+    @property
+    def error_message(self):
+        """Последняя строка ошибки: текст JobError или исключения из трассировки"""
+        lines = self.error.strip().splitlines()
+        return lines[-1] if lines else ''
+
+
+class IdempotencyKey(models.Model):
+    """
+    Ключ идемпотентности запроса, создающего операцию, и сохранённый ответ
+    на него. Повтор запроса с тем же ключом получает этот ответ без
+    повторной записи (см. cartridges.idempotency).
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+', verbose_name='Пользователь')
+    key = models.CharField(max_length=255, verbose_name='Ключ')
+    # Хэш метода, пути и тела запроса: тот же ключ с другим запросом — ошибка клиента
+    fingerprint = models.CharField(max_length=64, verbose_name='Отпечаток запроса')
+    # Случайный токен запроса, занявшего ключ: ответ сохраняет и резерв
+    # снимает только он, даже если резерв успел перейти к повтору
+    token = models.CharField(max_length=32, blank=True, verbose_name='Токен запроса')
+    # Пока запрос выполняется, ответа нет
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True, verbose_name='Код ответа')
+    content_type = models.CharField(max_length=100, blank=True, verbose_name='Тип ответа')
+    location = models.CharField(max_length=500, blank=True, verbose_name='Адрес перенаправления')
+    body = models.BinaryField(default=b'', verbose_name='Тело ответа')
+    created_at = models.DateTimeField(default=timezone.now, db_index=True, verbose_name='Создан')
+    
+    class Meta:
+        verbose_name = 'Ключ идемпотентности'
+        verbose_name_plural = 'Ключи идемпотентности'
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_key_unique'),
+        ]
+    
+    def __str__(self):
+        return f'{self.key} ({self.user_id})'
+    
+    @property
+    def is_complete(self):
+        return self.status_code is not None
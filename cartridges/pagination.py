@@ -0,0 +1,167 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+
+
+APPROX_COUNT_LIMIT = 10000
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+class KeysetPage:
+    """Страница keyset-пагинации: объекты и курсоры соседних страниц"""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def _parse_ordering(ordering):
+    return [(name.lstrip('-'), name.startswith('-')) for name in ordering]
+
+
+def encode_cursor(values):
+    raw = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor, fields, model):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor(cursor)
+
+    # Курсор приходит от клиента: каждое значение приводится к типу поля
+    # и проверяется его валидаторами (диапазон целых), иначе ошибка
+    # случилась бы уже при выполнении запроса
+    decoded = []
+    for (name, _), value in zip(fields, values):
+        field = model._meta.get_field(name)
+        try:
+            value = field.to_python(value)
+            if value is not None:
+                field.run_validators(value)
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        if value is None:
+            raise InvalidCursor(cursor)
+        decoded.append(value)
+    return decoded
+
+
+def _after(fields, values, reverse=False):
+    """Условие «строго после ключа» для составного порядка сортировки"""
+    condition = Q()
+    equal = Q()
+    for (name, descending), value in zip(fields, values):
+        lookup = 'lt' if descending != reverse else 'gt'
+        condition |= equal & Q(**{f'{name}__{lookup}': value})
+        equal &= Q(**{name: value})
+    return condition
+
+
+def _take(querysets, condition, ordering, limit):
+    """Первые limit строк цепочки выборок, каждая следующая целиком идёт после предыдущей"""
+    rows = []
+    for queryset in querysets:
+        if len(rows) >= limit:
+            break
+        if condition is not None:
+            queryset = queryset.filter(condition)
+        rows += queryset.order_by(*ordering)[:limit - len(rows)]
+    return rows
+
+
+def keyset_paginate(queryset, ordering, page_size, after=None, before=None):
+    """
+    Возвращает KeysetPage по курсору after (следующая страница) или before
+    (предыдущая). Последнее поле ordering должно быть уникальным, чтобы
+    порядок был стабильным. Стоимость запроса не зависит от номера страницы.
+    """
+    return keyset_paginate_chain([queryset], ordering, page_size, after=after, before=before)
+
+
+def keyset_paginate_chain(querysets, ordering, page_size, after=None, before=None):
+    """
+    То же для нескольких выборок с одинаковыми полями сортировки, например
+    оперативного журнала и архива: в порядке ordering все строки каждой
+    выборки идут после строк предыдущей. Следующая выборка читается, только
+    если страница не заполнена предыдущей.
+    """
+    fields = _parse_ordering(ordering)
+    model = querysets[0].model
+
+    if before:
+        values = decode_cursor(before, fields, model)
+        reversed_ordering = [name if desc else f'-{name}' for name, desc in fields]
+        rows = _take(
+            querysets[::-1], _after(fields, values, reverse=True), reversed_ordering, page_size + 1
+        )
+        has_more = len(rows) > page_size
+        rows = rows[:page_size][::-1]
+        previous_exists, next_exists = has_more, True
+    else:
+        condition = _after(fields, decode_cursor(after, fields, model)) if after else None
+        rows = _take(querysets, condition, ordering, page_size + 1)
+        next_exists = len(rows) > page_size
+        rows = rows[:page_size]
+        previous_exists = bool(after)
+
+    def key(obj):
+        return encode_cursor([getattr(obj, name) for name, _ in fields])
+
+    return KeysetPage(
+        rows,
+        next_cursor=key(rows[-1]) if rows and next_exists else None,
+        previous_cursor=key(rows[0]) if rows and previous_exists else None,
+    )
+
+
+def approximate_count(queryset, limit=APPROX_COUNT_LIMIT):
+    """
+    Быстрая оценка размера выборки: (число, точное ли оно).
+
+    Без фильтров на PostgreSQL берётся статистика планировщика, иначе
+    строки считаются не дальше limit.
+    """
+    connection = connections[queryset.db]
+    if not queryset.query.where and connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+                [queryset.model._meta.db_table],
+            )
+            row = cursor.fetchone()
+        if row and row[0] > limit:
+            return row[0], False
+
+    count = queryset.order_by()[:limit + 1].count()
+    if count > limit:
+        return limit, False
+    return count, True
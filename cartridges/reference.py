@@ -0,0 +1,133 @@
+"""
+Справочники в памяти процесса: локации, модели картриджей и активные принтеры.
+
+Они меняются редко, а нужны почти на каждой странице и в AJAX-запросах.
+Каждый воркер держит компактную копию и перечитывает её, когда сигналы
+post_save/post_delete увеличивают общую версию в кэше. Версия же служит
+ETag для JSON-эндпоинтов.
+"""
+import time
+from collections import defaultdict, namedtuple
+from functools import cached_property
+
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import CartridgeModel, Location, Printer
+from .replica import primary_reads
+
+
+REFERENCE_VERSION_KEY = 'reference:version'
+
+LocationRef = namedtuple('LocationRef', 'id name type type_display is_active')
+ModelRef = namedtuple('ModelRef', 'id manufacturer name max_refills')
+PrinterRef = namedtuple('PrinterRef', 'id name model serial_number location_id')
+
+
+class ReferenceData:
+    def __init__(self, version):
+        self.version = version
+        type_labels = dict(Location.LOCATION_TYPES)
+        self.locations = [
+            LocationRef(pk, name, kind, type_labels.get(kind, kind), is_active)
+            for pk, name, kind, is_active in Location.objects.order_by('name', 'id').values_list(
+                'id', 'name', 'type', 'is_active'
+            )
+        ]
+        self.models = [
+            ModelRef(*row)
+            for row in CartridgeModel.objects.order_by('manufacturer', 'name', 'id').values_list(
+                'id', 'manufacturer', 'name', 'max_refills'
+            )
+        ]
+        self.printers = [
+            PrinterRef(*row)
+            for row in Printer.objects.filter(is_active=True).order_by('name', 'id').values_list(
+                'id', 'name', 'model', 'serial_number', 'location_id'
+            )
+        ]
+
+        self.locations_by_id = {location.id: location for location in self.locations}
+        self.models_by_id = {model.id: model for model in self.models}
+        self.printers_by_location = defaultdict(list)
+        for printer in self.printers:
+            self.printers_by_location[printer.location_id].append(printer)
+
+    @cached_property
+    def active_locations(self):
+        return [location for location in self.locations if location.is_active]
+
+    @cached_property
+    def locations_with_printers(self):
+        return [location for location in self.locations if self.printers_by_location.get(location.id)]
+
+    @cached_property
+    def model_index(self):
+        from .search import ModelIndex
+        return ModelIndex((m.id, m.manufacturer, m.name, m.max_refills) for m in self.models)
+
+    def printers_for_location(self, location_id):
+        return self.printers_by_location.get(location_id, [])
+
+    # Варианты для полей форм, подписи совпадают с __str__ моделей
+
+    def location_choices(self, locations=None):
+        return [
+            (location.id, f'{location.name} ({location.type_display})')
+            for location in (self.locations if locations is None else locations)
+        ]
+
+    def model_choices(self):
+        return [(model.id, f'{model.manufacturer} {model.name}') for model in self.models]
+
+
+_reference = None
+
+
+def get_reference_version():
+    """Текущая версия справочников (создаётся при первом обращении)"""
+    version = cache.get(REFERENCE_VERSION_KEY)
+    if version is None:
+        # Берём время: после очистки или вытеснения ключа версия не вернётся
+        # к уже виденному воркерами значению, и старые ETag клиентов не совпадут
+        cache.add(REFERENCE_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(REFERENCE_VERSION_KEY)
+    return version
+
+
+def bump_reference_version():
+    """Увеличивает версию справочников после фиксации текущей транзакции"""
+    def _bump():
+        try:
+            cache.incr(REFERENCE_VERSION_KEY)
+        except ValueError:
+            get_reference_version()
+
+    transaction.on_commit(_bump)
+
+
+def get_reference_data():
+    """Справочники текущего процесса, перечитываются при смене версии"""
+    global _reference
+    version = get_reference_version()
+    if _reference is None or _reference.version != version:
+        # Копия общая для всех запросов процесса, отстающая реплика не годится
+        with primary_reads():
+            _reference = ReferenceData(version)
+    return _reference
+
+
+async def aget_reference_data():
+    """
+    То же для асинхронных представлений. Проверка версии не обращается к БД,
+    перечитывание справочников выполняется в потоке.
+    """
+    if _reference is not None and _reference.version == get_reference_version():
+        return _reference
+    return await sync_to_async(get_reference_data)()
+
+
+def reference_etag(request, *args, **kwargs):
+    """ETag JSON-ответов, построенных только из справочников"""
+    return f'ref-{get_reference_version()}'
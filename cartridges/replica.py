@@ -0,0 +1,86 @@
+"""
+Чтение отчётов и выгрузок с реплики базы.
+
+Отчёты и выгрузки только читают большие агрегаты и журнал операций.
+Представления, помеченные декоратором reporting_reads, читают с алиаса
+REPLICA_DB, если он описан в DATABASES (см. DB_REPLICA_* в настройках).
+Остальные представления читают с основной базы, а запись всегда идёт
+в основную базу, в том числе для объектов, прочитанных с реплики.
+
+Реплика отстаёт от основной базы, поэтому данные, которые кэшируются
+для всех запросов (справочники), читаются через primary_reads.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+
+REPLICA_DB = 'replica'
+
+_reporting = ContextVar('reporting_reads', default=False)
+
+
+def replica_configured():
+    return REPLICA_DB in settings.DATABASES
+
+
+@contextmanager
+def _reads(value):
+    token = _reporting.set(value)
+    try:
+        yield
+    finally:
+        _reporting.reset(token)
+
+
+def primary_reads():
+    """Чтение с основной базы внутри представления отчёта"""
+    return _reads(False)
+
+
+def _stream(content):
+    # Поток выгрузки читается после выхода из представления; флаг ставится
+    # на каждый шаг, а не на весь генератор, чтобы не выходить за контекст
+    iterator = iter(content)
+    while True:
+        with _reads(True):
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+        yield chunk
+
+
+def reporting_reads(view):
+    """Читает данные представления с реплики, включая потоковый ответ"""
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with _reads(True):
+            response = view(request, *args, **kwargs)
+        if response.streaming:
+            response.streaming_content = _stream(response.streaming_content)
+        return response
+    return wrapper
+
+
+class ReplicaRouter:
+    """Маршрутизатор DATABASE_ROUTERS"""
+
+    def db_for_read(self, model, **hints):
+        if _reporting.get() and replica_configured():
+            return REPLICA_DB
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплика содержит те же строки, что и основная база
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплики приходит репликацией с основной базы
+        return False if db == REPLICA_DB else None
@@ -0,0 +1,270 @@
+"""
+Поиск по моделям, серийным номерам расходников и принтерам.
+
+Серийные номера и принтеры ищутся через индекс СУБД: на PostgreSQL —
+pg_trgm (GIN-индексы из search_schema), на SQLite — FTS5-таблицы
+с триграммным токенизатором, которые синхронизируются триггерами.
+Небольшая таблица моделей держится в памяти процесса вместе
+со справочниками (reference).
+Кандидаты из индекса ранжируются одинаково — по триграммной близости.
+"""
+import bisect
+import re
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Cartridge, Printer
+from .reference import get_reference_data
+
+
+SEARCH_LIMIT = 20
+MIN_SIMILARITY = 0.3
+# Нечёткое совпадение всегда ранжируется ниже вхождения подстроки
+FUZZY_WEIGHT = 0.8
+# Сколько кандидатов брать из индекса перед ранжированием
+CANDIDATE_LIMIT = 100
+
+CARTRIDGE_FTS_TABLE = 'cartridges_cartridge_fts'
+PRINTER_FTS_TABLE = 'cartridges_printer_fts'
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def normalize(text):
+    return ' '.join(_WORD_RE.findall(text.lower()))
+
+
+def trigrams(text):
+    """Триграммы слов как в pg_trgm: слово дополняется пробелами по краям"""
+    result = set()
+    for word in _WORD_RE.findall(text.lower()):
+        padded = f'  {word} '
+        result.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return result
+
+
+def similarity(query, text):
+    query_trigrams = trigrams(query)
+    text_trigrams = trigrams(text)
+    if not query_trigrams or not text_trigrams:
+        return 0.0
+    return len(query_trigrams & text_trigrams) / len(query_trigrams | text_trigrams)
+
+
+def word_similarity(query, text):
+    """Близость с учётом слов: каждое слово запроса сравнивается с ближайшим словом текста"""
+    text_words = text.split()
+    query_words = query.split()
+    if not text_words or not query_words:
+        return 0.0
+    best = [max(similarity(word, candidate) for candidate in text_words) for word in query_words]
+    return max(similarity(query, text), sum(best) / len(best))
+
+
+def score(query, text):
+    """Оценка совпадения: вхождение подстроки выше любой нечёткой близости"""
+    query = normalize(query)
+    text = normalize(text)
+    if not query:
+        return 0.0
+    if text.startswith(query):
+        return 1.0
+    if query in text:
+        return 0.9
+    return round(word_similarity(query, text) * FUZZY_WEIGHT, 3)
+
+
+def rank(query, candidates, limit):
+    """
+    candidates: [(объект, текст)] -> [(объект, оценка)] по убыванию оценки.
+    Нечёткие совпадения возвращаются, только если нет ни одного вхождения.
+    """
+    scored = [(obj, score(query, text)) for obj, text in candidates]
+    exact = [(obj, value) for obj, value in scored if value > FUZZY_WEIGHT]
+    if exact:
+        scored = exact
+    else:
+        scored = [(obj, value) for obj, value in scored if value >= MIN_SIMILARITY * FUZZY_WEIGHT]
+    scored.sort(key=lambda item: -item[1])
+    return scored[:limit]
+
+
+# --- Модели картриджей: индекс в памяти процесса ---
+
+class ModelIndex:
+    """Префиксный индекс по словам «производитель + название» модели"""
+
+    def __init__(self, rows):
+        self.entries = []
+        self.words = []
+        for pk, manufacturer, name, max_refills in rows:
+            text = f'{manufacturer} {name}'
+            position = len(self.entries)
+            self.entries.append({
+                'id': pk,
+                'name': text,
+                'manufacturer': manufacturer,
+                'model_name': name,
+                'max_refills': max_refills,
+            })
+            for word in set(normalize(text).split()):
+                self.words.append((word, position))
+        self.words.sort()
+
+    def _prefix_matches(self, token):
+        start = bisect.bisect_left(self.words, (token, -1))
+        matches = set()
+        for word, position in self.words[start:]:
+            if not word.startswith(token):
+                break
+            matches.add(position)
+        return matches
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        tokens = normalize(query).split()
+        if not tokens:
+            return self.entries[:limit]
+
+        # Все слова запроса — префиксы слов модели
+        positions = None
+        for token in tokens:
+            matches = self._prefix_matches(token)
+            positions = matches if positions is None else positions & matches
+
+        if positions:
+            return [self.entries[p] for p in sorted(positions)][:limit]
+
+        # Нечёткий поиск по всей (небольшой) таблице для опечаток
+        return [entry for entry, _ in rank(query, [(e, e['name']) for e in self.entries], limit)]
+
+
+def get_model_index():
+    """Индекс моделей текущего процесса, перестраивается вместе со справочниками"""
+    return get_reference_data().model_index
+
+
+def search_models(query, limit=SEARCH_LIMIT):
+    return get_model_index().search(query, limit)
+
+
+# --- Серийные номера и принтеры: индекс СУБД ---
+
+def _fts_query(query):
+    """Запрос FTS5: любые триграммы слов запроса (устойчив к опечаткам)"""
+    grams = set()
+    for word in normalize(query).split():
+        grams.update(word[i:i + 3] for i in range(len(word) - 2))
+    return ' OR '.join('"%s"' % gram.replace('"', '""') for gram in sorted(grams))
+
+
+def _like_pattern(text):
+    return '%' + text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+
+
+def _candidate_ids(table, fts_table, columns, query, limit):
+    """
+    Идентификаторы кандидатов из триграммного индекса текущей СУБД
+    или None, если индексом воспользоваться нельзя
+    """
+    text = query.strip()
+    if connection.vendor == 'postgresql':
+        like = _like_pattern(text)
+        where_sql = ' OR '.join(f'{column} %% %s OR {column} ILIKE %s' for column in columns)
+        similarity_sql = ' + '.join(f'similarity({column}, %s)' for column in columns)
+        params = [text, like] * len(columns) + [text] * len(columns) + [limit]
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id FROM {table} WHERE {where_sql} ORDER BY {similarity_sql} DESC LIMIT %s',
+                params,
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    if connection.vendor == 'sqlite':
+        match = _fts_query(text)
+        if not match:
+            return None
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {fts_table} WHERE {fts_table} MATCH %s ORDER BY rank LIMIT %s',
+                [match, limit],
+            )
+            return [row[0] for row in cursor.fetchall()]
+
+    return None
+
+
+def _prefix_q(prefix):
+    if connection.vendor == 'sqlite':
+        # LIKE в SQLite регистронезависим и индекс по BINARY-столбцу не берёт,
+        # а диапазон берёт
+        return Q(serial_number__gte=prefix, serial_number__lt=prefix + '\uffff')
+    # На PostgreSQL LIKE 'x%' идёт по индексам с varchar_pattern_ops;
+    # диапазон при лингвистической сортировке базы неверен
+    return Q(serial_number__startswith=prefix)
+
+
+def serial_prefix_filter(query):
+    """
+    Условие «серийный номер начинается с query» по индексу. Регистр номеров
+    при записи не меняется, поэтому ищется и введённый префикс, и он же
+    в верхнем регистре.
+    """
+    text = query.strip()
+    condition = _prefix_q(text)
+    if text.upper() != text:
+        condition |= _prefix_q(text.upper())
+    return condition
+
+
+def search_cartridges(query, limit=SEARCH_LIMIT, candidates=CANDIDATE_LIMIT):
+    """Расходники по серийному номеру: [(расходник, оценка)]"""
+    ids = _candidate_ids(
+        Cartridge._meta.db_table, CARTRIDGE_FTS_TABLE, ['serial_number'], query, candidates
+    )
+    queryset = Cartridge.objects.select_related('model')
+    if ids is None:
+        # Короткий запрос или другая СУБД: поиск по началу номера
+        queryset = queryset.filter(serial_number__istartswith=query.strip())[:candidates]
+    else:
+        queryset = queryset.filter(pk__in=ids)
+    return rank(query, [(c, c.serial_number) for c in queryset], limit)
+
+
+def cartridge_ids_containing(query):
+    """
+    Подзапрос id расходников, серийный номер которых содержит query, для
+    pk__in. Без ограничения числа и ранжирования: для списков, выгрузок
+    и админки, где нужны все совпадения. Ранжированный поиск с опечатками
+    и лимитом — search_cartridges (подсказки при вводе).
+    """
+    text = query.strip()
+    pattern = _like_pattern(text)
+    if connection.vendor == 'postgresql':
+        # ILIKE, а не UPPER(...) LIKE: так используется GIN-индекс gin_trgm_ops
+        return RawSQL(
+            f'SELECT id FROM {Cartridge._meta.db_table} WHERE serial_number ILIKE %s', [pattern]
+        )
+    if connection.vendor == 'sqlite':
+        # LIKE по FTS5-таблице с триграммным токенизатором идёт по индексу;
+        # ESCAPE индекс отключает, поэтому добавляется только при необходимости
+        if pattern == f'%{text}%':
+            return RawSQL(f'SELECT rowid FROM {CARTRIDGE_FTS_TABLE} WHERE serial_number LIKE %s', [pattern])
+        return RawSQL(
+            f"SELECT rowid FROM {CARTRIDGE_FTS_TABLE} WHERE serial_number LIKE %s ESCAPE '\\'", [pattern]
+        )
+    return Cartridge.objects.filter(serial_number__icontains=text).values('pk')
+
+
+def search_printers(query, limit=SEARCH_LIMIT, candidates=CANDIDATE_LIMIT):
+    """Принтеры по названию, модели и серийному номеру: [(принтер, оценка)]"""
+    ids = _candidate_ids(
+        Printer._meta.db_table, PRINTER_FTS_TABLE, ['name', 'model', 'serial_number'], query, candidates
+    )
+    queryset = Printer.objects.all()
+    if ids is None:
+        queryset = queryset.filter(name__istartswith=query.strip())[:candidates]
+    else:
+        queryset = queryset.filter(pk__in=ids)
+    return rank(query, [(p, f'{p.name} {p.model} {p.serial_number}') for p in queryset], limit)
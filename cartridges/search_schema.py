@@ -0,0 +1,88 @@
+"""
+Поисковые индексы СУБД для cartridges.search.
+
+Модуль не импортирует модели, поэтому его можно использовать в миграциях.
+"""
+
+SQLITE_FORWARD = [
+    # Триграммные FTS5-таблицы: rowid совпадает с id исходной строки
+    "CREATE VIRTUAL TABLE cartridges_cartridge_fts USING fts5(serial_number, tokenize='trigram')",
+    "INSERT INTO cartridges_cartridge_fts(rowid, serial_number) SELECT id, serial_number FROM cartridges_cartridge",
+    """CREATE TRIGGER cartridges_cartridge_fts_ai AFTER INSERT ON cartridges_cartridge BEGIN
+        INSERT INTO cartridges_cartridge_fts(rowid, serial_number) VALUES (new.id, new.serial_number);
+    END""",
+    """CREATE TRIGGER cartridges_cartridge_fts_au AFTER UPDATE OF serial_number ON cartridges_cartridge BEGIN
+        DELETE FROM cartridges_cartridge_fts WHERE rowid = old.id;
+        INSERT INTO cartridges_cartridge_fts(rowid, serial_number) VALUES (new.id, new.serial_number);
+    END""",
+    """CREATE TRIGGER cartridges_cartridge_fts_ad AFTER DELETE ON cartridges_cartridge BEGIN
+        DELETE FROM cartridges_cartridge_fts WHERE rowid = old.id;
+    END""",
+    "CREATE VIRTUAL TABLE cartridges_printer_fts USING fts5(name, model, serial_number, tokenize='trigram')",
+    """INSERT INTO cartridges_printer_fts(rowid, name, model, serial_number)
+        SELECT id, name, model, serial_number FROM cartridges_printer""",
+    """CREATE TRIGGER cartridges_printer_fts_ai AFTER INSERT ON cartridges_printer BEGIN
+        INSERT INTO cartridges_printer_fts(rowid, name, model, serial_number)
+        VALUES (new.id, new.name, new.model, new.serial_number);
+    END""",
+    """CREATE TRIGGER cartridges_printer_fts_au AFTER UPDATE OF name, model, serial_number ON cartridges_printer BEGIN
+        DELETE FROM cartridges_printer_fts WHERE rowid = old.id;
+        INSERT INTO cartridges_printer_fts(rowid, name, model, serial_number)
+        VALUES (new.id, new.name, new.model, new.serial_number);
+    END""",
+    """CREATE TRIGGER cartridges_printer_fts_ad AFTER DELETE ON cartridges_printer BEGIN
+        DELETE FROM cartridges_printer_fts WHERE rowid = old.id;
+    END""",
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS cartridges_cartridge_fts_ai',
+    'DROP TRIGGER IF EXISTS cartridges_cartridge_fts_au',
+    'DROP TRIGGER IF EXISTS cartridges_cartridge_fts_ad',
+    'DROP TABLE IF EXISTS cartridges_cartridge_fts',
+    'DROP TRIGGER IF EXISTS cartridges_printer_fts_ai',
+    'DROP TRIGGER IF EXISTS cartridges_printer_fts_au',
+    'DROP TRIGGER IF EXISTS cartridges_printer_fts_ad',
+    'DROP TABLE IF EXISTS cartridges_printer_fts',
+]
+
+POSTGRESQL_FORWARD = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    'CREATE INDEX IF NOT EXISTS cartridges_cartridge_serial_trgm '
+    'ON cartridges_cartridge USING gin (serial_number gin_trgm_ops)',
+    'CREATE INDEX IF NOT EXISTS cartridges_printer_name_trgm '
+    'ON cartridges_printer USING gin (name gin_trgm_ops, model gin_trgm_ops, serial_number gin_trgm_ops)',
+]
+
+POSTGRESQL_BACKWARD = [
+    'DROP INDEX IF EXISTS cartridges_cartridge_serial_trgm',
+    'DROP INDEX IF EXISTS cartridges_printer_name_trgm',
+]
+
+
+FORWARD = {'sqlite': SQLITE_FORWARD, 'postgresql': POSTGRESQL_FORWARD}
+BACKWARD = {'sqlite': SQLITE_BACKWARD, 'postgresql': POSTGRESQL_BACKWARD}
+
+
+def _execute(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement, params=None)
+
+
+def install(apps, schema_editor):
+    """Создаёт поисковые индексы для текущей СУБД (шаг RunPython)"""
+    _execute(schema_editor, FORWARD)
+
+
+def uninstall(apps, schema_editor):
+    _execute(schema_editor, BACKWARD)
+
+
+def reinstall(apps, schema_editor):
+    """
+    Пересоздаёт поисковые таблицы и триггеры. Нужен в миграциях, после
+    которых SQLite пересоздаёт таблицу расходников или принтеров:
+    триггеры старой таблицы при этом теряются.
+    """
+    uninstall(apps, schema_editor)
+    install(apps, schema_editor)
@@ -0,0 +1,414 @@
+import logging
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Q, Count, F, OuterRef, Subquery, Sum
+from django.db.models.functions import TruncMonth
+from django.utils import timezone
+
+from .models import Cartridge, Operation, InventorySummary, OperationDailyRollup
+from .transitions import get_transition
+
+
+logger = logging.getLogger(__name__)
+
+
+# Версия инвентаря: любое изменение расходников или операций увеличивает её,
+# и все снимки, построенные для старой версии, перестают использоваться.
+INVENTORY_VERSION_KEY = 'inventory:version'
+DASHBOARD_SNAPSHOT_KEY = 'dashboard:snapshot:{version}'
+# Страховочный срок жизни снимка на случай изменений в обход save()
+DASHBOARD_SNAPSHOT_TIMEOUT = 10 * 60
+DASHBOARD_ATTENTION_LIMIT = 10
+DASHBOARD_RECENT_OPERATIONS = 10
+# Сколько последних месяцев показывать в расходе принтера
+PRINTER_CONSUMPTION_MONTHS = 12
+
+ATTENTION_Q = Q(needs_attention=True)
+
+
+def get_inventory_version():
+    """Текущая версия инвентаря (создаётся при первом обращении)"""
+    version = cache.get(INVENTORY_VERSION_KEY)
+    if version is None:
+        # Берём время, чтобы после очистки кэша не совпасть со старыми снимками
+        cache.add(INVENTORY_VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(INVENTORY_VERSION_KEY)
+    return version
+
+
+def bump_inventory_version():
+    """Увеличивает версию инвентаря после фиксации текущей транзакции"""
+    def _bump():
+        try:
+            cache.incr(INVENTORY_VERSION_KEY)
+        except ValueError:
+            get_inventory_version()
+
+    transaction.on_commit(_bump)
+
+
+def compute_dashboard_stats():
+    """
+    Счётчики дашборда: статусы и типы — из сводки остатков,
+    состояния — одним агрегирующим запросом по расходникам
+    """
+    cartridge = Q(consumable_type='cartridge')
+    drum = Q(consumable_type='drum')
+    in_stock = Q(status='in_stock')
+    installed = Q(status='installed')
+
+    stats = InventorySummary.objects.aggregate(
+        total_consumables=Sum('count', default=0),
+        total_cartridges=Sum('count', filter=cartridge, default=0),
+        total_drums=Sum('count', filter=drum, default=0),
+        cartridges_in_stock=Sum('count', filter=cartridge & in_stock, default=0),
+        drums_in_stock=Sum('count', filter=drum & in_stock, default=0),
+        cartridges_installed=Sum('count', filter=cartridge & installed, default=0),
+        drums_installed=Sum('count', filter=drum & installed, default=0),
+        at_service=Sum('count', filter=Q(status='at_service'), default=0),
+    )
+
+    needs_repair = Q(condition='needs_repair')
+    over_refilled = Q(refill_count__gte=F('model__max_refills'))
+    stats.update(Cartridge.objects.filter(ATTENTION_Q).aggregate(
+        needs_repair=Count('id', filter=needs_repair),
+        needs_repair_count=Count(
+            'id', filter=needs_repair & Q(current_status__in=['in_stock', 'installed'])
+        ),
+        max_refills_count=Count('id', filter=over_refilled & needs_repair),
+        attention_count=Count('id'),
+    ))
+    return stats
+
+
+def build_dashboard_snapshot():
+    """Собирает все данные главной страницы"""
+    stats = compute_dashboard_stats()
+
+    recent_operations = list(
+        Operation.objects.select_related('cartridge', 'user', 'to_location')
+        .order_by('-timestamp')[:DASHBOARD_RECENT_OPERATIONS]
+    )
+
+    attention_consumables = list(
+        Cartridge.objects.filter(ATTENTION_Q)
+        .select_related('model', 'current_location')
+        .order_by('-condition', '-refill_count')[:DASHBOARD_ATTENTION_LIMIT]
+    )
+
+    return {
+        'stats': stats,
+        'recent_operations': recent_operations,
+        'attention_consumables': attention_consumables,
+        'attention_count': stats['attention_count'],
+        'needs_repair_count': stats['needs_repair_count'],
+        'max_refills_count': stats['max_refills_count'],
+    }
+
+
+def get_dashboard_snapshot():
+    """Снимок дашборда для текущей версии инвентаря"""
+    key = DASHBOARD_SNAPSHOT_KEY.format(version=get_inventory_version())
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_dashboard_snapshot()
+        cache.set(key, snapshot, DASHBOARD_SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+BULK_BATCH_SIZE = 500
+
+
+class BulkOperationResult:
+    """Итог массовой операции: число обработанных расходников и ошибки по каждому"""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = []
+        self.applied = []
+        self.failed = {}
+
+    def add_error(self, serial_number, message):
+        self.errors.append(f"{serial_number}: {message}")
+        self.failed[serial_number] = message
+
+
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def bulk_apply_operation(cartridges, operation_type, to_location, user,
+                         printer=None, reason='', notes=''):
+    """
+    Применяет операцию ко всем расходникам из queryset одной транзакцией.
+
+    Допустимость перехода проверяется по таблице переходов, расходники
+    читаются одним запросом, статус меняется одним UPDATE на пачку,
+    операции создаются через bulk_create, поэтому число запросов не зависит
+    от количества расходников. Расходники, к которым операцию применить
+    нельзя, попадают в список ошибок и не изменяются.
+    """
+    result = BulkOperationResult()
+    transition = get_transition(operation_type)
+    now = timezone.now()
+
+    with transaction.atomic():
+        rows = (
+            cartridges.order_by()
+            .select_for_update(of=('self',))
+            .values_list(
+                'id', 'serial_number', 'current_status', 'current_location_id',
+                'model_id', 'consumable_type',
+            )
+        )
+
+        accepted = []
+        summary_deltas = defaultdict(int)
+        rollup_deltas = defaultdict(int)
+        for pk, serial_number, current_status, location_id, model_id, consumable_type in rows:
+            error = transition.error_for(current_status)
+            if error:
+                result.add_error(serial_number, error)
+                continue
+            accepted.append((pk, location_id))
+            result.applied.append(serial_number)
+            summary_deltas[(location_id, model_id, consumable_type, current_status)] -= 1
+            summary_deltas[(to_location.pk, model_id, consumable_type, transition.to_status)] += 1
+            rollup_key = OperationDailyRollup.key_for(operation_type, now, model_id, to_location.pk)
+            if rollup_key:
+                rollup_deltas[rollup_key] += 1
+
+        for batch in _chunks(accepted, BULK_BATCH_SIZE):
+            transition.apply_bulk(
+                Cartridge.objects.filter(pk__in=[pk for pk, _ in batch]),
+                to_location.pk,
+                printer.pk if printer else None,
+            )
+
+        # bulk_create не вызывает Operation.save(), статус уже обновлён выше
+        Operation.objects.bulk_create(
+            [
+                Operation(
+                    operation_type=operation_type,
+                    cartridge_id=pk,
+                    from_location_id=location_id,
+                    to_location=to_location,
+                    printer=printer,
+                    user=user,
+                    timestamp=now,
+                    reason=reason,
+                    notes=notes,
+                )
+                for pk, location_id in accepted
+            ],
+            batch_size=BULK_BATCH_SIZE,
+        )
+
+        InventorySummary.apply_deltas(summary_deltas)
+        OperationDailyRollup.apply_deltas(rollup_deltas)
+
+        result.count = len(accepted)
+        if accepted:
+            bump_inventory_version()
+
+    return result
+
+
+SCAN_MAX_SERIALS = 1000
+
+
+def scan_apply_operation(serial_numbers, operation_type, to_location, user,
+                         printer=None, reason='', notes=''):
+    """
+    Применяет операцию к отсканированным серийным номерам.
+
+    Все номера разрешаются одним запросом с IN и обрабатываются одной
+    транзакцией через bulk_apply_operation. Возвращает результат по каждому
+    номеру в порядке сканирования: повторные сканы и неизвестные номера
+    отмечаются ошибкой, остальные — итогом перехода.
+    """
+    transition = get_transition(operation_type)
+    unique_serials = list(dict.fromkeys(serial_numbers))
+
+    result = BulkOperationResult()
+    if unique_serials:
+        result = bulk_apply_operation(
+            Cartridge.objects.filter(serial_number__in=unique_serials),
+            operation_type,
+            to_location,
+            user,
+            printer=printer,
+            reason=reason,
+            notes=notes,
+        )
+
+    applied = set(result.applied)
+    seen = set()
+    results = []
+    for serial_number in serial_numbers:
+        if serial_number in seen:
+            results.append({'serial_number': serial_number, 'success': False,
+                            'error': 'Повторное сканирование'})
+            continue
+        seen.add(serial_number)
+        if serial_number in applied:
+            results.append({'serial_number': serial_number, 'success': True,
+                            'status': transition.to_status})
+        elif serial_number in result.failed:
+            results.append({'serial_number': serial_number, 'success': False,
+                            'error': result.failed[serial_number]})
+        else:
+            results.append({'serial_number': serial_number, 'success': False,
+                            'error': 'Расходник не найден'})
+    return result.count, results
+
+
+RETURN_CHUNK_SIZE = 200
+
+
+def return_from_service(user, warehouse, service_location=None, serial_numbers=None,
+                        task_id=None, chunk_size=RETURN_CHUNK_SIZE, on_progress=None):
+    """
+    Возвращает расходники с заправки на склад пачками по chunk_size.
+
+    Каждая пачка обрабатывается bulk_apply_operation() в своей транзакции,
+    после неё прогресс передаётся в on_progress (фоновая задача сохраняет
+    его в Job, интерфейс опрашивает статус задачи). task_id попадает в журнал.
+    Можно ограничить возврат одним сервисным центром или списком серийных номеров.
+    """
+    cartridges = Cartridge.objects.filter(current_status='at_service')
+    if service_location is not None:
+        cartridges = cartridges.filter(current_location=service_location)
+    if serial_numbers:
+        cartridges = cartridges.filter(serial_number__in=serial_numbers)
+
+    started = time.monotonic()
+    progress = {
+        'task_id': task_id,
+        'state': 'running',
+        'total': cartridges.count(),
+        'processed': 0,
+        'errors': [],
+        'elapsed_ms': 0,
+    }
+
+    def _report(progress):
+        if on_progress:
+            on_progress(progress)
+
+    _report(progress)
+
+    # Идём по первичному ключу: обработанные строки уходят из выборки,
+    # поэтому открытый курсор по изменяемой таблице не держим
+    last_pk = 0
+    batch_number = 0
+    try:
+        while True:
+            batch = list(
+                cartridges.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not batch:
+                break
+            last_pk = batch[-1]
+            batch_number += 1
+
+            batch_started = time.monotonic()
+            result = bulk_apply_operation(
+                Cartridge.objects.filter(pk__in=batch, current_status='at_service'),
+                operation_type='receive_service',
+                to_location=warehouse,
+                user=user,
+                reason='Возврат с заправки',
+                notes='Картридж возвращен со сервисного центра на склад',
+            )
+            batch_ms = (time.monotonic() - batch_started) * 1000
+
+            progress['processed'] += result.count
+            progress['errors'].extend(result.errors)
+            progress['elapsed_ms'] = round((time.monotonic() - started) * 1000)
+            _report(progress)
+
+            logger.info(
+                'return_from_service task=%s batch=%d size=%d returned=%d errors=%d batch_ms=%.1f',
+                task_id, batch_number, len(batch), result.count, len(result.errors), batch_ms,
+            )
+    except Exception as e:
+        progress['state'] = 'failed'
+        progress['errors'].append(str(e))
+        _report(progress)
+        logger.exception('return_from_service task=%s failed', task_id)
+        raise
+
+    progress['state'] = 'done'
+    progress['elapsed_ms'] = round((time.monotonic() - started) * 1000)
+    _report(progress)
+    logger.info(
+        'return_from_service task=%s done total=%d returned=%d errors=%d elapsed_ms=%d',
+        task_id, progress['total'], progress['processed'], len(progress['errors']),
+        progress['elapsed_ms'],
+    )
+    return progress
+
+
+def annotate_printer_consumables(printers):
+    """
+    Число установленных расходников и дата последней установки у каждого
+    принтера: один запрос на весь список.
+    """
+    last_install = Operation.objects.filter(
+        printer=OuterRef('pk'), operation_type='install'
+    ).order_by('-timestamp').values('timestamp')[:1]
+    return printers.annotate(
+        installed_count=Count('cartridge'),
+        last_replacement=Subquery(last_install),
+    )
+
+
+def printer_install_history(printer):
+    """
+    Установки в принтер. Снятием считается следующая операция того же
+    расходника: у снятия принтер не записывается, поэтому её дата и тип
+    подставляются подзапросом по индексу истории расходника.
+    """
+    release = Operation.objects.filter(
+        Q(timestamp__gt=OuterRef('timestamp')) | Q(timestamp=OuterRef('timestamp'), id__gt=OuterRef('id')),
+        cartridge=OuterRef('cartridge'),
+    ).order_by('timestamp', 'id')
+    return Operation.objects.filter(printer=printer, operation_type='install').select_related(
+        'cartridge__model', 'user'
+    ).annotate(
+        removed_at=Subquery(release.values('timestamp')[:1]),
+        removal_type=Subquery(release.values('operation_type')[:1]),
+    )
+
+
+def printer_monthly_consumption(printer, months=PRINTER_CONSUMPTION_MONTHS):
+    """Установки в принтер по месяцам за последние months месяцев, включая пустые"""
+    now = timezone.localtime()
+    index = now.year * 12 + now.month - 1
+    month_starts = [
+        timezone.make_aware(datetime(i // 12, i % 12 + 1, 1))
+        for i in range(index - months + 1, index + 1)
+    ]
+    rows = (
+        Operation.objects.filter(printer=printer, operation_type='install', timestamp__gte=month_starts[0])
+        .annotate(month=TruncMonth('timestamp'))
+        .values('month')
+        .annotate(installs=Count('id'), cartridges=Count('cartridge', distinct=True))
+        .order_by()
+    )
+    by_month = {row['month'].date(): row for row in rows}
+    return [
+        {
+            'month': start,
+            'installs': by_month.get(start.date(), {}).get('installs', 0),
+            'cartridges': by_month.get(start.date(), {}).get('cartridges', 0),
+        }
+        for start in month_starts
+    ]
@@ -0,0 +1,77 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+
+from .models import Cartridge, CartridgeModel, Location, Operation, InventorySummary, Printer
+from .reference import bump_reference_version
+from .services import bump_inventory_version
+
+
+@receiver(post_save, sender=Cartridge)
+@receiver(post_delete, sender=Cartridge)
+@receiver(post_save, sender=Operation)
+@receiver(post_delete, sender=Operation)
+def inventory_changed(sender, **kwargs):
+    """Сбрасывает снимки дашборда при изменении инвентаря"""
+    bump_inventory_version()
+
+
+@receiver(pre_save, sender=Cartridge)
+def remember_summary_key(sender, instance, raw=False, **kwargs):
+    """Запоминает ключ сводки остатков до сохранения расходника"""
+    instance._summary_key = None
+    if instance.pk and not raw:
+        previous = (
+            Cartridge.objects.filter(pk=instance.pk)
+            .values_list('current_location_id', 'model_id', 'consumable_type', 'current_status')
+            .first()
+        )
+        instance._summary_key = previous
+
+
+@receiver(post_save, sender=Cartridge)
+def update_summary_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_key = InventorySummary.key_for(instance)
+    old_key = getattr(instance, '_summary_key', None)
+    if old_key is None:
+        InventorySummary.apply_deltas({new_key: 1})
+    else:
+        InventorySummary.record_move(old_key, new_key)
+
+
+@receiver(post_delete, sender=Cartridge)
+def update_summary_on_delete(sender, instance, **kwargs):
+    InventorySummary.apply_deltas({InventorySummary.key_for(instance): -1})
+
+
+@receiver(pre_save, sender=CartridgeModel)
+def remember_max_refills(sender, instance, raw=False, **kwargs):
+    instance._previous_max_refills = None
+    if instance.pk and not raw:
+        instance._previous_max_refills = (
+            CartridgeModel.objects.filter(pk=instance.pk).values_list('max_refills', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=CartridgeModel)
+def refresh_needs_attention(sender, instance, created, raw=False, **kwargs):
+    """Новый лимит заправок пересчитывает флаг внимания всех расходников модели одним UPDATE"""
+    previous = getattr(instance, '_previous_max_refills', None)
+    if raw or created or previous is None or previous == instance.max_refills:
+        return
+    Cartridge.objects.filter(model=instance).update(
+        needs_attention=Cartridge.needs_attention_expression(max_refills=instance.max_refills)
+    )
+    bump_inventory_version()
+
+
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+@receiver(post_save, sender=CartridgeModel)
+@receiver(post_delete, sender=CartridgeModel)
+@receiver(post_save, sender=Printer)
+@receiver(post_delete, sender=Printer)
+def reference_data_changed(sender, **kwargs):
+    """Справочники в памяти воркеров перечитываются при следующем обращении"""
+    bump_reference_version()
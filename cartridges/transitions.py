@@ -0,0 +1,140 @@
+from django.core.exceptions import ValidationError
+from django.db.models import F
+from django.utils import timezone
+
+
+ACTIVE_STATUSES = frozenset({'in_stock', 'in_transit', 'at_service', 'in_reserve', 'installed'})
+STORED_STATUSES = frozenset({'in_stock', 'in_transit', 'in_reserve'})
+
+
+class InvalidTransition(ValidationError):
+    """Операция недоступна для расходника в его текущем статусе"""
+
+
+class Transition:
+    """
+    Переход расходника по операции: из каких статусов он допустим
+    и какие поля расходника меняет.
+    """
+
+    def __init__(self, operation_type, from_statuses, to_status,
+                 sets_printer=False, condition=None, counts_refill=False):
+        self.operation_type = operation_type
+        self.from_statuses = frozenset(from_statuses)
+        self.to_status = to_status
+        self.sets_printer = sets_printer
+        self.condition = condition
+        self.counts_refill = counts_refill
+
+    def error_for(self, status):
+        """Текст ошибки для статуса или None, если переход допустим"""
+        if status in self.from_statuses:
+            return None
+        from .models import Cartridge, Operation
+        label = dict(Operation.OPERATION_TYPES)[self.operation_type]
+        status_label = dict(Cartridge.STATUS_CHOICES).get(status, status)
+        return f'Операция "{label}" недоступна для расходника в статусе "{status_label}"'
+
+    def validate(self, cartridge):
+        error = self.error_for(cartridge.current_status)
+        if error:
+            raise InvalidTransition(error, code='invalid_transition')
+
+    def target_fields(self, to_location_id, printer_id=None):
+        """Значения полей расходника после перехода (без счётчика заправок)"""
+        fields = {
+            'current_status': self.to_status,
+            'current_location_id': to_location_id,
+            # Принтер остаётся только у установленного расходника
+            'installed_in_printer_id': printer_id if self.sets_printer else None,
+        }
+        if self.condition:
+            fields['condition'] = self.condition
+        return fields
+
+    def apply(self, cartridge, to_location_id, printer_id=None, extra=None):
+        """
+        Применяет переход к одному расходнику одним UPDATE только по
+        изменившимся полям и синхронизирует объект в памяти.
+        Возвращает список записанных полей.
+        """
+        target = self.target_fields(to_location_id, printer_id)
+        if extra:
+            target.update(extra)
+
+        changes = {
+            name: value for name, value in target.items()
+            if getattr(cartridge, name) != value
+        }
+        cls = type(cartridge)
+        # Переход проверен по статусу объекта в памяти: запись идёт только
+        # если в базе статус тот же, иначе параллельный запрос успел раньше
+        current = cls._base_manager.filter(pk=cartridge.pk, current_status=cartridge.current_status)
+        if not changes and not self.counts_refill:
+            if not current.exists():
+                self._raise_stale(cartridge)
+            return []
+
+        update = dict(changes, updated_at=timezone.now())
+        if self.counts_refill:
+            update['refill_count'] = F('refill_count') + 1
+        attention_changed = self.counts_refill or 'condition' in changes
+        if attention_changed:
+            update['needs_attention'] = cls.needs_attention_expression(
+                changes.get('condition'), int(self.counts_refill)
+            )
+        if not current.update(**update):
+            self._raise_stale(cartridge)
+
+        for name, value in changes.items():
+            setattr(cartridge, name, value)
+        cartridge.updated_at = update['updated_at']
+        if self.counts_refill:
+            cartridge.refill_count += 1
+        if attention_changed:
+            if cls.model.is_cached(cartridge):
+                cartridge.needs_attention = cls.compute_needs_attention(
+                    cartridge.condition, cartridge.refill_count, cartridge.model.max_refills
+                )
+            else:
+                # Значение посчитано в БД и загрузится при первом обращении
+                cartridge.__dict__.pop('needs_attention', None)
+        return list(update)
+
+    def _raise_stale(self, cartridge):
+        status = type(cartridge)._base_manager.filter(pk=cartridge.pk).values_list('current_status', flat=True).first()
+        error = self.error_for(status) or 'Расходник изменён другим запросом, повторите операцию'
+        raise InvalidTransition(error, code='invalid_transition')
+
+    def apply_bulk(self, queryset, to_location_id, printer_id=None):
+        """Применяет переход ко всем расходникам queryset одним UPDATE"""
+        update = dict(self.target_fields(to_location_id, printer_id), updated_at=timezone.now())
+        if self.counts_refill:
+            update['refill_count'] = F('refill_count') + 1
+        if self.counts_refill or self.condition:
+            update['needs_attention'] = queryset.model.needs_attention_expression(
+                self.condition, int(self.counts_refill)
+            )
+        return queryset.update(**update)
+
+
+TRANSITIONS = {
+    transition.operation_type: transition
+    for transition in [
+        Transition('receipt', STORED_STATUSES, 'in_stock'),
+        Transition('issue_service', ACTIVE_STATUSES - {'at_service'}, 'at_service'),
+        Transition('receive_service', {'at_service'}, 'in_stock',
+                   condition='refilled', counts_refill=True),
+        Transition('install', STORED_STATUSES, 'installed', sets_printer=True),
+        Transition('remove', {'installed'}, 'in_stock'),
+        Transition('transfer', ACTIVE_STATUSES, 'in_transit'),
+        Transition('dispose', ACTIVE_STATUSES, 'disposed'),
+    ]
+}
+
+
+def get_transition(operation_type):
+    try:
+        return TRANSITIONS[operation_type]
+    except KeyError:
+        raise InvalidTransition(f'Неизвестный тип операции: {operation_type}', code='unknown_operation')
@@ -8,20 +8,30 @@ urlpatterns = [
     
     
     path('cartridges/', views.cartridge_list, name='cartridge_list'),
+    path('cartridges/export/', views.cartridge_export, name='cartridge_export'),
     path('cartridges/add/', views.cartridge_create, name='cartridge_create'),
     path('cartridges/<int:pk>/', views.cartridge_detail, name='cartridge_detail'),
     path('printers/', views.printer_list, name='printer_list'),
+    path('printers/export/', views.printer_export, name='printer_export'),
     path('printers/add/', views.printer_create, name='printer_create'),
     path('printers/<int:pk>/', views.printer_detail, name='printer_detail'),
     path('operations/add/', views.operation_create, name='operation_create'),
+    path('import/', views.import_data, name='import_data'),
+    path('operations/export/', views.operation_export, name='operation_export'),
+    path('operations/scan/', views.scan_operations, name='scan_operations'),
     path('operations/add/<int:cartridge_pk>/', views.operation_create, name='operation_create_for_cartridge'),
     path('api/cartridge/<int:cartridge_id>/', views.get_cartridge_info, name='cartridge_info'),
     path('api/printers-by-location/', views.get_printers_by_location, name='printers_by_location'),
     path('api/locations-by-operation/', views.get_locations_by_operation_type, name='locations_by_operation'),
     path('api/search-models/', views.search_cartridge_models, name='search_models'),
+    path('api/lookup/cartridges/', views.cartridge_lookup, name='cartridge_lookup'),
+    path('api/lookup/printers/', views.printer_lookup, name='printer_lookup'),
+    path('api/search/', views.global_search, name='search'),
     path('cartridges/<int:pk>/update-condition/', views.update_cartridge_condition, name='update_cartridge_condition'),
     path('cartridges/bulk-send-to-service/', views.bulk_send_to_service, name='bulk_send_to_service'),
     path('cartridges/<int:pk>/send-to-service/', views.send_to_service, name='send_to_service'),
     path('report/attention/', views.print_attention_report, name='print_attention_report'),
     path('cartridges/bulk-return-from-service/', views.bulk_return_from_service, name='bulk_return_from_service'),
+    path('jobs/<int:pk>/', views.job_status, name='job_status'),
+    path('metrics', views.metrics, name='metrics'),
 ]
\ No newline at end of file
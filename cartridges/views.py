@@ -1,56 +1,45 @@
-from django.shortcuts import render, get_object_or_404, redirect
+import json
+import logging
+import os
+import uuid
+
+from asgiref.sync import sync_to_async
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db.models import Q, Count, F
 from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import etag
 from django.http import JsonResponse
-from .models import Cartridge, Operation, CartridgeModel, Location, Printer
-from .forms import OperationForm, CartridgeForm, PrinterForm
-from django.http import JsonResponse
+from .models import Cartridge, Operation, ArchivedOperation, CartridgeModel, Location, Printer, Job
+from .forms import OperationForm, CartridgeForm, PrinterForm, ImportForm
+from . import services, search, filters, exports, imports, jobs, reference, lifecycle, metrics as view_metrics
+from .transitions import InvalidTransition, get_transition
+from .pagination import keyset_paginate, keyset_paginate_chain, approximate_count, InvalidCursor
+from .replica import reporting_reads
+from .idempotency import idempotent
+from django.http import JsonResponse, HttpResponse, HttpResponseForbidden
+from django.conf import settings
 from django.utils import timezone
+from django.utils.crypto import constant_time_compare
+
+logger = logging.getLogger(__name__)
+
+CARTRIDGE_LIST_PAGE_SIZE = 50
+CARTRIDGE_LIST_ORDERING = ('-created_at', 'id')
+LOOKUP_PAGE_SIZE = 20
+TIMELINE_PAGE_SIZE = 25
+TIMELINE_ORDERING = ('-timestamp', '-id')
+PRINTER_HISTORY_PAGE_SIZE = 20
+
+
 @login_required
 def dashboard(request):
     """Главная панель управления с учётом типов расходников"""
-    # Обновлённая статистика
-    stats = {
-        'total_consumables': Cartridge.objects.count(),
-        'total_cartridges': Cartridge.objects.filter(consumable_type='cartridge').count(),
-        'total_drums': Cartridge.objects.filter(consumable_type='drum').count(),
-        'cartridges_in_stock': Cartridge.objects.filter(consumable_type='cartridge', current_status='in_stock').count(),
-        'drums_in_stock': Cartridge.objects.filter(consumable_type='drum', current_status='in_stock').count(),
-        'cartridges_installed': Cartridge.objects.filter(consumable_type='cartridge', current_status='installed').count(),
-        'drums_installed': Cartridge.objects.filter(consumable_type='drum', current_status='installed').count(),
-        'at_service': Cartridge.objects.filter(current_status='at_service').count(),
-        'needs_repair': Cartridge.objects.filter(condition='needs_repair').count(),
-    }
-    
-    # Последние операции
-    recent_operations = Operation.objects.select_related('cartridge', 'user')[:10]
-    
-    # Картриджи и барабаны, требующие внимания
-    attention_consumables = Cartridge.objects.filter(
-        Q(condition='needs_repair') | 
-        Q(refill_count__gte=F('model__max_refills'))
-    ).order_by('-condition', '-refill_count')
-    
-    # Дополнительная статистика для кнопки
-    needs_repair_count = Cartridge.objects.filter(
-        condition='needs_repair',
-        current_status__in=['in_stock', 'installed']
-    ).count()
-    
-    max_refills_count = Cartridge.objects.filter(
-        refill_count__gte=F('model__max_refills'),
-        condition='needs_repair'
-    ).count()
-    
-    context = {
-        'stats': stats,
-        'recent_operations': recent_operations,
-        'attention_consumables': attention_consumables,
-        'needs_repair_count': needs_repair_count,
-        'max_refills_count': max_refills_count,
-    }
+    # Снимок пересчитывается только после изменения инвентаря
+    context = services.get_dashboard_snapshot()
     return render(request, 'cartridges/dashboard.html', context)
 
 
@@ -59,41 +48,78 @@ def cartridge_list(request):
     """Список всех расходников с фильтрацией по типу"""
     consumables = Cartridge.objects.select_related('model', 'current_location', 'installed_in_printer')
     
-    # Применяем фильтры
-    consumable_type = request.GET.get('consumable_type')
-    status = request.GET.get('status')
-    model_id = request.GET.get('model')
-    location_id = request.GET.get('location')
-    condition = request.GET.get('condition')
-    needs_attention = request.GET.get('needs_attention')
-    
-    if consumable_type:
-        consumables = consumables.filter(consumable_type=consumable_type)
-    if status:
-        consumables = consumables.filter(current_status=status)
-    if model_id:
-        consumables = consumables.filter(model_id=model_id)
-    if location_id:
-        consumables = consumables.filter(current_location_id=location_id)
-    if condition:
-        consumables = consumables.filter(condition=condition)
-    if needs_attention:
-        # Фильтр для "требуют внимания"
-        consumables = consumables.filter(
-            Q(condition='needs_repair') | 
-            Q(refill_count__gte=F('model__max_refills'))
+    consumables = filters.filter_cartridges(consumables, request.GET)
+    
+    # Keyset-пагинация: стоимость страницы не зависит от её номера
+    try:
+        page = keyset_paginate(
+            consumables,
+            CARTRIDGE_LIST_ORDERING,
+            CARTRIDGE_LIST_PAGE_SIZE,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
         )
+    except InvalidCursor:
+        page = keyset_paginate(consumables, CARTRIDGE_LIST_ORDERING, CARTRIDGE_LIST_PAGE_SIZE)
+    
+    total_count, total_is_exact = approximate_count(consumables)
+    reference_data = reference.get_reference_data()
+    
+    filter_params = request.GET.copy()
+    for key in ('after', 'before'):
+        filter_params.pop(key, None)
     
     context = {
-        'consumables': consumables,
-        'models': CartridgeModel.objects.all(),
-        'locations': Location.objects.filter(is_active=True),
+        'consumables': page,
+        'total_count': total_count,
+        'total_is_exact': total_is_exact,
+        'filter_query': filter_params.urlencode(),
+        'models': reference_data.models,
+        'locations': reference_data.active_locations,
         'consumable_type_choices': Cartridge.CONSUMABLE_TYPES,
         'status_choices': Cartridge.STATUS_CHOICES,
         'condition_choices': Cartridge.CONDITION_CHOICES,
     }
     return render(request, 'cartridges/cartridge_list.html', context)
 
+def _export_format(request):
+    export_format = request.GET.get('format', 'csv')
+    return export_format if export_format in exports.EXPORT_FORMATS else 'csv'
+
+
+@login_required
+@reporting_reads
+def cartridge_export(request):
+    """Потоковая выгрузка расходников с фильтрами списка"""
+    consumables = filters.filter_cartridges(Cartridge.objects.all(), request.GET)
+    return exports.export_response(
+        'cartridges', exports.CARTRIDGE_COLUMNS, exports.cartridge_rows(consumables), _export_format(request)
+    )
+
+
+@login_required
+@reporting_reads
+def printer_export(request):
+    """Потоковая выгрузка принтеров с фильтрами списка"""
+    printers = filters.filter_printers(Printer.objects.all(), request.GET)
+    return exports.export_response(
+        'printers', exports.PRINTER_COLUMNS, exports.printer_rows(printers), _export_format(request)
+    )
+
+
+@login_required
+@reporting_reads
+def operation_export(request):
+    """Потоковая выгрузка журнала операций (archive=1 — вместе с архивом)"""
+    operations = filters.filter_operations(Operation.objects.all(), request.GET)
+    archived = None
+    if request.GET.get('archive'):
+        archived = filters.filter_operations(ArchivedOperation.objects.all(), request.GET)
+    return exports.export_response(
+        'operations', exports.OPERATION_COLUMNS, exports.operation_rows(operations, archived), _export_format(request)
+    )
+
+
 @login_required
 def cartridge_detail(request, pk):
     """Детальная информация о расходнике"""
@@ -102,13 +128,27 @@ def cartridge_detail(request, pk):
         pk=pk
     )
     
-    operations = Operation.objects.filter(cartridge=cartridge).select_related(
-        'user', 'from_location', 'to_location', 'printer'
-    ).order_by('-timestamp')
-    
+    # Архивные операции всегда старше оперативных, поэтому идут следом;
+    # архив читается, только когда до него дошла страница
+    history = [
+        queryset.filter(cartridge=cartridge).select_related('user', 'from_location', 'to_location', 'printer')
+        for queryset in (Operation.objects.all(), ArchivedOperation.objects.all())
+    ]
+    try:
+        operations = keyset_paginate_chain(
+            history,
+            TIMELINE_ORDERING,
+            TIMELINE_PAGE_SIZE,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    except InvalidCursor:
+        operations = keyset_paginate_chain(history, TIMELINE_ORDERING, TIMELINE_PAGE_SIZE)
+
     context = {
         'cartridge': cartridge,
         'operations': operations,
+        'lifecycle': lifecycle.get_lifecycle(cartridge.pk),
     }
     return render(request, 'cartridges/cartridge_detail.html', context)
 
@@ -140,6 +180,7 @@ def cartridge_create(request):
     return render(request, 'cartridges/cartridge_form.html', context)
 
 @login_required
+@idempotent
 def operation_create(request, cartridge_pk=None):
     """Создание операции"""
     cartridge = None
@@ -151,10 +192,14 @@ def operation_create(request, cartridge_pk=None):
         if form.is_valid():
             operation = form.save(commit=False)
             operation.user = request.user
-            operation.save()
-            
-            messages.success(request, f'Операция "{operation.get_operation_type_display()}" успешно создана')
-            return redirect('cartridges:cartridge_detail', pk=operation.cartridge.pk)  
+            try:
+                operation.save()
+            except InvalidTransition as e:
+                # Статус расходника успел измениться после проверки формы
+                form.add_error('operation_type', e.messages)
+            else:
+                messages.success(request, f'Операция "{operation.get_operation_type_display()}" успешно создана')
+                return redirect('cartridges:cartridge_detail', pk=operation.cartridge.pk)
     else:
         initial = {'cartridge': cartridge} if cartridge else {}
         form = OperationForm(initial=initial)
@@ -162,13 +207,57 @@ def operation_create(request, cartridge_pk=None):
     context = {
         'form': form,
         'cartridge': cartridge,
+        # Новый ключ на каждый показ формы: двойная отправка создаёт одну операцию
+        'idempotency_key': uuid.uuid4().hex,
     }
     return render(request, 'cartridges/operation_form.html', context)
 
+def _save_job_file(upload):
+    """Сохраняет загруженный файл для фоновой задачи и возвращает путь"""
+    os.makedirs(settings.JOB_FILES_DIR, exist_ok=True)
+    path = os.path.join(settings.JOB_FILES_DIR, f'{uuid.uuid4().hex}.csv')
+    with open(path, 'wb') as destination:
+        for chunk in upload.chunks():
+            destination.write(chunk)
+    return path
+
+@login_required
+def import_data(request):
+    """Импорт расходников или принтеров из CSV-файла (фоновая задача)"""
+    if request.method == 'POST':
+        form = ImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            job = jobs.enqueue(
+                'import_data',
+                user=request.user,
+                kind=form.cleaned_data['kind'],
+                path=_save_job_file(form.cleaned_data['file']),
+                dry_run=form.cleaned_data['dry_run'],
+            )
+            return redirect(f"{reverse('cartridges:import_data')}?job={job.pk}")
+    else:
+        form = ImportForm()
+    
+    # Задача импорта, поставленная этим пользователем
+    job = None
+    job_id = request.GET.get('job', '')
+    if job_id.isdigit():
+        job = Job.objects.filter(pk=job_id, name='import_data', user=request.user).first()
+    report = job.result if job and job.status == 'done' else None
+    
+    context = {
+        'form': form,
+        'job': job,
+        'report': report,
+    }
+    return render(request, 'cartridges/import_form.html', context)
+
 @login_required
-def get_cartridge_info(request, cartridge_id):
-    """API для получения информации о картридже (для AJAX)"""
-    cartridge = get_object_or_404(Cartridge, pk=cartridge_id)
+async def get_cartridge_info(request, cartridge_id):
+    """API для получения информации о картридже (для AJAX и сканеров)"""
+    cartridge = await aget_object_or_404(
+        Cartridge.objects.select_related('model', 'current_location'), pk=cartridge_id
+    )
     data = {
         'serial_number': cartridge.serial_number,
         'model': str(cartridge.model),
@@ -183,22 +272,14 @@ def printer_list(request):
     """Список всех принтеров"""
     printers = Printer.objects.select_related('location')
     
-    # Фильтрация
-    printer_type = request.GET.get('printer_type')
-    is_inkjet = request.GET.get('is_inkjet')
-    location_id = request.GET.get('location')
-    
-    if printer_type:
-        printers = printers.filter(printer_type=printer_type)
-    if is_inkjet:
-        printers = printers.filter(is_inkjet=True)
-    if location_id:
-        printers = printers.filter(location_id=location_id)
+    printers = filters.filter_printers(printers, request.GET)
+    printers = services.annotate_printer_consumables(printers)
     
     context = {
         'printers': printers,
-        'locations': Location.objects.filter(is_active=True),
+        'locations': reference.get_reference_data().active_locations,
         'printer_type_choices': Printer.PRINTER_TYPES,
+        'filter_query': request.GET.urlencode(),
     }
     return render(request, 'cartridges/printer_list.html', context)
 
@@ -208,11 +289,33 @@ def printer_detail(request, pk):
     printer = get_object_or_404(Printer.objects.select_related('location'), pk=pk)
     
     
-    installed_consumables = Cartridge.objects.filter(installed_in_printer=printer)
+    installed_consumables = Cartridge.objects.filter(installed_in_printer=printer).select_related('model')
+    forecasts = printer.forecasts.select_related('cartridge_model').order_by(
+        F('next_replacement').asc(nulls_last=True), 'cartridge_model__name'
+    )
+    
+    # История установок: каждая страница — один запрос, снятия подставляются подзапросами
+    history = services.printer_install_history(printer)
+    try:
+        installs = keyset_paginate(
+            history,
+            TIMELINE_ORDERING,
+            PRINTER_HISTORY_PAGE_SIZE,
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    except InvalidCursor:
+        installs = keyset_paginate(history, TIMELINE_ORDERING, PRINTER_HISTORY_PAGE_SIZE)
+    operation_labels = dict(Operation.OPERATION_TYPES)
+    for install in installs:
+        install.removal_label = operation_labels.get(install.removal_type, '')
     
     context = {
         'printer': printer,
         'installed_consumables': installed_consumables,
+        'forecasts': forecasts,
+        'installs': installs,
+        'monthly_consumption': services.printer_monthly_consumption(printer),
     }
     return render(request, 'cartridges/printer_detail.html', context)
 
@@ -232,100 +335,195 @@ def printer_create(request):
     return render(request, 'cartridges/printer_form.html', context)
 
 @login_required
-def get_printers_by_location(request):
+@etag(reference.reference_etag)
+@cache_control(private=True, no_cache=True)
+async def get_printers_by_location(request):
     """API для получения принтеров по локации"""
     location_id = request.GET.get('location_id')
     
-    if location_id:
-        printers = Printer.objects.filter(location_id=location_id, is_active=True)
+    printers_data = []
+    if location_id and location_id.isdigit():
+        data = await reference.aget_reference_data()
         printers_data = [
             {'id': printer.id, 'name': f"{printer.name} ({printer.model})"}
-            for printer in printers
+            for printer in data.printers_for_location(int(location_id))
         ]
-    else:
-        printers_data = []
     
     return JsonResponse({'printers': printers_data})
 
 
 @login_required
+@etag(reference.reference_etag)
+@cache_control(private=True, no_cache=True)
 def get_locations_by_operation_type(request):
     """API для получения локаций по типу операции"""
     operation_type = request.GET.get('operation_type')
+    data = reference.get_reference_data()
     
     if operation_type == 'install':
-       
-        locations_with_printers = Location.objects.filter(
-            printer__is_active=True
-        ).distinct()
-        locations_data = [
-            {'id': loc.id, 'name': loc.name}
-            for loc in locations_with_printers
-        ]
+        # Только локации с активными принтерами
+        locations = data.locations_with_printers
     else:
-        
-        locations = Location.objects.filter(is_active=True)
-        locations_data = [
-            {'id': loc.id, 'name': loc.name}
-            for loc in locations
-        ]
+        locations = data.active_locations
     
+    locations_data = [{'id': loc.id, 'name': loc.name} for loc in locations]
     return JsonResponse({'locations': locations_data})
 
 
 @login_required
-def search_cartridge_models(request):
+def cartridge_lookup(request):
+    """
+    API автодополнения расходника в форме операции: диапазон префикса
+    серийного номера по индексу, keyset-страницы по LOOKUP_PAGE_SIZE
+    """
+    query = request.GET.get('q', '').strip()
+    after = request.GET.get('after')
+    cartridges = Cartridge.objects.select_related('model').exclude(current_status='disposed')
+    
+    # Только расходники, для которых операция допустима
+    statuses = None
+    try:
+        statuses = get_transition(request.GET.get('operation_type')).from_statuses
+        cartridges = cartridges.filter(current_status__in=statuses)
+    except InvalidTransition:
+        pass
+    
+    if query:
+        # Префикс по индексу (current_status, serial_number), а не LIKE по каждой строке
+        cartridges = cartridges.filter(search.serial_prefix_filter(query))
+    
+    try:
+        page = keyset_paginate(cartridges, ('serial_number',), LOOKUP_PAGE_SIZE, after=after)
+    except InvalidCursor:
+        page = keyset_paginate(cartridges, ('serial_number',), LOOKUP_PAGE_SIZE)
+    results = list(page)
+    
+    if query and not results and not after:
+        # Опечатка в номере: нечёткий поиск по триграммному индексу
+        results = [
+            cartridge for cartridge, _ in search.search_cartridges(query, limit=LOOKUP_PAGE_SIZE)
+            if cartridge.current_status != 'disposed'
+            and (statuses is None or cartridge.current_status in statuses)
+        ]
+    
+    return JsonResponse({
+        'results': [{'id': cartridge.pk, 'text': str(cartridge)} for cartridge in results],
+        'next': page.next_cursor,
+    })
+
+
+@login_required
+@etag(reference.reference_etag)
+@cache_control(private=True, no_cache=True)
+def printer_lookup(request):
+    """API автодополнения принтера: активные принтеры из справочников, постранично"""
+    query = request.GET.get('q', '').strip().lower()
+    location_id = request.GET.get('location_id', '')
+    after = request.GET.get('after', '')
+    data = reference.get_reference_data()
+    
+    printers = data.printers_for_location(int(location_id)) if location_id.isdigit() else data.printers
+    if query:
+        printers = [
+            printer for printer in printers
+            if query in f'{printer.name} {printer.model} {printer.serial_number}'.lower()
+        ]
+    
+    offset = int(after) if after.isdigit() else 0
+    end = offset + LOOKUP_PAGE_SIZE
+    return JsonResponse({
+        'results': [
+            {'id': printer.id, 'text': f'{printer.model} ({printer.serial_number})'}
+            for printer in printers[offset:end]
+        ],
+        'next': str(end) if len(printers) > end else None,
+    })
+
+
+@login_required
+async def search_cartridge_models(request):
     """API для поиска моделей картриджей"""
     query = request.GET.get('q', '')
     
-    if query:
-        models = CartridgeModel.objects.filter(
-            Q(name__icontains=query) | 
-            Q(manufacturer__icontains=query)
-            
-        ).order_by('manufacturer', 'name')[:20]  # Ограничиваем результаты
-    else:
-        models = CartridgeModel.objects.all().order_by('manufacturer', 'name')[:20]
-    
-    models_data = [
-        {
-            'id': model.id,
-            'name': f"{model.manufacturer} {model.name}",
-            'manufacturer': model.manufacturer,
-            'model_name': model.name,
-            'max_refills': model.max_refills
-        }
-        for model in models
-    ]
+    # Индекс моделей в памяти процесса: префиксы слов и опечатки
+    data = await reference.aget_reference_data()
+    models_data = data.model_index.search(query, 20)
     
     return JsonResponse({'models': models_data})
 
 
+@login_required
+def global_search(request):
+    """API поиска по моделям, серийным номерам и принтерам (для автодополнения)"""
+    query = request.GET.get('q', '').strip()
+    kinds = set(request.GET.get('kinds', 'models,cartridges,printers').split(','))
+    
+    results = []
+    if query:
+        if 'models' in kinds:
+            results += [
+                {'kind': 'model', 'id': model['id'], 'label': model['name'], 'score': search.score(query, model['name'])}
+                for model in search.search_models(query, limit=search.SEARCH_LIMIT)
+            ]
+        if 'cartridges' in kinds:
+            results += [
+                {
+                    'kind': 'cartridge',
+                    'id': cartridge.pk,
+                    'label': f'{cartridge.serial_number} ({cartridge.model})',
+                    'score': score,
+                    'url': reverse('cartridges:cartridge_detail', args=[cartridge.pk]),
+                }
+                for cartridge, score in search.search_cartridges(query)
+            ]
+        if 'printers' in kinds:
+            results += [
+                {
+                    'kind': 'printer',
+                    'id': printer.pk,
+                    'label': f'{printer.name} ({printer.model})',
+                    'score': score,
+                    'url': reverse('cartridges:printer_detail', args=[printer.pk]),
+                }
+                for printer, score in search.search_printers(query)
+            ]
+        results.sort(key=lambda item: -item['score'])
+    
+    return JsonResponse({'results': results[:search.SEARCH_LIMIT]})
+
+
 from django.http import JsonResponse
 from django.views.decorators.http import require_POST
 
 @login_required
 @require_POST
-def update_cartridge_condition(request, pk):
+@idempotent
+async def update_cartridge_condition(request, pk):
     """AJAX обновление состояния картриджа"""
     try:
-        cartridge = get_object_or_404(Cartridge, pk=pk)
+        cartridge = await aget_object_or_404(Cartridge, pk=pk)
         new_condition = request.POST.get('condition')
         
         if new_condition in dict(Cartridge.CONDITION_CHOICES).keys():
-            cartridge.condition = new_condition
-            cartridge.save()
-            
-            # Логируем операцию изменения состояния
-            Operation.objects.create(
+            user = await request.auser()
+            # Логируем операцию изменения состояния, состояние пишется тем же UPDATE
+            operation = Operation(
                 operation_type='transfer',
                 cartridge=cartridge,
-                from_location=cartridge.current_location,
-                to_location=cartridge.current_location,
-                user=request.user,
-                reason=f'Изменено состояние на: {cartridge.get_condition_display()}',
-                notes=f'Изменено через дашборд пользователем {request.user.username}'
+                from_location_id=cartridge.current_location_id,
+                to_location_id=cartridge.current_location_id,
+                user=user,
+                reason=f'Изменено состояние на: {dict(Cartridge.CONDITION_CHOICES)[new_condition]}',
+                notes=f'Изменено через дашборд пользователем {user.username}'
             )
+            try:
+                # Запись идёт в транзакции, а транзакции доступны только синхронному ORM
+                await sync_to_async(operation.save)(cartridge_changes={'condition': new_condition})
+            except InvalidTransition as e:
+                return JsonResponse({
+                    'success': False,
+                    'error': e.message
+                }, status=400)
             
             return JsonResponse({
                 'success': True,
@@ -360,114 +558,62 @@ def get_condition_badge_class(condition):
 
 from django.views.decorators.http import require_POST
 
+def _job_response(job, message):
+    """Ответ на постановку задачи: интерфейс опрашивает status_url"""
+    return JsonResponse({
+        'success': True,
+        'job_id': job.pk,
+        'status_url': reverse('cartridges:job_status', args=[job.pk]),
+        'message': message
+    }, status=202)
+
+
 @login_required
 @require_POST
 def bulk_send_to_service(request):
-    """Массовая отправка картриджей на заправку"""
-    try:
-        # Находим все картриджи, требующие ремонта
-        cartridges_to_service = Cartridge.objects.filter(
-            condition='needs_repair',
-            current_status__in=['in_stock', 'installed']  # Только те, что на складе или установлены
-        )
-        
-        count = 0
-        errors = []
-        
-        # Находим локацию сервисного центра
-        service_center = Location.objects.filter(type='service', is_active=True).first()
-        if not service_center:
-            return JsonResponse({
-                'success': False,
-                'error': 'Не найден активный сервисный центр'
-            })
-        
-        for cartridge in cartridges_to_service:
-            try:
-                # Сохраняем текущую локацию
-                from_location = cartridge.current_location
-                
-                # Обновляем статус картриджа
-                cartridge.current_status = 'at_service'
-                cartridge.current_location = service_center
-                cartridge.save()
-                
-                # Создаём операцию
-                Operation.objects.create(
-                    operation_type='issue_service',
-                    cartridge=cartridge,
-                    from_location=from_location,
-                    to_location=service_center,
-                    user=request.user,
-                    reason='Массовая отправка на заправку',
-                    notes='Картридж требует ремонта, отправлен автоматически'
-                )
-                
-                count += 1
-                
-            except Exception as e:
-                errors.append(f"{cartridge.serial_number}: {str(e)}")
-                continue
-        
-        return JsonResponse({
-            'success': True,
-            'message': f'Успешно отправлено {count} картриджей на заправку',
-            'count': count,
-            'errors': errors if errors else None
-        })
-        
-    except Exception as e:
+    """Массовая отправка картриджей на заправку (фоновая задача)"""
+    if not Location.objects.filter(type='service', is_active=True).exists():
         return JsonResponse({
             'success': False,
-            'error': str(e)
-        }, status=500)
+            'error': 'Не найден активный сервисный центр'
+        })
+    
+    job = jobs.enqueue('bulk_send_to_service', user=request.user)
+    return _job_response(job, 'Отправка на заправку поставлена в очередь')
 
 @login_required
 @require_POST
-def send_to_service(request, pk):
+@idempotent
+async def send_to_service(request, pk):
     """Отправка одного картриджа на заправку"""
     try:
-        cartridge = get_object_or_404(Cartridge, pk=pk)
-        
-        # Проверяем, можно ли отправить на заправку
-        if cartridge.current_status == 'disposed':
-            return JsonResponse({
-                'success': False,
-                'error': 'Нельзя отправить списанный картридж'
-            })
-        
-        if cartridge.current_status == 'at_service':
-            return JsonResponse({
-                'success': False,
-                'error': 'Картридж уже на заправке'
-            })
+        cartridge = await aget_object_or_404(Cartridge, pk=pk)
         
         # Находим локацию сервисного центра
-        service_center = Location.objects.filter(type='service', is_active=True).first()
+        service_center = await Location.objects.filter(type='service', is_active=True).afirst()
         if not service_center:
             return JsonResponse({
                 'success': False,
                 'error': 'Не найден активный сервисный центр'
             })
         
-        # Сохраняем текущую локацию
-        from_location = cartridge.current_location
-        
-        # Обновляем статус картриджа
-        cartridge.current_status = 'at_service'
-        cartridge.current_location = service_center
-        cartridge.save()
-        
-        # Создаём операцию
-        Operation.objects.create(
-            operation_type='issue_service',
-            cartridge=cartridge,
-            from_location=from_location,
-            to_location=service_center,
-            user=request.user,
-            reason='Отправка на заправку',
-            notes=f'Картридж отправлен на ремонт/заправку. Состояние: {cartridge.get_condition_display()}'
-        )
+        # Операция сама проверяет переход и обновляет статус картриджа;
+        # запись в транзакции выполняется синхронным ORM в потоке
+        try:
+            await sync_to_async(Operation.objects.create)(
+                operation_type='issue_service',
+                cartridge=cartridge,
+                from_location_id=cartridge.current_location_id,
+                to_location=service_center,
+                user=await request.auser(),
+                reason='Отправка на заправку',
+                notes=f'Картридж отправлен на ремонт/заправку. Состояние: {cartridge.get_condition_display()}'
+            )
+        except InvalidTransition as e:
+            return JsonResponse({
+                'success': False,
+                'error': e.message
+            })
         
         return JsonResponse({
             'success': True,
@@ -491,126 +637,213 @@ def print_attention_report(request):
     Печать отчёта по картриджам, требующим внимания
     (нуждаются в ремонте или превысили лимит заправок)
     """
-    # Получаем те же картриджи, что и для дашборда
-    attention_consumables = Cartridge.objects.filter(
-        Q(condition='needs_repair') | 
-        Q(refill_count__gt=F('model__max_refills'))
-    ).select_related('model', 'installed_in_printer', 'current_location')  # Изменено здесь
+    # Те же картриджи, что и на дашборде: один запрос по частичному индексу
+    attention_consumables = list(
+        Cartridge.objects.filter(needs_attention=True)
+        .select_related('model', 'installed_in_printer', 'current_location')
+    )
     
     # Разделяем на две категории для отчёта
-    needs_repair = attention_consumables.filter(condition='needs_repair')
-    max_refills = attention_consumables.filter(refill_count__gt=F('model__max_refills'))
+    needs_repair = [c for c in attention_consumables if c.condition == 'needs_repair']
+    max_refills = [c for c in attention_consumables if c.refill_count >= c.model.max_refills]
     
     context = {
         'needs_repair': needs_repair,
         'max_refills': max_refills,
-        'total_count': attention_consumables.count(),
+        'total_count': len(attention_consumables),
         'report_date': timezone.now().strftime('%d.%m.%Y %H:%M'),
     }
     
     return render(request, 'reports/attention_report.html', context)
 
-@csrf_exempt
+
+def _is_id(value):
+    return (isinstance(value, int) and not isinstance(value, bool)) or (isinstance(value, str) and value.isdecimal())
+
+
+def _scan_payload_error(payload):
+    """Ошибка в типах полей тела scan_operations или None"""
+    if not isinstance(payload, dict):
+        return 'Тело запроса должно быть JSON-объектом'
+    serial_numbers = payload.get('serial_numbers')
+    if serial_numbers is not None and (
+        not isinstance(serial_numbers, list) or not all(isinstance(s, str) for s in serial_numbers)
+    ):
+        return 'serial_numbers должен быть списком строк'
+    if not isinstance(payload.get('operation_type', ''), str):
+        return 'operation_type должен быть строкой'
+    for field in ('reason', 'notes'):
+        if not isinstance(payload.get(field, ''), str):
+            return f'{field} должен быть строкой'
+    for field in ('to_location_id', 'printer_id'):
+        value = payload.get(field)
+        if value not in (None, '') and not _is_id(value):
+            return f'{field} должен быть числом'
+    return None
+
+
 @login_required
 @require_POST
-def bulk_return_from_service(request):
-    """Массовое возвращение картриджей с заправки на склад"""
+def scan_operations(request):
+    """
+    Пакетное применение операции к отсканированным серийным номерам.
+    Принимает JSON: operation_type, to_location_id, printer_id, serial_numbers,
+    reason, notes. Возвращает результат по каждому номеру.
+    """
     try:
-        print("=" * 50)
-        print("ФУНКЦИЯ bulk_return_from_service ВЫЗВАНА")
-        
-        # 1. Находим все картриджи на заправке
-        cartridges_at_service = Cartridge.objects.filter(
-            current_status='at_service'
-        )
-        
-        print(f"Найдено картриджей на заправке: {cartridges_at_service.count()}")
-        
-        if cartridges_at_service.count() == 0:
-            return JsonResponse({
-                'success': True,
-                'message': 'Нет картриджей на заправке',
-                'count': 0
-            })
-        
-        # 2. Находим складскую локацию
-        warehouse = Location.objects.filter(type='warehouse', is_active=True).first()
-        if not warehouse:
-            # Если нет склада, ищем любую активную локацию
-            warehouse = Location.objects.filter(is_active=True).first()
-        
-        print(f"Локация склада: {warehouse}")
-        
-        if not warehouse:
+        payload = json.loads(request.body or b'{}')
+    except ValueError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Некорректный JSON'
+        }, status=400)
+    error = _scan_payload_error(payload)
+    if error:
+        return JsonResponse({
+            'success': False,
+            'error': error
+        }, status=400)
+    
+    serial_numbers = [s.strip() for s in payload.get('serial_numbers') or [] if s.strip()]
+    if not serial_numbers:
+        return JsonResponse({
+            'success': False,
+            'error': 'Не переданы серийные номера'
+        }, status=400)
+    if len(serial_numbers) > services.SCAN_MAX_SERIALS:
+        return JsonResponse({
+            'success': False,
+            'error': f'За один запрос можно обработать не более {services.SCAN_MAX_SERIALS} номеров'
+        }, status=400)
+    
+    operation_type = payload.get('operation_type')
+    try:
+        transition = get_transition(operation_type)
+    except InvalidTransition as e:
+        return JsonResponse({
+            'success': False,
+            'error': e.message
+        }, status=400)
+    
+    to_location = Location.objects.filter(pk=payload.get('to_location_id'), is_active=True).first()
+    if not to_location:
+        return JsonResponse({
+            'success': False,
+            'error': 'Локация назначения не найдена'
+        }, status=400)
+    
+    printer = None
+    if payload.get('printer_id'):
+        printer = Printer.objects.filter(pk=payload['printer_id'], is_active=True).first()
+        if not printer:
             return JsonResponse({
                 'success': False,
-                'error': 'Не найдена активная локация для склада'
-            })
-        
-        # 3. Обрабатываем каждый картридж
-        count = 0
-        errors = []
-        
-        for cartridge in cartridges_at_service:
-            try:
-                print(f"Обработка картриджа: {cartridge.serial_number}")
-                
-                # Сохраняем старую локацию
-                from_location = cartridge.current_location
-                
-                # Обновляем статус и состояние
-                cartridge.current_status = 'in_stock'  # На склад
-                cartridge.current_location = warehouse
-                cartridge.condition = 'refilled'  # Ставим состояние "Заправлен"
-                cartridge.save()
-                
-                print(f"  - Обновлен: статус={cartridge.current_status}, состояние={cartridge.condition}")
-                
-                # 4. Создаем операцию
-                # Проверяем, есть ли тип 'return_service' или используем 'receive_service'
-                operation_type = 'receive_service'  # Используем существующий тип
-                
-                Operation.objects.create(
-                    operation_type=operation_type,
-                    cartridge=cartridge,
-                    from_location=from_location,
-                    to_location=warehouse,
-                    user=request.user,
-                    reason='Возврат с заправки',
-                    notes='Картридж возвращен со сервисного центра на склад'
-                )
-                
-                print(f"  - Операция создана")
-                count += 1
-                
-            except Exception as e:
-                error_msg = f"{cartridge.serial_number}: {str(e)}"
-                print(f"  - Ошибка: {error_msg}")
-                errors.append(error_msg)
-                continue
-        
-        print(f"УСПЕШНО ОБРАБОТАНО: {count} картриджей")
-        print("=" * 50)
-        
-        # 5. Возвращаем результат
-        result = {
-            'success': True,
-            'message': f'Успешно возвращено на склад: {count} картриджей',
-            'count': count
-        }
-        
-        if errors:
-            result['errors'] = errors
-            result['message'] = f'Возвращено {count} картриджей. Было {len(errors)} ошибок'
-        
-        return JsonResponse(result)
-        
+                'error': 'Принтер не найден'
+            }, status=400)
+    if transition.sets_printer and not printer:
+        return JsonResponse({
+            'success': False,
+            'error': 'Для установки нужно указать принтер'
+        }, status=400)
+    
+    try:
+        count, results = services.scan_apply_operation(
+            serial_numbers,
+            operation_type,
+            to_location,
+            request.user,
+            printer=printer,
+            reason=payload.get('reason', ''),
+            notes=payload.get('notes', ''),
+        )
     except Exception as e:
-        print(f"КРИТИЧЕСКАЯ ОШИБКА: {str(e)}")
-        import traceback
-        traceback.print_exc()
-        
+        logger.exception('scan_operations failed')
         return JsonResponse({
             'success': False,
             'error': str(e)
-        }, status=500)
\ No newline at end of file
+        }, status=500)
+    
+    return JsonResponse({
+        'success': True,
+        'message': f'Обработано {count} из {len(serial_numbers)}',
+        'count': count,
+        'results': results
+    })
+
+
+def _bulk_return_params(request):
+    """Параметры массового возврата из JSON-тела или обычной формы"""
+    if request.content_type == 'application/json':
+        try:
+            payload = json.loads(request.body or b'{}')
+        except ValueError:
+            payload = {}
+        serial_numbers = payload.get('serial_numbers') or []
+    else:
+        payload = request.POST
+        serial_numbers = request.POST.getlist('serial_numbers')
+    
+    return payload.get('location_id'), [str(s).strip() for s in serial_numbers if str(s).strip()]
+
+
+@csrf_exempt
+@login_required
+@require_POST
+def bulk_return_from_service(request):
+    """Массовое возвращение картриджей с заправки на склад (фоновая задача)"""
+    location_id, serial_numbers = _bulk_return_params(request)
+    if location_id and not Location.objects.filter(pk=location_id, type='service').exists():
+        return JsonResponse({
+            'success': False,
+            'error': 'Сервисный центр не найден'
+        }, status=404)
+    
+    job = jobs.enqueue(
+        'return_from_service',
+        user=request.user,
+        location_id=location_id,
+        serial_numbers=serial_numbers,
+    )
+    return _job_response(job, 'Возврат с заправки поставлен в очередь')
+
+
+@login_required
+def job_status(request, pk):
+    """Состояние фоновой задачи (для опроса из интерфейса)"""
+    job = Job.objects.filter(pk=pk).first()
+    if job is None or (job.user_id != request.user.pk and not request.user.is_staff):
+        return JsonResponse({
+            'success': False,
+            'error': 'Задача не найдена'
+        }, status=404)
+    
+    return JsonResponse({
+        'success': True,
+        'job_id': job.pk,
+        'name': job.name,
+        'status': job.status,
+        'finished': job.is_finished,
+        'attempts': job.attempts,
+        'progress': job.progress,
+        'result': job.result,
+        'error': job.error_message if job.status == 'failed' else None
+    })
+
+
+def metrics(request):
+    """
+    Метрики представлений в формате Prometheus. Доступны персоналу,
+    а сборщику — по заголовку Authorization: Bearer <METRICS_TOKEN>.
+    """
+    allowed = request.user.is_authenticated and request.user.is_staff
+    if not allowed and settings.METRICS_TOKEN:
+        allowed = constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {settings.METRICS_TOKEN}'
+        )
+    if not allowed:
+        return HttpResponseForbidden()
+    
+    return HttpResponse(
+        view_metrics.render(view_metrics.collect()),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
@@ -0,0 +1,175 @@
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db.models import DateField, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from cartridges.models import InventorySummary, OperationDailyRollup
+
+
+# Период отчёта по заправкам: число дней и шаг динамики
+REFILL_PERIODS = {
+    '30': (30, 'day'),
+    '90': (90, 'week'),
+    '365': (365, 'month'),
+}
+DEFAULT_REFILL_PERIOD = '30'
+
+
+def stock_matrix(location_type=None, consumable_type=None, status='in_stock'):
+    """
+    Остатки в разрезе локация × модель одним сгруппированным запросом
+    по сводке остатков.
+
+    Возвращает словарь со списками локаций и моделей (в порядке сортировки)
+    и разреженными ячейками {(location_id, model_id): количество}.
+    """
+    rows = InventorySummary.objects.filter(status=status, count__gt=0, location__is_active=True)
+    if location_type:
+        rows = rows.filter(location__type=location_type)
+    if consumable_type:
+        rows = rows.filter(consumable_type=consumable_type)
+
+    rows = rows.values(
+        'location_id', 'location__name', 'location__type',
+        'cartridge_model_id', 'cartridge_model__name', 'cartridge_model__manufacturer',
+    ).annotate(count=Sum('count')).order_by()
+
+    locations = {}
+    models = {}
+    cells = {}
+    for row in rows:
+        locations.setdefault(row['location_id'], {
+            'id': row['location_id'],
+            'name': row['location__name'],
+            'type': row['location__type'],
+        })
+        models.setdefault(row['cartridge_model_id'], {
+            'id': row['cartridge_model_id'],
+            'name': row['cartridge_model__name'],
+            'manufacturer': row['cartridge_model__manufacturer'],
+        })
+        cells[(row['location_id'], row['cartridge_model_id'])] = row['count']
+
+    return {
+        'locations': sorted(locations.values(), key=lambda loc: loc['name']),
+        'models': sorted(models.values(), key=lambda m: (m['manufacturer'], m['name'])),
+        'cells': cells,
+    }
+
+
+def stock_matrix_json(matrix):
+    """Компактное представление матрицы: индексы вместо повторяющихся имён"""
+    location_index = {loc['id']: i for i, loc in enumerate(matrix['locations'])}
+    model_index = {m['id']: i for i, m in enumerate(matrix['models'])}
+    return {
+        'locations': [[loc['id'], loc['name'], loc['type']] for loc in matrix['locations']],
+        'models': [[m['id'], m['manufacturer'], m['name']] for m in matrix['models']],
+        # [индекс локации, индекс модели, количество]
+        'cells': sorted(
+            [location_index[loc_id], model_index[model_id], count]
+            for (loc_id, model_id), count in matrix['cells'].items()
+        ),
+    }
+
+
+def stock_rows(matrix):
+    """Строки матрицы для шаблона: локация, её модели с количеством и итог"""
+    model_order = {m['id']: i for i, m in enumerate(matrix['models'])}
+    models = {m['id']: m for m in matrix['models']}
+
+    by_location = defaultdict(list)
+    for (location_id, model_id), count in matrix['cells'].items():
+        by_location[location_id].append((model_order[model_id], models[model_id], count))
+
+    rows = []
+    for location in matrix['locations']:
+        items = [
+            {'model': model, 'count': count}
+            for _, model, count in sorted(by_location[location['id']], key=lambda item: item[0])
+        ]
+        rows.append({
+            'location': location,
+            'items': items,
+            'total': sum(item['count'] for item in items),
+        })
+    return rows
+
+
+def _parse_date(value):
+    """Дата из параметра запроса; несуществующая (2024-02-30) — как отсутствующая"""
+    try:
+        return parse_date(value or '')
+    except ValueError:
+        return None
+
+
+def refill_period(params):
+    """
+    Границы отчёта по заправкам из параметров запроса: period из
+    REFILL_PERIODS либо явные date_from/date_to. Даты локальные (TIME_ZONE).
+    """
+    today = timezone.localdate()
+    date_from = _parse_date(params.get('date_from'))
+    date_to = _parse_date(params.get('date_to'))
+    if date_from or date_to:
+        date_to = date_to or today
+        date_from = date_from or date_to - timedelta(days=int(DEFAULT_REFILL_PERIOD) - 1)
+        if date_from > date_to:
+            date_from, date_to = date_to, date_from
+        days = (date_to - date_from).days + 1
+        bucket = 'day' if days <= 31 else 'week' if days <= 120 else 'month'
+        return {'key': '', 'date_from': date_from, 'date_to': date_to, 'bucket': bucket}
+
+    key = params.get('period')
+    if key not in REFILL_PERIODS:
+        key = DEFAULT_REFILL_PERIOD
+    days, bucket = REFILL_PERIODS[key]
+    return {
+        'key': key,
+        'date_from': today - timedelta(days=days - 1),
+        'date_to': today,
+        'bucket': bucket,
+    }
+
+
+def _rollup_totals(rows):
+    return rows.annotate(
+        refills=Sum('refills'),
+        installs=Sum('installs'),
+        disposals=Sum('disposals'),
+    )
+
+
+def refill_stats(date_from, date_to, bucket='day'):
+    """
+    Заправки, установки и списания за период по дневной сводке операций:
+    итоги, разрезы по моделям и локациям и динамика с шагом bucket.
+    Журнал операций не читается, объём работы зависит от числа дней,
+    а не от числа операций.
+    """
+    rows = OperationDailyRollup.objects.filter(day__range=(date_from, date_to)).order_by()
+
+    totals = rows.aggregate(
+        refills=Sum('refills'),
+        installs=Sum('installs'),
+        disposals=Sum('disposals'),
+    )
+    by_model = _rollup_totals(rows.values(
+        'cartridge_model_id', 'cartridge_model__manufacturer', 'cartridge_model__name',
+    )).order_by('-refills', 'cartridge_model__manufacturer', 'cartridge_model__name')
+    by_location = _rollup_totals(rows.values(
+        'location_id', 'location__name',
+    )).order_by('-refills', 'location__name')
+    series = _rollup_totals(
+        rows.annotate(period=Trunc('day', bucket, output_field=DateField())).values('period')
+    ).order_by('period')
+
+    return {
+        'totals': {key: value or 0 for key, value in totals.items()},
+        'by_model': list(by_model),
+        'by_location': list(by_location),
+        'series': list(series),
+    }
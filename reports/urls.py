@@ -5,4 +5,6 @@ app_name = 'reports'
 
 urlpatterns = [
     path('', views.reports_dashboard, name='reports_dashboard'),
+    path('stock/', views.stock_report, name='stock_report'),
+    path('refills/', views.refill_report, name='refill_report'),
 ]
\ No newline at end of file
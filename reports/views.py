@@ -1,82 +1,99 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required
-from django.db.models import Count, Q
-from cartridges.models import Cartridge, Operation, CartridgeModel, Location
+from django.db.models import Count, Q, F, Sum
+from django.http import JsonResponse
+from cartridges.replica import reporting_reads
+from cartridges.models import Cartridge, Operation, CartridgeModel, Location, InventorySummary, ConsumptionForecast
+from .services import stock_matrix, stock_matrix_json, stock_rows, refill_period, refill_stats, REFILL_PERIODS
 
 @login_required
+@reporting_reads
 def reports_dashboard(request):
     """Дашборд с отчётами"""
     
-    # Статистика по статусам
-    status_stats = Cartridge.objects.values('current_status').annotate(
-        count=Count('id')
-    )
+    # Статистика по статусам (из сводки остатков)
+    status_labels = dict(Cartridge.STATUS_CHOICES)
+    status_stats = [
+        {'current_status': row['status'], 'label': status_labels.get(row['status'], row['status']), 'count': row['count']}
+        for row in InventorySummary.objects.values('status').annotate(count=Sum('count')).filter(count__gt=0).order_by('status')
+    ]
     
-    # Статистика по моделям
-    model_stats = CartridgeModel.objects.annotate(
-        total=Count('cartridge'),
-        in_stock=Count('cartridge', filter=Q(cartridge__current_status='in_stock')),
-        installed=Count('cartridge', filter=Q(cartridge__current_status='installed'))
-    )
+    # Статистика по моделям (из сводки остатков)
+    model_stats = InventorySummary.objects.values(
+        'cartridge_model_id', 'cartridge_model__manufacturer', 'cartridge_model__name'
+    ).annotate(
+        total=Sum('count'),
+        in_stock=Sum('count', filter=Q(status='in_stock')),
+        installed=Sum('count', filter=Q(status='installed'))
+    ).filter(total__gt=0).order_by('cartridge_model__manufacturer', 'cartridge_model__name')
     
     # Картриджи на заправке
     at_service = Cartridge.objects.filter(current_status='at_service').select_related('model', 'current_location')
     
     # Картриджи с превышением лимита заправок
     over_refilled = Cartridge.objects.filter(
-        refill_count__gte=models.F('model__max_refills')
+        refill_count__gte=F('model__max_refills')
     ).select_related('model')
     
+    # Ближайшие замены по сохранённому прогнозу расхода (команда forecast_consumption)
+    upcoming_replacements = ConsumptionForecast.objects.filter(
+        printer__isnull=False, printer__is_active=True, next_replacement__isnull=False
+    ).select_related('printer__location', 'cartridge_model').order_by('next_replacement')[:10]
+    
     context = {
         'status_stats': status_stats,
         'model_stats': model_stats,
         'at_service': at_service,
         'over_refilled': over_refilled,
+        'upcoming_replacements': upcoming_replacements,
     }
     return render(request, 'reports/dashboard.html', context)
 
 @login_required
+@reporting_reads
 def stock_report(request):
     """Отчёт об остатках на складах"""
-    from django.db.models import Count, Q
+    location_type = request.GET.get('location_type')
+    consumable_type = request.GET.get('consumable_type')
     
-    locations = Location.objects.filter(is_active=True).annotate(
-        total_cartridges=Count('cartridge', filter=Q(cartridge__current_status='in_stock'))
-    )
+    # Вся матрица локация × модель одним запросом по сводке остатков
+    matrix = stock_matrix(location_type=location_type, consumable_type=consumable_type)
     
-    # Группировка по моделям для каждого склада
-    stock_by_location = {}
-    for location in locations:
-        models_stats = CartridgeModel.objects.annotate(
-            count=Count('cartridge', filter=Q(cartridge__current_location=location, cartridge__current_status='in_stock'))
-        ).filter(count__gt=0)
-        stock_by_location[location] = models_stats
+    if request.GET.get('format') == 'json':
+        return JsonResponse(stock_matrix_json(matrix))
     
     context = {
-        'locations': locations,
-        'stock_by_location': stock_by_location,
+        'stock_rows': stock_rows(matrix),
+        'location_type_choices': Location.LOCATION_TYPES,
+        'consumable_type_choices': Cartridge.CONSUMABLE_TYPES,
     }
     return render(request, 'reports/stock_report.html', context)
 
 @login_required
+@reporting_reads
 def refill_report(request):
-    """Отчёт по заправкам"""
-    from django.db.models import Count
-    from datetime import datetime, timedelta
+    """Отчёт по заправкам за период (по дневной сводке операций)"""
+    period = refill_period(request.GET)
+    stats = refill_stats(period['date_from'], period['date_to'], period['bucket'])
     
-    # Статистика по заправкам за последние 30 дней
-    thirty_days_ago = datetime.now() - timedelta(days=30)
-    recent_refills = Operation.objects.filter(
-        operation_type='receive_service',
-        timestamp__gte=thirty_days_ago
-    ).values('cartridge__model__name').annotate(
-        count=Count('id')
-    ).order_by('-count')
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'date_from': period['date_from'].isoformat(),
+            'date_to': period['date_to'].isoformat(),
+            'bucket': period['bucket'],
+            'totals': stats['totals'],
+            'series': [
+                [row['period'].isoformat(), row['refills'], row['installs'], row['disposals']]
+                for row in stats['series']
+            ],
+        })
     
-    # Топ картриджей по количеству заправок
-    top_refilled = Cartridge.objects.filter(refill_count__gt=0).order_by('-refill_count')[:10]
+    # Топ картриджей по количеству заправок (частичный индекс cartridge_refilled_idx)
+    top_refilled = Cartridge.objects.filter(refill_count__gt=0).select_related('model').order_by('-refill_count', 'id')[:10]
     context = {
-        'recent_refills': recent_refills,
+        'period': period,
+        'period_choices': [(key, f'{days} дней') for key, (days, _) in REFILL_PERIODS.items()],
+        'stats': stats,
         'top_refilled': top_refilled,
     }
     return render(request, 'reports/refill_report.html', context)
\ No newline at end of file